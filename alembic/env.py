@@ -11,7 +11,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 from app.infrastructure.database import Base
 from app.infrastructure.config import settings
 from app.users.domain.models import User
-from app.books.domain.models import Book, UserBook
+from app.books.domain.models import Book, UserBook, FileBlob
 from app.reading.domain.models import ReadingProgress, ReadingHabit
 
 # this is the Alembic Config object
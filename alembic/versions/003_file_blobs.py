@@ -0,0 +1,33 @@
+"""Content-addressed file blobs
+
+Revision ID: 003_file_blobs
+Revises: 002_update_books_library
+Create Date: 2024-01-03 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '003_file_blobs'
+down_revision = '002_update_books_library'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Stored PDFs keyed by SHA-256, shared by books with identical content
+    op.create_table(
+        'file_blobs',
+        sa.Column('sha256', sa.String(64), primary_key=True),
+        sa.Column('file_path', sa.String(), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('ref_count', sa.Integer(), nullable=False, server_default='1'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_unique_constraint('uq_file_blobs_file_path', 'file_blobs', ['file_path'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_file_blobs_file_path', 'file_blobs', type_='unique')
+    op.drop_table('file_blobs')
@@ -0,0 +1,30 @@
+"""Partial index for keyset pagination of public books
+
+Revision ID: 004_public_books_keyset_index
+Revises: 003_file_blobs
+Create Date: 2024-01-04 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '004_public_books_keyset_index'
+down_revision = '003_file_blobs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Public catalogue is paged by (created_at, id); private books are not indexed
+    op.create_index(
+        'ix_books_public_created_at_id',
+        'books',
+        ['created_at', 'id'],
+        postgresql_where=sa.text('is_public'),
+        sqlite_where=sa.text('is_public = 1')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_books_public_created_at_id', table_name='books')
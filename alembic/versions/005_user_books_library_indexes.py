@@ -0,0 +1,34 @@
+"""Composite indexes for keyset pagination of user library
+
+Revision ID: 005_user_books_library_indexes
+Revises: 004_public_books_keyset_index
+Create Date: 2024-01-05 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '005_user_books_library_indexes'
+down_revision = '004_public_books_keyset_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Library is paged by (added_at, id) within a user, optionally by status
+    op.create_index(
+        'ix_user_books_user_added_at_id',
+        'user_books',
+        ['user_id', 'added_at', 'id']
+    )
+    op.create_index(
+        'ix_user_books_user_status_added_at_id',
+        'user_books',
+        ['user_id', 'status', 'added_at', 'id']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_books_user_status_added_at_id', table_name='user_books')
+    op.drop_index('ix_user_books_user_added_at_id', table_name='user_books')
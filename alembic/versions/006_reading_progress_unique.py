@@ -0,0 +1,35 @@
+"""Unique reading progress per user and book
+
+Revision ID: 006_reading_progress_unique
+Revises: 005_user_books_library_indexes
+Create Date: 2024-01-06 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '006_reading_progress_unique'
+down_revision = '005_user_books_library_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Concurrent writes may have left duplicates; keep the latest row
+    op.execute(sa.text("""
+        DELETE FROM reading_progress AS a
+        USING reading_progress AS b
+        WHERE a.user_id = b.user_id
+          AND a.book_id = b.book_id
+          AND (COALESCE(a.updated_at, 'epoch'), a.id) < (COALESCE(b.updated_at, 'epoch'), b.id)
+    """))
+    op.create_unique_constraint(
+        'uq_reading_progress_user_book',
+        'reading_progress',
+        ['user_id', 'book_id']
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_reading_progress_user_book', 'reading_progress', type_='unique')
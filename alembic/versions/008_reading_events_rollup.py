@@ -0,0 +1,50 @@
+"""Reading events log and daily reading rollup
+
+Revision ID: 008_reading_events_rollup
+Revises: 007_hot_path_indexes
+Create Date: 2024-01-08 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '008_reading_events_rollup'
+down_revision = '007_hot_path_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Append-only page moves (pages is the delta)
+    op.create_table(
+        'reading_events',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('book_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('from_page', sa.Integer(), nullable=False),
+        sa.Column('to_page', sa.Integer(), nullable=False),
+        sa.Column('pages', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.ForeignKeyConstraint(['book_id'], ['books.id']),
+    )
+    op.create_index(
+        'ix_reading_events_user_created_at', 'reading_events', ['user_id', 'created_at']
+    )
+
+    # Pages read per user and day, updated with each progress write
+    op.create_table(
+        'daily_reading_rollup',
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('day', sa.Date(), primary_key=True),
+        sa.Column('pages_read', sa.Integer(), nullable=False, server_default='0'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('daily_reading_rollup')
+    op.drop_index('ix_reading_events_user_created_at', table_name='reading_events')
+    op.drop_table('reading_events')
@@ -0,0 +1,46 @@
+"""Per-user reading stats aggregate
+
+Revision ID: 009_user_reading_stats
+Revises: 008_reading_events_rollup
+Create Date: 2024-01-09 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '009_user_reading_stats'
+down_revision = '008_reading_events_rollup'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'user_reading_stats',
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('books_started', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('books_finished', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_pages', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_activity_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+    )
+
+    # Backfill from existing progress; later writes keep it up to date
+    op.execute(sa.text("""
+        INSERT INTO user_reading_stats
+            (user_id, books_started, books_finished, total_pages, last_activity_at)
+        SELECT rp.user_id,
+               COUNT(*),
+               SUM(CASE WHEN rp.current_page >= b.pages THEN 1 ELSE 0 END),
+               SUM(rp.current_page),
+               MAX(rp.updated_at)
+        FROM reading_progress rp
+        JOIN books b ON b.id = rp.book_id
+        GROUP BY rp.user_id
+    """))
+
+
+def downgrade() -> None:
+    op.drop_table('user_reading_stats')
@@ -0,0 +1,32 @@
+"""Partial index of running reading streaks
+
+Revision ID: 010_reading_habits_active_streak
+Revises: 009_user_reading_stats
+Create Date: 2024-01-10 00:00:00.000000
+
+The nightly streak job resets streaks with last_reading_date before
+yesterday. Only habits with a running streak are indexed, so each chunk
+reads just the rows it resets instead of scanning reading_habits.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '010_reading_habits_active_streak'
+down_revision = '009_user_reading_stats'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_reading_habits_active_streak',
+        'reading_habits',
+        ['last_reading_date'],
+        postgresql_where=sa.text('current_streak > 0'),
+        sqlite_where=sa.text('current_streak > 0')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_reading_habits_active_streak', table_name='reading_habits')
@@ -0,0 +1,47 @@
+"""Title and author of library books for indexed sorting
+
+Revision ID: 011_user_books_sort_keys
+Revises: 010_reading_habits_active_streak
+Create Date: 2024-01-11 00:00:00.000000
+
+Library sorted by title or author was ordered by columns of the joined
+books table, which no index within a user covers. Books are never edited,
+so their title and author are copied into user_books and indexed per user
+like added_at.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '011_user_books_sort_keys'
+down_revision = '010_reading_habits_active_streak'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('user_books', sa.Column('book_title', sa.String(), nullable=True))
+    op.add_column('user_books', sa.Column('book_author', sa.String(), nullable=True))
+    op.execute(
+        "UPDATE user_books SET book_title = books.title, book_author = books.author "
+        "FROM books WHERE books.id = user_books.book_id"
+    )
+    op.alter_column('user_books', 'book_title', nullable=False)
+    op.alter_column('user_books', 'book_author', nullable=False)
+    op.create_index(
+        'ix_user_books_user_book_title_id',
+        'user_books',
+        ['user_id', 'book_title', 'id']
+    )
+    op.create_index(
+        'ix_user_books_user_book_author_id',
+        'user_books',
+        ['user_id', 'book_author', 'id']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_books_user_book_author_id', table_name='user_books')
+    op.drop_index('ix_user_books_user_book_title_id', table_name='user_books')
+    op.drop_column('user_books', 'book_author')
+    op.drop_column('user_books', 'book_title')
@@ -1,10 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import Literal, Optional
+import uuid
 
-from app.infrastructure.database import get_db
-from app.users.api.dependencies import get_current_user
-from app.users.domain.models import User
+from app.infrastructure.database import get_db, get_read_db
+from app.users.api.dependencies import get_current_user_id
 from app.books.api.schemas import (
     UserLibraryResponse,
     UserBookResponse,
@@ -20,12 +20,15 @@ from app.books.domain.models import BookStatus
 
 router = APIRouter(prefix="/users/me/library", tags=["library"])
 
+# Routes using the sync session are plain functions, so they run on the
+# threadpool instead of blocking the event loop
+
 
 @router.post("/isbn", response_model=UserBookResponse, status_code=status.HTTP_201_CREATED)
 async def add_book_by_isbn(
     request: AddBookByISBNRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user_id: uuid.UUID = Depends(get_current_user_id)
 ):
     """Add book to library by ISBN (without PDF)"""
     book_repository = BookRepository()
@@ -34,20 +37,18 @@ async def add_book_by_isbn(
     
     try:
         user_book = await library_service.add_book_by_isbn(
-            db, current_user.id, request.isbn, request.status
+            db, current_user_id, request.isbn, request.status
         )
-        # Load book relationship
-        db.refresh(user_book)
         return _format_user_book_response(user_book)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 @router.post("/public", response_model=UserBookResponse, status_code=status.HTTP_201_CREATED)
-async def add_public_book(
+def add_public_book(
     request: AddPublicBookRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user_id: uuid.UUID = Depends(get_current_user_id)
 ):
     """Add public book to library"""
     book_repository = BookRepository()
@@ -56,42 +57,55 @@ async def add_public_book(
     
     try:
         user_book = library_service.add_public_book_to_library(
-            db, current_user.id, request.book_id, request.status
+            db, current_user_id, request.book_id, request.status
         )
-        db.refresh(user_book)
         return _format_user_book_response(user_book)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 @router.get("", response_model=UserLibraryResponse)
-async def get_my_library(
-    status: Optional[BookStatus] = Query(
+def get_my_library(
+    book_status: Optional[BookStatus] = Query(
         None,
+        alias="status",
         description="Filter by book status",
         examples=["planned", "reading", "finished"]
     ),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    sort: Literal["added_at", "title", "author"] = Query("added_at", description="Sort key"),
+    order: Literal["asc", "desc"] = Query("asc", description="Sort order"),
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    db: Session = Depends(get_read_db),
+    current_user_id: uuid.UUID = Depends(get_current_user_id)
 ):
-    """Get user's library, optionally filtered by status"""
+    """Get page of user's library, optionally filtered by status (keyset pagination)"""
     book_repository = BookRepository()
     user_book_repository = UserBookRepository()
     library_service = LibraryService(book_repository, user_book_repository)
     
-    user_books = library_service.get_user_library(db, current_user.id, status)
+    try:
+        user_books, next_cursor = library_service.get_user_library_page(
+            db, current_user_id, book_status, sort=sort, descending=order == "desc",
+            limit=limit, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    # Library size is counted once, for the first page
+    total = None if cursor else library_service.count_user_library(db, current_user_id, book_status)
     return UserLibraryResponse(
         books=[_format_user_book_response(ub) for ub in user_books],
-        total=len(user_books)
+        total=total,
+        next_cursor=next_cursor
     )
 
 
 @router.put("/{book_id}/status", response_model=UserBookResponse)
-async def update_book_status(
+def update_book_status(
     book_id: str,
     request: UpdateBookStatusRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user_id: uuid.UUID = Depends(get_current_user_id)
 ):
     """Update book status in library"""
     from uuid import UUID
@@ -107,19 +121,18 @@ async def update_book_status(
     
     try:
         user_book = library_service.update_book_status(
-            db, current_user.id, book_uuid, request.status
+            db, current_user_id, book_uuid, request.status
         )
-        db.refresh(user_book)
         return _format_user_book_response(user_book)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 @router.delete("/{book_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def remove_from_library(
+def remove_from_library(
     book_id: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user_id: uuid.UUID = Depends(get_current_user_id)
 ):
     """Remove book from library"""
     from uuid import UUID
@@ -133,7 +146,7 @@ async def remove_from_library(
     user_book_repository = UserBookRepository()
     library_service = LibraryService(book_repository, user_book_repository)
     
-    success = library_service.remove_from_library(db, current_user.id, book_uuid)
+    success = library_service.remove_from_library(db, current_user_id, book_uuid)
     if not success:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Book not found in library")
 
@@ -0,0 +1,183 @@
+"""
+HTTP Range and conditional request helpers (RFC 9110) for serving book files
+"""
+from datetime import datetime
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import AsyncIterator, List, Optional, Tuple
+import inspect
+import uuid
+
+# More ranges than this in one request are served as a full response
+MAX_RANGES = 16
+
+
+class RangeNotSatisfiable(Exception):
+    """Raised when none of the requested ranges overlap the resource"""
+
+
+def parse_range_header(header: Optional[str], size: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Parse Range header into a list of inclusive (start, end) byte ranges.
+    Returns None when the header is absent or malformed (serve full content).
+    Overlapping and adjacent ranges are merged.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec.strip():
+        return None
+
+    ranges = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, sep, last = part.partition("-")
+        if not sep:
+            return None
+        first, last = first.strip(), last.strip()
+        try:
+            if first == "":
+                # Suffix range: last N bytes
+                suffix = int(last)
+                if suffix < 0:
+                    return None
+                if suffix == 0 or size == 0:
+                    continue
+                ranges.append((max(size - suffix, 0), size - 1))
+                continue
+            start = int(first)
+            end = int(last) if last else None
+        except ValueError:
+            return None
+        if start < 0 or (end is not None and end < start):
+            return None
+        if end is None:
+            end = size - 1
+        if start >= size:
+            continue
+        ranges.append((start, min(end, size - 1)))
+
+    if not ranges:
+        raise RangeNotSatisfiable()
+    if len(ranges) > MAX_RANGES:
+        return None
+    return _merge_ranges(ranges)
+
+
+def _merge_ranges(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Merge overlapping or adjacent ranges"""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def if_range_matches(
+    if_range: Optional[str],
+    etag: Optional[str],
+    last_modified: Optional[datetime]
+) -> bool:
+    """Check If-Range precondition; Range is honoured only when it matches"""
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        # Only strong validators may be used with If-Range
+        return etag is not None and not etag.startswith("W/") and if_range == etag
+    if last_modified is None:
+        return False
+    try:
+        return parsedate_to_datetime(if_range) == last_modified.replace(microsecond=0)
+    except (TypeError, ValueError):
+        return False
+
+
+def is_not_modified(
+    if_none_match: Optional[str],
+    if_modified_since: Optional[str],
+    etag: Optional[str],
+    last_modified: Optional[datetime]
+) -> bool:
+    """
+    Check whether a conditional GET can be answered with 304.
+    If-None-Match takes precedence; If-Modified-Since is only used without it.
+    """
+    if if_none_match:
+        if etag is None:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        # Weak comparison: W/ prefixes are ignored
+        opaque = etag[2:] if etag.startswith("W/") else etag
+        for candidate in if_none_match.split(","):
+            candidate = candidate.strip()
+            if candidate.startswith("W/"):
+                candidate = candidate[2:]
+            if candidate == opaque:
+                return True
+        return False
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            return False
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def content_range(start: int, end: int, size: int) -> str:
+    """Build Content-Range header value"""
+    return f"bytes {start}-{end}/{size}"
+
+
+def http_date(value: datetime) -> str:
+    """Format datetime as HTTP-date"""
+    return format_datetime(value, usegmt=True)
+
+
+class MultipartByteranges:
+    """multipart/byteranges body layout for a set of ranges"""
+
+    def __init__(self, ranges: List[Tuple[int, int]], size: int, media_type: str):
+        self.ranges = ranges
+        self.size = size
+        self.boundary = uuid.uuid4().hex
+        self.media_type = f"multipart/byteranges; boundary={self.boundary}"
+        self._part_headers = [
+            (
+                f"--{self.boundary}\r\n"
+                f"Content-Type: {media_type}\r\n"
+                f"Content-Range: {content_range(start, end, size)}\r\n\r\n"
+            ).encode("ascii")
+            for start, end in ranges
+        ]
+        self._closing = f"--{self.boundary}--\r\n".encode("ascii")
+
+    @property
+    def content_length(self) -> int:
+        """Total body length"""
+        body = sum(end - start + 1 for start, end in self.ranges)
+        headers = sum(len(h) for h in self._part_headers)
+        # Each part body is followed by CRLF
+        return body + headers + 2 * len(self.ranges) + len(self._closing)
+
+    async def iter_body(self, read_range) -> AsyncIterator[bytes]:
+        """
+        Yield body, streaming each range from read_range(start, end),
+        which returns (or is a coroutine returning) an async chunk iterator.
+        """
+        for header, (start, end) in zip(self._part_headers, self.ranges):
+            yield header
+            chunks = read_range(start, end)
+            if inspect.isawaitable(chunks):
+                chunks = await chunks
+            async for chunk in chunks:
+                yield chunk
+            yield b"\r\n"
+        yield self._closing
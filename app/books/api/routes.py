@@ -1,15 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import RedirectResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-import io
+from starlette.background import BackgroundTask
+from typing import BinaryIO, Optional
+from urllib.parse import quote
+import os
+import uuid
 
-from app.infrastructure.database import get_db
-from app.users.api.dependencies import get_current_user
-from app.users.domain.models import User
+from app.infrastructure.config import settings
+from app.infrastructure.database import get_async_read_db, get_db
+from app.users.api.dependencies import get_current_user_id
 from app.books.api.schemas import BookResponse, BookListResponse
 from app.books.domain.models import Book
 from app.books.application.book_service import BookService
+from app.books.application.page_index import PageDataUnavailable, PageIndexMismatch
 from app.books.infrastructure.book_repository import BookRepository
+from app.infrastructure.storage import FileStream
+from app.infrastructure.responses import SendfileResponse, aiter_file_range
+from app.books.api.ranges import (
+    MultipartByteranges,
+    RangeNotSatisfiable,
+    content_range,
+    http_date,
+    if_range_matches,
+    is_not_modified,
+    parse_range_header
+)
 
 router = APIRouter(prefix="/books", tags=["books"])
 
@@ -37,7 +55,7 @@ async def create_public_book(
     pages: int = Form(...),
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user_id: uuid.UUID = Depends(get_current_user_id)
 ):
     """Create public book (simplified - in production should be admin only)"""
     book_repository = BookRepository()
@@ -57,7 +75,7 @@ async def create_private_book(
     pages: int = Form(...),
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user_id: uuid.UUID = Depends(get_current_user_id)
 ):
     """Create private book (automatically added to library)"""
     from app.books.infrastructure.user_book_repository import UserBookRepository
@@ -68,7 +86,7 @@ async def create_private_book(
     
     try:
         book = await book_service.create_private_book(
-            db, title, author, pages, file, current_user.id
+            db, title, author, pages, file, current_user_id
         )
         return _format_book_response(book)
     except ValueError as e:
@@ -77,31 +95,38 @@ async def create_private_book(
 
 @router.get("/public", response_model=BookListResponse)
 async def get_public_books(
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user_id: uuid.UUID = Depends(get_current_user_id)
 ):
-    """Get all public books"""
+    """Get page of public books (keyset pagination)"""
     book_repository = BookRepository()
     book_service = BookService(book_repository, None)
     
-    books = book_service.get_public_books(db, skip=skip, limit=limit)
+    try:
+        books, next_cursor = await db.run_sync(
+            book_service.get_public_books_page, limit=limit, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    # Cached count of public books, returned with the first page
+    total = None if cursor else await db.run_sync(book_service.count_public_books)
     return BookListResponse(
         books=[_format_book_response(book) for book in books],
-        total=len(books)
+        total=total,
+        next_cursor=next_cursor
     )
 
 
-
-
 @router.get("/{book_id}/read", response_class=StreamingResponse)
 async def read_book(
     book_id: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user_id: uuid.UUID = Depends(get_current_user_id)
 ):
-    """Stream PDF book for reading"""
+    """Stream PDF book for reading (supports Range and conditional requests)"""
     from uuid import UUID
     
     try:
@@ -113,11 +138,11 @@ async def read_book(
     book_service = BookService(book_repository, None)
     
     # Check if user has access to book
-    book = book_service.get_book_by_id(db, book_uuid)
+    book = await db.run_sync(book_service.get_book_by_id, book_uuid)
     if not book:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Book not found")
     
-    if not book.is_public and book.owner_id != current_user.id:
+    if not book.is_public and book.owner_id != current_user_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
     
     # Check if book has PDF
@@ -127,28 +152,73 @@ async def read_book(
             detail="This book has no PDF file. It was added by ISBN without file."
         )
     
-    # Get file stream
+    # Let clients download directly from storage
+    if settings.BOOK_DELIVERY_MODE == "redirect":
+        url = await book_service.get_book_file_url(book)
+        if url:
+            return RedirectResponse(url, status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+    
+    headers = {
+        "Content-Disposition": f'inline; filename="{book.title}.pdf"',
+        "Accept-Ranges": "bytes"
+    }
+    
     try:
-        file_content = book_service.get_book_file_stream(db, book_uuid)
-        if not file_content:
+        range_header = request.headers.get("range")
+        if_range = request.headers.get("if-range")
+        
+        # Validators come from cached object metadata, so a 304 needs no body fetch
+        file_info = await book_service.get_book_file_info(book)
+        if file_info:
+            headers.update(_validator_headers(file_info))
+            if is_not_modified(
+                request.headers.get("if-none-match"),
+                request.headers.get("if-modified-since"),
+                file_info["etag"],
+                file_info["last_modified"]
+            ):
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        
+        # Serve from local disk (filesystem storage or cache for public
+        # books), through the proxy when configured; only full reads fill the cache
+        if not if_range:
+            local_file = await run_in_threadpool(
+                book_service.open_local_book_file, book, not range_header
+            )
+            if local_file is not None:
+                return _local_file_response(local_file, range_header, headers)
+        
+        if range_header:
+            if not file_info:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Book file not found in storage"
+                )
+            if if_range_matches(
+                if_range,
+                file_info["etag"],
+                file_info["last_modified"]
+            ):
+                response = await _range_response(book_service, book, range_header, file_info, headers)
+                if response is not None:
+                    return response
+        
+        # Stream file from storage in fixed-size chunks
+        file_stream = await book_service.get_book_file_stream(book)
+        if not file_stream:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Book file not found in storage"
             )
         
-        # Ensure file_content is bytes
-        if isinstance(file_content, str):
-            file_content = file_content.encode('utf-8')
-        
-        # Create response with proper binary content
+        headers["Content-Length"] = str(file_stream.content_length)
         return StreamingResponse(
-            io.BytesIO(file_content),
+            file_stream,
             media_type="application/pdf",
-            headers={
-                "Content-Disposition": f'inline; filename="{book.title}.pdf"',
-                "Content-Type": "application/pdf"
-            }
+            headers=headers
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -156,11 +226,166 @@ async def read_book(
         )
 
 
+@router.get("/{book_id}/pages/{page}")
+async def read_book_pages(
+    book_id: str,
+    page: int,
+    count: int = Query(1, ge=1, le=settings.PAGE_WINDOW_MAX),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user_id: uuid.UUID = Depends(get_current_user_id)
+):
+    """Get page (or window of count pages) of PDF book as a standalone PDF"""
+    from uuid import UUID
+    
+    try:
+        book_uuid = UUID(book_id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid book ID")
+    
+    book_repository = BookRepository()
+    book_service = BookService(book_repository, None)
+    
+    book = await db.run_sync(book_service.get_book_by_id, book_uuid)
+    if not book:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Book not found")
+    
+    if not book.is_public and book.owner_id != current_user_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
+    
+    try:
+        content = await book_service.get_book_pages(book, page, count)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except PageDataUnavailable as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    except PageIndexMismatch as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error reading book file: {str(e)}"
+        )
+    if content is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Page access is not available for this book"
+        )
+    
+    return Response(
+        content=content,
+        media_type="application/pdf",
+        headers={"Content-Disposition": f'inline; filename="{book.title} - {page}.pdf"'}
+    )
+
+
+async def _range_response(
+    book_service: BookService,
+    book: Book,
+    range_header: str,
+    file_info: dict,
+    headers: dict
+) -> Optional[Response]:
+    """Build 206/416 response for Range request, None to serve full content"""
+    size = file_info["size"]
+    try:
+        ranges = parse_range_header(range_header, size)
+    except RangeNotSatisfiable:
+        return _range_not_satisfiable(size)
+    if ranges is None:
+        return None
+    
+    async def read_range(start: int, end: int) -> FileStream:
+        file_stream = await book_service.get_book_file_stream(book, start, end)
+        if file_stream is None:
+            raise ConnectionError("Failed to read book file range from storage")
+        return file_stream
+    
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        file_stream = await read_range(start, end)
+        headers["Content-Range"] = content_range(start, end, size)
+        headers["Content-Length"] = str(file_stream.content_length)
+        return StreamingResponse(
+            file_stream,
+            status_code=status.HTTP_206_PARTIAL_CONTENT,
+            media_type="application/pdf",
+            headers=headers
+        )
+    
+    multipart = MultipartByteranges(ranges, size, "application/pdf")
+    headers["Content-Length"] = str(multipart.content_length)
+    return StreamingResponse(
+        multipart.iter_body(read_range),
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type=multipart.media_type,
+        headers=headers
+    )
+
+
+def _local_file_response(file: BinaryIO, range_header: Optional[str], headers: dict) -> Response:
+    """Serve book file (or Range of it) from an open local file"""
+    if settings.LOCAL_FILE_REDIRECT_PREFIX:
+        # Proxy sends the file itself (sendfile) and handles Range requests
+        path = os.path.realpath(file.name)
+        file.close()
+        headers["X-Accel-Redirect"] = quote(settings.LOCAL_FILE_REDIRECT_PREFIX.rstrip("/") + path)
+        return Response(media_type="application/pdf", headers=headers)
+    size = os.fstat(file.fileno()).st_size
+    ranges = None
+    if range_header:
+        try:
+            ranges = parse_range_header(range_header, size)
+        except RangeNotSatisfiable:
+            file.close()
+            return _range_not_satisfiable(size)
+    
+    if not ranges:
+        return SendfileResponse(file, media_type="application/pdf", headers=headers)
+    
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        headers["Content-Range"] = content_range(start, end, size)
+        return SendfileResponse(
+            file,
+            status_code=status.HTTP_206_PARTIAL_CONTENT,
+            media_type="application/pdf",
+            headers=headers,
+            offset=start,
+            count=end - start + 1
+        )
+    
+    multipart = MultipartByteranges(ranges, size, "application/pdf")
+    headers["Content-Length"] = str(multipart.content_length)
+    return StreamingResponse(
+        multipart.iter_body(lambda start, end: aiter_file_range(file, start, end)),
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type=multipart.media_type,
+        headers=headers,
+        background=BackgroundTask(file.close)
+    )
+
+
+def _validator_headers(file_info: dict) -> dict:
+    """Build ETag and Last-Modified headers from stored file metadata"""
+    headers = {}
+    if file_info.get("etag"):
+        headers["ETag"] = file_info["etag"]
+    if file_info.get("last_modified"):
+        headers["Last-Modified"] = http_date(file_info["last_modified"])
+    return headers
+
+
+def _range_not_satisfiable(size: int) -> Response:
+    """Build 416 response"""
+    return Response(
+        status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+        headers={"Content-Range": f"bytes */{size}", "Accept-Ranges": "bytes"}
+    )
+
+
 @router.delete("/{book_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_book(
     book_id: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user_id: uuid.UUID = Depends(get_current_user_id)
 ):
     """Delete private book"""
     from uuid import UUID
@@ -174,7 +399,7 @@ async def delete_book(
     book_service = BookService(book_repository, None)
     
     try:
-        book_service.delete_book(db, book_uuid, current_user.id)
+        await book_service.delete_book(db, book_uuid, current_user_id)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
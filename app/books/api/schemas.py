@@ -42,12 +42,14 @@ class UserBookResponse(BaseModel):
 
 class BookListResponse(BaseModel):
     books: list[BookResponse]
-    total: int
+    total: Optional[int] = None  # first page only, approximate
+    next_cursor: Optional[str] = None
 
 
 class UserLibraryResponse(BaseModel):
     books: list[UserBookResponse]
-    total: int
+    total: Optional[int] = None  # first page only
+    next_cursor: Optional[str] = None
 
 
 class AddBookByISBNRequest(BaseModel):
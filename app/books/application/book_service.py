@@ -1,17 +1,183 @@
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from collections import OrderedDict
+from datetime import datetime
+from typing import AsyncIterator, BinaryIO, Callable, List, Optional, Tuple
+import hashlib
+import json
+import threading
+import time
 import uuid
 from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+import anyio
 
 from app.books.domain.models import Book, UserBook, BookStatus
 from app.books.infrastructure.book_repository import BookRepository
-from app.infrastructure.storage import storage_service
+from app.books.infrastructure.blob_repository import BlobRepository
+from app.infrastructure.config import settings
+from app.infrastructure.database import unit_of_work
+from app.infrastructure.storage import storage_service, iter_upload_chunks, FileStream
+from app.infrastructure.file_cache import file_cache
+from app.infrastructure.pagination import decode_cursor, encode_cursor
+from app.infrastructure.types import uuid7
+from app.books.application.page_index import (
+    INDEX_VERSION, PageDataUnavailable, build_page_index, build_page_pdf
+)
+
+PDF_SIGNATURE = b"%PDF-"
+
+# Maximum number of page indexes kept in memory
+PAGE_INDEX_CACHE_SIZE = 256
+_page_index_cache: "OrderedDict[str, dict]" = OrderedDict()
+_page_index_cache_lock = threading.Lock()
+
+# Cached number of public books: [total, expires at (monotonic)]
+_public_books_total: list = [None, 0.0]
+_public_books_total_lock = threading.Lock()
+
+
+def _page_index_path(file_path: str) -> str:
+    """Storage path of the page index stored next to a book file"""
+    return f"{file_path}.pages.json"
+
+
+async def _read_file_bytes(
+    file_path: str,
+    start: Optional[int] = None,
+    end: Optional[int] = None
+) -> Optional[bytes]:
+    """Read stored file (or inclusive byte range) into memory"""
+    file_stream = await storage_service.get_file_stream(file_path, start, end)
+    if file_stream is None:
+        return None
+    return b"".join([chunk async for chunk in file_stream])
+
+
+async def _validated_pdf_chunks(file: UploadFile, max_size: int) -> AsyncIterator[bytes]:
+    """Yield upload chunks, rejecting non-PDF content and oversized files early"""
+    total = 0
+    async for chunk in iter_upload_chunks(file):
+        if total == 0 and not chunk.startswith(PDF_SIGNATURE):
+            raise ValueError("Only PDF files are allowed")
+        total += len(chunk)
+        if total > max_size:
+            raise ValueError(f"File size exceeds {max_size // (1024 * 1024)} MB limit")
+        yield chunk
+    if total == 0:
+        raise ValueError("File is empty")
 
 
 class BookService:
-    def __init__(self, book_repository: BookRepository, user_book_repository=None):
+    def __init__(
+        self,
+        book_repository: BookRepository,
+        user_book_repository=None,
+        blob_repository: Optional[BlobRepository] = None
+    ):
         self.book_repository = book_repository
         self.user_book_repository = user_book_repository
+        self.blob_repository = blob_repository or BlobRepository()
+
+    async def _hash_file(self, file: UploadFile, validate: bool) -> Tuple[str, int]:
+        """
+        Hash (and validate) uploaded PDF; returns (sha256, size).
+        The upload is already spooled locally by the server.
+        """
+        chunks = (
+            _validated_pdf_chunks(file, settings.MAX_UPLOAD_SIZE)
+            if validate else iter_upload_chunks(file)
+        )
+        digest = hashlib.sha256()
+        size = 0
+        async for chunk in chunks:
+            digest.update(chunk)
+            size += len(chunk)
+        await file.seek(0)
+        return digest.hexdigest(), size
+
+    async def _upload_blob(self, file: UploadFile, sha256: str) -> str:
+        """Upload PDF and its page index; returns the storage path"""
+        # Every upload gets a new key: a blob released concurrently (row
+        # deleted, object not yet) must not delete the object uploaded here
+        file_path = f"blobs/{sha256[:2]}/{sha256}-{uuid7().hex}.pdf"
+        try:
+            await storage_service.upload_stream(
+                iter_upload_chunks(file), file_path, file.content_type
+            )
+        except ConnectionError as e:
+            raise ValueError(f"Storage service unavailable: {str(e)}")
+        await self._store_page_index(file, file_path)
+        await file.seek(0)
+        return file_path
+
+    async def _delete_stored_file(self, file_path: str):
+        """Delete stored file and its page index"""
+        await storage_service.delete_file(file_path)
+        await storage_service.delete_file(_page_index_path(file_path))
+
+    async def _create_with_file(
+        self,
+        db: Session,
+        file: UploadFile,
+        validate: bool,
+        create_book: Callable[[str], Book]
+    ) -> Book:
+        """
+        Store uploaded PDF as a content-addressed blob and create its book
+        with create_book(file_path). Hashing, upload and page index build run
+        before the transaction, which only references the blob and writes
+        the book rows. If the same content is stored, nothing is uploaded
+        and the existing blob gets another reference.
+        """
+        sha256, size = await self._hash_file(file, validate)
+        with unit_of_work(db):
+            stored_path = self.blob_repository.get_live_path(db, sha256)
+        uploaded_path = None if stored_path else await self._upload_blob(file, sha256)
+
+        try:
+            while True:
+                with unit_of_work(db):
+                    file_path = self.blob_repository.add_reference(db, sha256)
+                    if file_path is None and uploaded_path is not None:
+                        blob = self.blob_repository.create(db, sha256, uploaded_path, size)
+                        file_path = blob.file_path if blob is not None else None
+                    if file_path is not None:
+                        book = create_book(file_path)
+                if file_path is not None:
+                    break
+                if uploaded_path is None:
+                    # The blob was deleted after the check; upload the content after all
+                    uploaded_path = await self._upload_blob(file, sha256)
+                # Otherwise the blob with this content was being released; the
+                # upload is registered on the next attempt
+        except BaseException:
+            if uploaded_path is not None:
+                await self._delete_stored_file(uploaded_path)
+            raise
+
+        if uploaded_path is not None and uploaded_path != file_path:
+            # Same content was registered concurrently; its copy is used
+            await self._delete_stored_file(uploaded_path)
+        return book
+
+    async def _store_page_index(self, file: UploadFile, file_path: str):
+        """
+        Build page index from the local upload and store it next to the file.
+        Books without an index are still readable, only not page by page.
+        """
+        index = await run_in_threadpool(build_page_index, file.file)
+        if index is None:
+            return
+
+        async def chunks():
+            yield json.dumps(index, separators=(",", ":")).encode("utf-8")
+
+        try:
+            await storage_service.upload_stream(
+                chunks(), _page_index_path(file_path), "application/json"
+            )
+        except ConnectionError as e:
+            print(f"Failed to store page index for {file_path}: {str(e)}")
 
     async def create_public_book(
         self,
@@ -22,24 +188,23 @@ class BookService:
         file: UploadFile
     ) -> Book:
         """Create public book (admin only in real app, here simplified)"""
-        # Upload file
-        file_path = f"public/{uuid.uuid4()}.pdf"
-        try:
-            await storage_service.upload_file(file, file_path)
-        except ConnectionError as e:
-            raise ValueError(f"Storage service unavailable: {str(e)}")
+        def create_book(file_path: str) -> Book:
+            return self.book_repository.create(db, Book(
+                id=uuid7(),
+                title=title,
+                author=author,
+                pages=pages,
+                isbn=None,
+                is_public=True,
+                owner_id=None,
+                file_path=file_path
+            ))
 
-        book = Book(
-            id=uuid.uuid4(),
-            title=title,
-            author=author,
-            pages=pages,
-            isbn=None,
-            is_public=True,
-            owner_id=None,
-            file_path=file_path
-        )
-        return self.book_repository.create(db, book)
+        book = await self._create_with_file(db, file, False, create_book)
+        with _public_books_total_lock:
+            if _public_books_total[0] is not None:
+                _public_books_total[0] += 1
+        return book
 
     async def create_private_book(
         self,
@@ -54,54 +219,85 @@ class BookService:
         # Validate file
         if file.content_type != "application/pdf":
             raise ValueError("Only PDF files are allowed")
-        
-        # Check file size (20 MB max)
-        file_content = await file.read()
-        if len(file_content) > 20 * 1024 * 1024:
-            raise ValueError("File size exceeds 20 MB limit")
-        
-        # Reset file pointer
-        file.file.seek(0)
 
-        # Upload file
-        file_path = f"private/{owner_id}/{uuid.uuid4()}.pdf"
-        try:
-            await storage_service.upload_file(file, file_path)
-        except ConnectionError as e:
-            raise ValueError(f"Storage service unavailable: {str(e)}")
+        def create_book(file_path: str) -> Book:
+            book = self.book_repository.create(db, Book(
+                id=uuid7(),
+                title=title,
+                author=author,
+                pages=pages,
+                isbn=None,
+                is_public=False,
+                owner_id=owner_id,
+                file_path=file_path
+            ))
 
-        book = Book(
-            id=uuid.uuid4(),
-            title=title,
-            author=author,
-            pages=pages,
-            isbn=None,
-            is_public=False,
-            owner_id=owner_id,
-            file_path=file_path
-        )
-        book = self.book_repository.create(db, book)
-        
-        # Automatically add private book to user's library
-        if self.user_book_repository:
-            from app.books.domain.models import UserBook, BookStatus
-            existing_user_book = self.user_book_repository.get_by_user_and_book(
-                db, owner_id, book.id
-            )
-            if not existing_user_book:
-                user_book = UserBook(
-                    id=uuid.uuid4(),
-                    user_id=owner_id,
-                    book_id=book.id,
-                    status=BookStatus.PLANNED
+            # Automatically add private book to user's library
+            if self.user_book_repository:
+                existing_user_book = self.user_book_repository.get_by_user_and_book(
+                    db, owner_id, book.id
                 )
-                self.user_book_repository.create(db, user_book)
-        
-        return book
+                if not existing_user_book:
+                    user_book = UserBook(
+                        id=uuid7(),
+                        user_id=owner_id,
+                        book_id=book.id,
+                        status=BookStatus.PLANNED,
+                        book_title=book.title,
+                        book_author=book.author
+                    )
+                    self.user_book_repository.create(db, user_book)
+            return book
+
+        # Upload file, checking PDF signature and size limit
+        return await self._create_with_file(db, file, True, create_book)
 
-    def get_public_books(self, db: Session, skip: int = 0, limit: int = 100) -> List[Book]:
-        """Get all public books"""
-        return self.book_repository.get_public_books(db, skip=skip, limit=limit)
+    def get_public_books(
+        self,
+        db: Session,
+        limit: int = 100,
+        after: Optional[Tuple[datetime, uuid.UUID]] = None
+    ) -> List[Book]:
+        """Get public books ordered by (created_at, id)"""
+        return self.book_repository.get_public_books(db, limit=limit, after=after)
+
+    def get_public_books_page(
+        self,
+        db: Session,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Book], Optional[str]]:
+        """Get page of public books after cursor and the cursor of the next page"""
+        after = None
+        if cursor:
+            values = decode_cursor(cursor)
+            try:
+                after = (datetime.fromisoformat(values[0]), uuid.UUID(values[1]))
+            except (IndexError, TypeError, ValueError):
+                raise ValueError("Invalid cursor")
+        # One extra row tells whether there is a next page
+        books = self.get_public_books(db, limit=limit + 1, after=after)
+        if len(books) <= limit:
+            return books, None
+        last = books[limit - 1]
+        return books[:limit], encode_cursor((last.created_at, last.id))
+
+    def count_public_books(self, db: Session) -> int:
+        """
+        Get approximate number of public books.
+        The count is cached per process for PUBLIC_BOOKS_TOTAL_TTL seconds;
+        in between only public books created by this process are added, so
+        other workers' books show up once the count expires.
+        """
+        now = time.monotonic()
+        with _public_books_total_lock:
+            total, expires_at = _public_books_total
+            if total is not None and expires_at > now:
+                return total
+        total = self.book_repository.count_public_books(db)
+        with _public_books_total_lock:
+            _public_books_total[:] = [total, now + settings.PUBLIC_BOOKS_TOTAL_TTL]
+        return total
 
     def get_user_books(self, db: Session, user_id: uuid.UUID) -> List[Book]:
         """Get all books for user (private + public)"""
@@ -111,44 +307,134 @@ class BookService:
         """Get book by ID"""
         return self.book_repository.get_by_id(db, book_id)
 
-    def delete_book(self, db: Session, book_id: uuid.UUID, user_id: uuid.UUID) -> bool:
+    async def delete_book(self, db: Session, book_id: uuid.UUID, user_id: uuid.UUID) -> bool:
         """Delete private book (only owner can delete)"""
-        book = self.book_repository.get_by_id(db, book_id)
-        if not book:
-            return False
+        # The transaction runs on a worker thread, storage calls on the event loop
+        deleted, file_path, file_unused = await run_in_threadpool(
+            self._delete_book_rows, db, book_id, user_id
+        )
         
-        if book.is_public:
-            raise ValueError("Cannot delete public books")
+        # Delete file from storage once no book uses it
+        if file_unused:
+            await self._delete_stored_file(file_path)
+            file_cache.discard(file_path)
+            with _page_index_cache_lock:
+                _page_index_cache.pop(file_path, None)
+        return deleted
+
+    def _delete_book_rows(
+        self, db: Session, book_id: uuid.UUID, user_id: uuid.UUID
+    ) -> Tuple[bool, Optional[str], bool]:
+        """Delete book row; returns (deleted, file path, whether the file is unused now)"""
+        with unit_of_work(db):
+            book = self.book_repository.get_by_id(db, book_id)
+            if not book:
+                return False, None, False
         
-        if book.owner_id != user_id:
-            raise ValueError("Only book owner can delete the book")
+            if book.is_public:
+                raise ValueError("Cannot delete public books")
         
-        # Delete file from storage
-        storage_service.delete_file(book.file_path)
+            if book.owner_id != user_id:
+                raise ValueError("Only book owner can delete the book")
         
-        # Delete book
-        self.book_repository.delete(db, book_id)
-        return True
+            # Delete book, releasing its reference to the stored file
+            file_path = book.file_path
+            file_unused = file_path is not None and self.blob_repository.release(db, file_path)
+            self.book_repository.delete(db, book_id)
+        return True, file_path, file_unused
 
-    def get_book_file_stream(self, db: Session, book_id: uuid.UUID) -> Optional[bytes]:
-        """Get book file as binary content"""
-        try:
-            book = self.book_repository.get_by_id(db, book_id)
-            if not book:
-                return None
-            
-            if not book.file_path:
-                return None  # Book has no PDF file
-            
-            # Get file as binary bytes directly
-            stream = storage_service.get_file_stream(book.file_path)
-            if stream:
-                # Read all bytes from BytesIO stream
-                stream.seek(0)  # Reset to beginning
-                return stream.read()
+    async def get_book_file_info(self, book: Book) -> Optional[dict]:
+        """Get stored file metadata (size, etag, last modified)"""
+        if not book.file_path:
+            return None
+        return await storage_service.get_file_info(book.file_path)
+
+    async def get_book_file_url(self, book: Book) -> Optional[str]:
+        """Get (cached) presigned URL for direct download from storage"""
+        if not book.file_path:
             return None
-        except Exception as e:
-            # Log error (in production use proper logging)
-            print(f"Error reading file for book {book_id}: {str(e)}")
+        url = await storage_service.get_file_url(book.file_path, filename=f"{book.title}.pdf")
+        return url or None
+
+    async def get_book_file_stream(
+        self,
+        book: Book,
+        start: Optional[int] = None,
+        end: Optional[int] = None
+    ) -> Optional[FileStream]:
+        """Open book file (or inclusive byte range) as a chunked stream"""
+        if not book.file_path:
+            return None  # Book has no PDF file
+        return await storage_service.get_file_stream(book.file_path, start, end)
+
+    async def get_page_index(self, book: Book) -> Optional[dict]:
+        """Load (cached) page index of book file, None if the book has none"""
+        if not book.file_path:
+            return None
+        with _page_index_cache_lock:
+            index = _page_index_cache.get(book.file_path)
+            if index is not None:
+                _page_index_cache.move_to_end(book.file_path)
+                return index
+
+        data = await _read_file_bytes(_page_index_path(book.file_path))
+        if data is None:
             return None
+        index = json.loads(data)
+        if index.get("version") != INDEX_VERSION:
+            return None
+
+        with _page_index_cache_lock:
+            _page_index_cache[book.file_path] = index
+            while len(_page_index_cache) > PAGE_INDEX_CACHE_SIZE:
+                _page_index_cache.popitem(last=False)
+        return index
+
+    async def get_book_pages(self, book: Book, page: int, count: int = 1) -> Optional[bytes]:
+        """
+        Build standalone PDF with count pages starting at page (1-based).
+        Only the objects these pages use are read from storage, unless they
+        make up most of the file, then it is read in a single request.
+        Returns None if the book has no page index. Raises ValueError for
+        pages out of range, PageDataUnavailable when storage cannot be read
+        and PageIndexMismatch when the file does not match its index.
+        """
+        index = await self.get_page_index(book)
+        if index is None:
+            return None
+        if page < 1 or page > len(index["pages"]):
+            raise ValueError(f"Page must be between 1 and {len(index['pages'])}")
+
+        async def read_range(start: int, end: int) -> bytes:
+            data = await _read_file_bytes(book.file_path, start, end)
+            if data is None:
+                raise PageDataUnavailable("Storage service unavailable")
+            return data
+
+        return await build_page_pdf(index, page - 1, count, read_range)
+
+    def open_local_book_file(self, book: Book, fill: bool = True) -> Optional[BinaryIO]:
+        """
+        Open book file from local disk: straight from a filesystem storage
+        backend, or for public books from the local disk cache.
+        On cache miss the file is copied from storage into the cache when fill is set.
+        Returns None when the file is not available locally.
+        Blocking: must be called from a worker thread.
+        """
+        if not book.file_path:
+            return None
+        local_file = storage_service.open_local_file(book.file_path)
+        if local_file is not None or not book.is_public or not file_cache.enabled:
+            return local_file
+        if not fill:
+            return file_cache.open(book.file_path)
+
+        def write_file(out: BinaryIO) -> bool:
+            file_stream = anyio.from_thread.run(storage_service.get_file_stream, book.file_path)
+            if file_stream is None:
+                return False
+            for chunk in file_stream:
+                out.write(chunk)
+            return True
 
+        return file_cache.get_or_fill(book.file_path, write_file)
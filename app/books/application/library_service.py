@@ -1,10 +1,15 @@
+from datetime import datetime
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import Optional, List
+from typing import Optional, List, Tuple
 import uuid
 
 from app.books.domain.models import Book, UserBook, BookStatus
 from app.books.infrastructure.book_repository import BookRepository
 from app.books.infrastructure.user_book_repository import UserBookRepository
+from app.infrastructure.database import unit_of_work
+from app.infrastructure.pagination import decode_cursor, encode_cursor
+from app.infrastructure.types import uuid7
 from app.integrations.application.google_books_service import GoogleBooksService
 
 
@@ -24,47 +29,77 @@ class LibraryService:
         isbn: str,
         status: BookStatus = BookStatus.PLANNED
     ) -> UserBook:
-        """Add book to user's library by ISBN"""
+        """
+        Add book to user's library by ISBN.
+        Database work runs on worker threads, the Google Books lookup on the
+        event loop.
+        """
         # Check if book already exists in system by ISBN
-        book = self.book_repository.get_by_isbn(db, isbn)
-        
+        book = await run_in_threadpool(self._find_by_isbn, db, isbn)
+
+        book_data = None
         if not book:
-            # Fetch book data from Google Books API
+            # Fetch book data from Google Books API, outside of a transaction
             google_books_service = GoogleBooksService()
             book_data = await google_books_service.get_book_by_isbn(isbn)
             await google_books_service.close()
-            
+
             if not book_data:
                 raise ValueError(f"Book with ISBN {isbn} not found")
-            
-            # Create book in system (without PDF)
-            book = Book(
-                id=uuid.uuid4(),
-                title=book_data["title"],
-                author=book_data["author"],
-                pages=book_data["pages"] or 0,
-                isbn=isbn,
-                is_public=False,
-                owner_id=None,
-                file_path=None  # No PDF file
-            )
-            book = self.book_repository.create(db, book)
-        
-        # Check if book already in user's library
-        existing_user_book = self.user_book_repository.get_by_user_and_book(
-            db, user_id, book.id
+
+        return await run_in_threadpool(
+            self._add_isbn_book, db, user_id, isbn, status, book, book_data
         )
-        if existing_user_book:
-            raise ValueError("Book already in your library")
+
+    def _find_by_isbn(self, db: Session, isbn: str) -> Optional[Book]:
+        with unit_of_work(db):
+            return self.book_repository.get_by_isbn(db, isbn)
+
+    def _add_isbn_book(
+        self,
+        db: Session,
+        user_id: uuid.UUID,
+        isbn: str,
+        status: BookStatus,
+        book: Optional[Book],
+        book_data: Optional[dict]
+    ) -> UserBook:
+        """Create book from book_data unless given or already added, and add it to library"""
+        with unit_of_work(db):
+            if not book:
+                # Another request may have added it during the API call
+                book = self.book_repository.get_by_isbn(db, isbn)
+            if not book:
+                # Create book in system (without PDF)
+                book = Book(
+                    id=uuid7(),
+                    title=book_data["title"],
+                    author=book_data["author"],
+                    pages=book_data["pages"] or 0,
+                    isbn=isbn,
+                    is_public=False,
+                    owner_id=None,
+                    file_path=None  # No PDF file
+                )
+                book = self.book_repository.create(db, book)
         
-        # Add to user's library
-        user_book = UserBook(
-            id=uuid.uuid4(),
-            user_id=user_id,
-            book_id=book.id,
-            status=status
-        )
-        return self.user_book_repository.create(db, user_book)
+            # Check if book already in user's library
+            existing_user_book = self.user_book_repository.get_by_user_and_book(
+                db, user_id, book.id
+            )
+            if existing_user_book:
+                raise ValueError("Book already in your library")
+        
+            # Add to user's library
+            user_book = UserBook(
+                id=uuid7(),
+                user_id=user_id,
+                book_id=book.id,
+                status=status,
+                book_title=book.title,
+                book_author=book.author
+            )
+            return self.user_book_repository.create(db, user_book)
 
     def add_public_book_to_library(
         self,
@@ -74,29 +109,32 @@ class LibraryService:
         status: BookStatus = BookStatus.PLANNED
     ) -> UserBook:
         """Add public book to user's library"""
-        # Check if book exists and is public
-        book = self.book_repository.get_by_id(db, book_id)
-        if not book:
-            raise ValueError("Book not found")
+        with unit_of_work(db):
+            # Check if book exists and is public
+            book = self.book_repository.get_by_id(db, book_id)
+            if not book:
+                raise ValueError("Book not found")
         
-        if not book.is_public:
-            raise ValueError("Book is not public")
+            if not book.is_public:
+                raise ValueError("Book is not public")
         
-        # Check if already in library
-        existing_user_book = self.user_book_repository.get_by_user_and_book(
-            db, user_id, book_id
-        )
-        if existing_user_book:
-            raise ValueError("Book already in your library")
+            # Check if already in library
+            existing_user_book = self.user_book_repository.get_by_user_and_book(
+                db, user_id, book_id
+            )
+            if existing_user_book:
+                raise ValueError("Book already in your library")
         
-        # Add to library
-        user_book = UserBook(
-            id=uuid.uuid4(),
-            user_id=user_id,
-            book_id=book_id,
-            status=status
-        )
-        return self.user_book_repository.create(db, user_book)
+            # Add to library
+            user_book = UserBook(
+                id=uuid7(),
+                user_id=user_id,
+                book_id=book_id,
+                status=status,
+                book_title=book.title,
+                book_author=book.author
+            )
+            return self.user_book_repository.create(db, user_book)
 
     def get_user_library(
         self,
@@ -107,6 +145,50 @@ class LibraryService:
         """Get user's library, optionally filtered by status"""
         return self.user_book_repository.get_user_library(db, user_id, status)
 
+    def get_user_library_page(
+        self,
+        db: Session,
+        user_id: uuid.UUID,
+        status: Optional[BookStatus] = None,
+        sort: str = "added_at",
+        descending: bool = False,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[UserBook], Optional[str]]:
+        """Get page of user's library after cursor and the cursor of the next page"""
+        after = None
+        if cursor:
+            values = decode_cursor(cursor)
+            # Cursor carries its sort key; it is not valid for another ordering
+            try:
+                if values[0] != sort or values[1] is None:
+                    raise ValueError
+                key = datetime.fromisoformat(values[1]) if sort == "added_at" else values[1]
+                if not isinstance(key, (str, datetime)):
+                    raise ValueError
+                after = (key, uuid.UUID(values[2]))
+            except (IndexError, TypeError, ValueError):
+                raise ValueError("Invalid cursor")
+        # One extra row tells whether there is a next page
+        user_books = self.user_book_repository.get_user_library(
+            db, user_id, status, sort=sort, descending=descending,
+            limit=limit + 1, after=after
+        )
+        if len(user_books) <= limit:
+            return user_books, None
+        last = user_books[limit - 1]
+        sort_value = last.added_at if sort == "added_at" else getattr(last, f"book_{sort}")
+        return user_books[:limit], encode_cursor((sort, sort_value, last.id))
+
+    def count_user_library(
+        self,
+        db: Session,
+        user_id: uuid.UUID,
+        status: Optional[BookStatus] = None
+    ) -> int:
+        """Get number of books in user's library"""
+        return self.user_book_repository.count_user_library(db, user_id, status)
+
     def update_book_status(
         self,
         db: Session,
@@ -115,12 +197,13 @@ class LibraryService:
         status: BookStatus
     ) -> UserBook:
         """Update book status in user's library"""
-        user_book = self.user_book_repository.update_status(
-            db, user_id, book_id, status
-        )
-        if not user_book:
-            raise ValueError("Book not found in your library")
-        return user_book
+        with unit_of_work(db):
+            user_book = self.user_book_repository.update_status(
+                db, user_id, book_id, status
+            )
+            if not user_book:
+                raise ValueError("Book not found in your library")
+            return user_book
 
     def remove_from_library(
         self,
@@ -129,6 +212,7 @@ class LibraryService:
         book_id: uuid.UUID
     ) -> bool:
         """Remove book from user's library"""
-        return self.user_book_repository.remove_from_library(db, user_id, book_id)
+        with unit_of_work(db):
+            return self.user_book_repository.remove_from_library(db, user_id, book_id)
 
 
@@ -0,0 +1,335 @@
+"""
+Page index for serving single pages of a stored PDF.
+
+The index is built once from the local upload. For every page it records
+which objects the page needs and where they live in the file, so a window
+of pages can be assembled into a standalone PDF from a few ranged reads
+instead of downloading the whole document. Objects shared between pages
+(fonts, images) are read for every window, so on documents where they make
+up most of the file the window is cut from a single full read instead.
+"""
+from bisect import bisect_right
+from typing import Awaitable, BinaryIO, Callable, Dict, List, Optional, Set, Tuple
+import asyncio
+import io
+import os
+import re
+import zlib
+
+from pypdf import PdfReader
+from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject
+
+INDEX_VERSION = 1
+
+# Page attributes that may be inherited from the page tree
+INHERITABLE_KEYS = ("/Resources", "/MediaBox", "/CropBox", "/Rotate")
+
+# Ranges closer than this are fetched with a single request
+RANGE_COALESCE_GAP = 16 * 1024
+
+# Read the whole file once the needed ranges cover this share of it
+FULL_READ_RATIO = 0.5
+
+
+class PageIndexMismatch(Exception):
+    """Raised when stored file does not match its page index"""
+
+
+class PageDataUnavailable(Exception):
+    """Raised by read_range when the stored file cannot be read"""
+
+
+def build_page_index(file: BinaryIO) -> Optional[dict]:
+    """Build page index for PDF file, None if the file is not supported"""
+    try:
+        file.seek(0)
+        reader = PdfReader(file)
+        if reader.is_encrypted:
+            return None
+        return _PageIndexBuilder(reader, file).build()
+    except Exception as e:
+        print(f"Could not build page index: {str(e)}")
+        return None
+    finally:
+        file.seek(0)
+
+
+class _PageIndexBuilder:
+    def __init__(self, reader: PdfReader, file: BinaryIO):
+        self.reader = reader
+        self.file = file
+        self.locations: Dict[int, Tuple[int, int]] = {}
+        for gen, entries in reader.xref.items():
+            if gen == 65535:
+                continue
+            for num, offset in entries.items():
+                self.locations[num] = (gen, offset)
+        file.seek(0, os.SEEK_END)
+        self.boundaries = sorted({offset for _, offset in self.locations.values()} | {file.tell()})
+        self.objects: Dict[str, dict] = {}
+        self.streams: Dict[str, dict] = {}
+
+    def build(self) -> dict:
+        pages = []
+        parents = {}
+        for page in self.reader.pages:
+            ref = page.indirect_reference
+            parent = dict.get(page, "/Parent")
+            if not isinstance(parent, IndirectObject):
+                raise ValueError("Page without parent")
+            deps = self._collect([ref], own_page=ref.idnum)
+            if str(parent.idnum) not in parents:
+                parents[str(parent.idnum)] = self._parent_entry(parent)
+            pages.append({
+                "num": ref.idnum,
+                "gen": ref.generation,
+                "parent": parent.idnum,
+                "deps": sorted(deps),
+            })
+        return {
+            "version": INDEX_VERSION,
+            "size": int(self.reader.trailer["/Size"]),
+            "length": self.boundaries[-1],
+            "pages": pages,
+            "parents": parents,
+            "objects": self.objects,
+            "streams": self.streams,
+        }
+
+    def _parent_entry(self, parent: IndirectObject) -> dict:
+        """Attributes pages inherit through parent, serialized as PDF text"""
+        inherited = {}
+        node = parent.get_object()
+        while isinstance(node, DictionaryObject):
+            for key in INHERITABLE_KEYS:
+                if key not in inherited and key in node:
+                    inherited[key] = dict.__getitem__(node, key)
+            node = node.get("/Parent")
+        deps = self._collect(list(inherited.values()), own_page=None)
+        return {
+            "gen": parent.generation,
+            "inherited": {key: _serialize(value) for key, value in inherited.items()},
+            "deps": sorted(deps),
+        }
+
+    def _collect(self, roots: list, own_page: Optional[int]) -> Set[int]:
+        """Object numbers reachable from roots, not crossing into other pages"""
+        deps: Set[int] = set()
+        pending = list(roots)
+        while pending:
+            value = pending.pop()
+            if isinstance(value, IndirectObject):
+                if value.idnum in deps:
+                    continue
+                target = value.get_object()
+                if (
+                    isinstance(target, DictionaryObject)
+                    and target.get("/Type") in ("/Page", "/Pages")
+                    and value.idnum != own_page
+                ):
+                    # Other pages and tree nodes are left out (resolve to null)
+                    continue
+                deps.add(value.idnum)
+                self._locate(value.idnum)
+                value = target
+            if isinstance(value, DictionaryObject):
+                pending.extend(v for k, v in dict.items(value) if k != "/Parent")
+            elif isinstance(value, ArrayObject):
+                pending.extend(list.__iter__(value))
+        return deps
+
+    def _locate(self, num: int):
+        """Record where object lives in the file"""
+        key = str(num)
+        if key in self.objects:
+            return
+        if num in self.locations:
+            gen, offset = self.locations[num]
+            self.objects[key] = {"gen": gen, "span": self._span(offset)}
+            return
+        stream_num, _ = self.reader.xref_objStm[num]
+        self.objects[key] = {"stream": stream_num}
+        if str(stream_num) not in self.streams:
+            self.streams[str(stream_num)] = self._stream_entry(stream_num)
+
+    def _span(self, offset: int) -> List[int]:
+        """[offset, length] up to the next object in the file"""
+        end = self.boundaries[bisect_right(self.boundaries, offset)]
+        return [offset, end - offset]
+
+    def _stream_entry(self, stream_num: int) -> dict:
+        """Location of object stream data and of objects inside it"""
+        stream = self.reader.get_object(stream_num)
+        filters = stream.get("/Filter")
+        if filters not in (None, "/FlateDecode", ["/FlateDecode"]) or "/DecodeParms" in stream:
+            raise ValueError("Unsupported object stream encoding")
+        _, offset = self.locations[stream_num]
+        span_offset, span_length = self._span(offset)
+        self.file.seek(span_offset)
+        raw = self.file.read(span_length)
+        start = re.search(rb"stream\r?\n", raw).end()
+        # Decoded stream object has no /Length; trailing EOL is harmless for zlib
+        end = raw.rfind(b"endstream")
+
+        data = stream.get_data()
+        first = int(stream["/First"])
+        header = data[:first].split()
+        nums = [int(n) for n in header[0::2]]
+        starts = [first + int(rel) for rel in header[1::2]]
+        ends = starts[1:] + [len(data)]
+        return {
+            "span": [offset + start, end - start],
+            "compressed": filters is not None,
+            "objects": {str(n): [s, e] for n, s, e in zip(nums, starts, ends)},
+        }
+
+
+def _serialize(value) -> str:
+    """PDF text of object (indirect references stay references)"""
+    buffer = io.BytesIO()
+    value.write_to_stream(buffer)
+    return buffer.getvalue().decode("latin-1")
+
+
+async def build_page_pdf(
+    index: dict,
+    first_page: int,
+    count: int,
+    read_range: Callable[[int, int], Awaitable[bytes]]
+) -> bytes:
+    """
+    Assemble standalone PDF with pages [first_page, first_page + count)
+    (0-based), reading only the needed byte ranges with read_range(start, end).
+    When these cover most of the file (shared resources), it is read whole.
+    Raises ValueError for pages out of range, PageIndexMismatch when the
+    file does not match the index.
+    """
+    pages = index["pages"][first_page:first_page + count]
+    if not pages:
+        raise ValueError("Page out of range")
+    parent_nums = list(dict.fromkeys(page["parent"] for page in pages))
+    needed = set()
+    for page in pages:
+        needed.update(page["deps"])
+    for parent_num in parent_nums:
+        needed.update(index["parents"][str(parent_num)]["deps"])
+
+    objects = index["objects"]
+    spans = {}
+    stream_nums = set()
+    for num in needed:
+        entry = objects[str(num)]
+        if "stream" in entry:
+            stream_nums.add(entry["stream"])
+        else:
+            spans[("obj", num)] = entry["span"]
+    for stream_num in stream_nums:
+        spans[("stream", stream_num)] = index["streams"][str(stream_num)]["span"]
+    length = index.get("length")
+    if length and sum(span[1] for span in spans.values()) >= FULL_READ_RATIO * length:
+        data = await _read_spans(spans, read_range, whole_length=length)
+    else:
+        data = await _read_spans(spans, read_range)
+
+    streams = {}
+    for stream_num in stream_nums:
+        raw = data[("stream", stream_num)]
+        if index["streams"][str(stream_num)]["compressed"]:
+            try:
+                raw = zlib.decompressobj().decompress(raw)
+            except zlib.error:
+                raise PageIndexMismatch("Page index does not match file")
+        streams[stream_num] = raw
+
+    out = bytearray(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+    xref: Dict[int, Tuple[int, int]] = {}
+    for num in sorted(needed):
+        entry = objects[str(num)]
+        xref[num] = (len(out), entry.get("gen", 0))
+        if "stream" in entry:
+            start, end = index["streams"][str(entry["stream"])]["objects"][str(num)]
+            out += f"{num} 0 obj\n".encode("ascii")
+            out += streams[entry["stream"]][start:end].strip()
+            out += b"\nendobj\n"
+        else:
+            out += _object_body(data[("obj", num)], num)
+            out += b"\n"
+
+    root_num = index["size"]
+    catalog_num = root_num + 1
+    for parent_num in parent_nums:
+        parent = index["parents"][str(parent_num)]
+        kids = " ".join(
+            f"{page['num']} {page['gen']} R" for page in pages if page["parent"] == parent_num
+        )
+        count = sum(1 for page in pages if page["parent"] == parent_num)
+        attrs = "".join(f" {key} {value}" for key, value in parent["inherited"].items())
+        xref[parent_num] = (len(out), parent["gen"])
+        out += (
+            f"{parent_num} {parent['gen']} obj\n"
+            f"<< /Type /Pages /Parent {root_num} 0 R /Kids [{kids}]"
+            f" /Count {count}{attrs} >>\nendobj\n"
+        ).encode("latin-1")
+    root_kids = " ".join(f"{num} {xref[num][1]} R" for num in parent_nums)
+    xref[root_num] = (len(out), 0)
+    out += (
+        f"{root_num} 0 obj\n<< /Type /Pages /Kids [{root_kids}]"
+        f" /Count {len(pages)} >>\nendobj\n"
+    ).encode("ascii")
+    xref[catalog_num] = (len(out), 0)
+    out += f"{catalog_num} 0 obj\n<< /Type /Catalog /Pages {root_num} 0 R >>\nendobj\n".encode("ascii")
+
+    xref_offset = len(out)
+    size = catalog_num + 1
+    out += f"xref\n0 {size}\n".encode("ascii")
+    for num in range(size):
+        if num in xref:
+            offset, gen = xref[num]
+            out += f"{offset:010d} {gen:05d} n\r\n".encode("ascii")
+        else:
+            out += b"0000000000 65535 f\r\n"
+    out += (
+        f"trailer\n<< /Size {size} /Root {catalog_num} 0 R >>\n"
+        f"startxref\n{xref_offset}\n%%EOF\n"
+    ).encode("ascii")
+    return bytes(out)
+
+
+def _object_body(fragment: bytes, num: int) -> bytes:
+    """Cut object definition out of the bytes between it and the next object"""
+    end = fragment.rfind(b"endobj")
+    body = fragment[:end + len(b"endobj")].lstrip()
+    if end < 0 or not body.startswith(f"{num} ".encode("ascii")):
+        raise PageIndexMismatch("Page index does not match file")
+    return body
+
+
+async def _read_spans(
+    spans: Dict[tuple, List[int]],
+    read_range: Callable[[int, int], Awaitable[bytes]],
+    whole_length: Optional[int] = None
+) -> Dict[tuple, bytes]:
+    """
+    Read spans concurrently, merging nearby ones into a single ranged read
+    (or all of them into one read of whole_length bytes from the start)
+    """
+    ordered = sorted(spans.items(), key=lambda item: item[1][0])
+    groups: List[Tuple[int, int, list]] = []
+    if whole_length is not None:
+        groups.append((0, whole_length, [key for key, _ in ordered]))
+        ordered = []
+    for key, (offset, length) in ordered:
+        end = offset + length
+        if groups and offset <= groups[-1][1] + RANGE_COALESCE_GAP:
+            start, group_end, keys = groups[-1]
+            groups[-1] = (start, max(group_end, end), keys + [key])
+        else:
+            groups.append((offset, end, [key]))
+
+    chunks = await asyncio.gather(*(read_range(start, end - 1) for start, end, _ in groups))
+    data = {}
+    for (start, _, keys), chunk in zip(groups, chunks):
+        for key in keys:
+            offset, length = spans[key]
+            data[key] = chunk[offset - start:offset - start + length]
+    return data
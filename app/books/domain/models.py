@@ -1,11 +1,10 @@
-from sqlalchemy import Column, String, Integer, Boolean, ForeignKey, DateTime, Enum as SQLEnum, UniqueConstraint
+from sqlalchemy import Column, String, Integer, BigInteger, Boolean, ForeignKey, DateTime, Enum as SQLEnum, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
-import uuid
 import enum
 
 from app.infrastructure.database import Base
-from app.infrastructure.types import GUID
+from app.infrastructure.types import GUID, uuid7
 
 
 class BookStatus(str, enum.Enum):
@@ -17,7 +16,7 @@ class BookStatus(str, enum.Enum):
 class Book(Base):
     __tablename__ = "books"
 
-    id = Column(GUID(), primary_key=True, default=uuid.uuid4)
+    id = Column(GUID(), primary_key=True, default=uuid7)
     title = Column(String, nullable=False, index=True)
     author = Column(String, nullable=False)
     pages = Column(Integer, nullable=False)
@@ -30,15 +29,55 @@ class Book(Base):
     # Relationships
     owner = relationship("User", foreign_keys=[owner_id])
 
+    __table_args__ = (
+        # Keyset pagination of the public catalogue
+        Index(
+            'ix_books_public_created_at_id', 'created_at', 'id',
+            postgresql_where=(is_public == True),
+            sqlite_where=(is_public == True)
+        ),
+        # Private books of an owner
+        Index(
+            'ix_books_owner_id', 'owner_id',
+            postgresql_where=(owner_id.isnot(None)),
+            sqlite_where=(owner_id.isnot(None))
+        ),
+    )
+
+    # Server defaults come back with the INSERT (RETURNING)
+    __mapper_args__ = {"eager_defaults": True}
+
+
+class FileBlob(Base):
+    """Content-addressed stored file shared by all books with the same PDF"""
+    __tablename__ = "file_blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    file_path = Column(String, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    ref_count = Column(Integer, default=1, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint('file_path', name='uq_file_blobs_file_path'),
+    )
+
+    # Server defaults come back with the INSERT (RETURNING)
+    __mapper_args__ = {"eager_defaults": True}
+
 
 class UserBook(Base):
     __tablename__ = "user_books"
 
-    id = Column(GUID(), primary_key=True, default=uuid.uuid4)
+    id = Column(GUID(), primary_key=True, default=uuid7)
     user_id = Column(GUID(), ForeignKey("users.id"), nullable=False)
     book_id = Column(GUID(), ForeignKey("books.id"), nullable=False)
     status = Column(SQLEnum(BookStatus), default=BookStatus.PLANNED, nullable=False)
     added_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Copies of the book's title and author (books are never edited), so the
+    # library is sorted by them with an index
+    book_title = Column(String, nullable=False)
+    book_author = Column(String, nullable=False)
 
     # Relationships
     user = relationship("User", foreign_keys=[user_id])
@@ -47,5 +86,13 @@ class UserBook(Base):
     # Unique constraint: one book can be added to user's library only once
     __table_args__ = (
         UniqueConstraint('user_id', 'book_id', name='uq_user_book'),
+        # Keyset pagination of a user's library, with and without status filter
+        Index('ix_user_books_user_added_at_id', 'user_id', 'added_at', 'id'),
+        Index('ix_user_books_user_status_added_at_id', 'user_id', 'status', 'added_at', 'id'),
+        Index('ix_user_books_user_book_title_id', 'user_id', 'book_title', 'id'),
+        Index('ix_user_books_user_book_author_id', 'user_id', 'book_author', 'id'),
     )
 
+    # Server defaults come back with the INSERT (RETURNING)
+    __mapper_args__ = {"eager_defaults": True}
+
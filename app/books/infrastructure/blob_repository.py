@@ -0,0 +1,63 @@
+from typing import Optional
+
+from sqlalchemy.orm import Session
+from sqlalchemy import update, delete
+from sqlalchemy.exc import IntegrityError
+
+from app.books.domain.models import FileBlob
+
+
+class BlobRepository:
+    def get_live_path(self, db: Session, sha256: str) -> Optional[str]:
+        """File path of live blob with content hash, None if content is not stored"""
+        return db.query(FileBlob.file_path).filter(
+            FileBlob.sha256 == sha256, FileBlob.ref_count > 0
+        ).scalar()
+
+    def add_reference(self, db: Session, sha256: str) -> Optional[str]:
+        """
+        Reference existing blob by content hash and return its file path.
+        Returns None if no live blob exists (content must be uploaded).
+        """
+        return db.execute(
+            update(FileBlob)
+            .where(FileBlob.sha256 == sha256, FileBlob.ref_count > 0)
+            .values(ref_count=FileBlob.ref_count + 1)
+            .returning(FileBlob.file_path)
+        ).scalar_one_or_none()
+
+    def create(self, db: Session, sha256: str, file_path: str, size: int) -> Optional[FileBlob]:
+        """
+        Register uploaded blob with one reference. If the same content was
+        registered concurrently, that blob gets the reference instead; its
+        file_path differs from the given one. Returns None if that blob is
+        being released meanwhile (retry once its row is gone).
+        """
+        try:
+            with db.begin_nested():
+                blob = FileBlob(sha256=sha256, file_path=file_path, size=size, ref_count=1)
+                db.add(blob)
+        except IntegrityError:
+            if self.add_reference(db, sha256) is None:
+                return None
+            blob = db.get(FileBlob, sha256)
+        return blob
+
+    def release(self, db: Session, file_path: str) -> bool:
+        """
+        Drop one reference to blob stored at file_path.
+        Returns True when the stored object is no longer referenced
+        (or is not a shared blob) and can be deleted.
+        """
+        result = db.execute(
+            update(FileBlob)
+            .where(FileBlob.file_path == file_path)
+            .values(ref_count=FileBlob.ref_count - 1)
+        )
+        if result.rowcount == 0:
+            return True
+        result = db.execute(
+            delete(FileBlob)
+            .where(FileBlob.file_path == file_path, FileBlob.ref_count <= 0)
+        )
+        return result.rowcount > 0
@@ -1,25 +1,57 @@
+from sqlalchemy import func, text
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import json
 import uuid
 
-from app.books.domain.models import Book
+from app.books.domain.models import Book, UserBook
+from app.infrastructure.database import AsyncRepository
+from app.infrastructure.pagination import keyset_after
+
+# Below this estimated number of rows counts are exact
+EXACT_COUNT_THRESHOLD = 100000
 
 
 class BookRepository:
     def create(self, db: Session, book: Book) -> Book:
         """Create book"""
         db.add(book)
-        db.commit()
-        db.refresh(book)
+        db.flush()
         return book
 
     def get_by_id(self, db: Session, book_id: uuid.UUID) -> Optional[Book]:
         """Get book by ID"""
         return db.query(Book).filter(Book.id == book_id).first()
 
-    def get_public_books(self, db: Session, skip: int = 0, limit: int = 100) -> List[Book]:
-        """Get all public books"""
-        return db.query(Book).filter(Book.is_public == True).offset(skip).limit(limit).all()
+    def get_public_books(
+        self,
+        db: Session,
+        limit: int = 100,
+        after: Optional[Tuple[datetime, uuid.UUID]] = None
+    ) -> List[Book]:
+        """Get page of public books ordered by (created_at, id), after given key"""
+        query = db.query(Book).filter(Book.is_public == True)
+        if after is not None:
+            query = query.filter(keyset_after(db, (Book.created_at, Book.id), after))
+        return query.order_by(Book.created_at, Book.id).limit(limit).all()
+
+    def count_public_books(self, db: Session) -> int:
+        """
+        Count public books. On PostgreSQL large counts come from the planner
+        estimate; an exact COUNT is only run when the estimate is small.
+        """
+        if db.get_bind().dialect.name == "postgresql":
+            plan = db.execute(
+                text("EXPLAIN (FORMAT JSON) SELECT 1 FROM books WHERE is_public")
+            ).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            estimate = int(plan[0]["Plan"]["Plan Rows"])
+            if estimate >= EXACT_COUNT_THRESHOLD:
+                return estimate
+        return db.query(func.count(Book.id)).filter(Book.is_public == True).scalar()
 
     def get_by_isbn(self, db: Session, isbn: str) -> Optional[Book]:
         """Get book by ISBN"""
@@ -27,16 +59,70 @@ class BookRepository:
 
     def get_user_books(self, db: Session, user_id: uuid.UUID) -> List[Book]:
         """Get all books accessible to user (private owned + public)"""
-        return db.query(Book).filter(
-            (Book.owner_id == user_id) | (Book.is_public == True)
+        # Two branches instead of OR, each served by its own index
+        # (ix_books_owner_id, ix_books_public_created_at_id)
+        owned = db.query(Book).filter(Book.owner_id == user_id, Book.is_public == False)
+        public = db.query(Book).filter(Book.is_public == True)
+        return owned.union_all(public).all()
+
+    def get_accessible_books(
+        self, db: Session, user_id: uuid.UUID, book_ids: List[uuid.UUID]
+    ) -> Dict[uuid.UUID, Book]:
+        """
+        Get books of book_ids the user may read (in library, public or owned),
+        in one query; inaccessible and unknown ids are missing from the result
+        """
+        if not book_ids:
+            return {}
+        rows = db.query(Book).outerjoin(
+            UserBook, (UserBook.book_id == Book.id) & (UserBook.user_id == user_id)
+        ).filter(
+            Book.id.in_(book_ids),
+            (UserBook.id.isnot(None)) | (Book.is_public == True) | (Book.owner_id == user_id)
         ).all()
+        return {book.id: book for book in rows}
 
     def delete(self, db: Session, book_id: uuid.UUID) -> bool:
         """Delete book"""
         book = db.query(Book).filter(Book.id == book_id).first()
         if book:
             db.delete(book)
-            db.commit()
+            db.flush()
             return True
         return False
 
+
+class AsyncBookRepository(AsyncRepository):
+    """Async variant of BookRepository"""
+    repository_class = BookRepository
+
+    async def create(self, db: AsyncSession, book: Book) -> Book:
+        return await self._run(db, self.repository.create, book)
+
+    async def get_by_id(self, db: AsyncSession, book_id: uuid.UUID) -> Optional[Book]:
+        return await self._run(db, self.repository.get_by_id, book_id)
+
+    async def get_public_books(
+        self,
+        db: AsyncSession,
+        limit: int = 100,
+        after: Optional[Tuple[datetime, uuid.UUID]] = None
+    ) -> List[Book]:
+        return await self._run(db, self.repository.get_public_books, limit=limit, after=after)
+
+    async def count_public_books(self, db: AsyncSession) -> int:
+        return await self._run(db, self.repository.count_public_books)
+
+    async def get_by_isbn(self, db: AsyncSession, isbn: str) -> Optional[Book]:
+        return await self._run(db, self.repository.get_by_isbn, isbn)
+
+    async def get_user_books(self, db: AsyncSession, user_id: uuid.UUID) -> List[Book]:
+        return await self._run(db, self.repository.get_user_books, user_id)
+
+    async def get_accessible_books(
+        self, db: AsyncSession, user_id: uuid.UUID, book_ids: List[uuid.UUID]
+    ) -> Dict[uuid.UUID, Book]:
+        return await self._run(db, self.repository.get_accessible_books, user_id, book_ids)
+
+    async def delete(self, db: AsyncSession, book_id: uuid.UUID) -> bool:
+        return await self._run(db, self.repository.delete, book_id)
@@ -1,16 +1,26 @@
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, contains_eager
+from typing import Any, List, Optional, Tuple
 import uuid
 
 from app.books.domain.models import UserBook, BookStatus
+from app.infrastructure.database import AsyncRepository
+from app.infrastructure.pagination import keyset_after
+
+# Library sort keys; UserBook.id breaks ties
+LIBRARY_SORT_COLUMNS = {
+    "added_at": UserBook.added_at,
+    "title": UserBook.book_title,
+    "author": UserBook.book_author,
+}
 
 
 class UserBookRepository:
     def create(self, db: Session, user_book: UserBook) -> UserBook:
         """Create user book relationship"""
         db.add(user_book)
-        db.commit()
-        db.refresh(user_book)
+        db.flush()
         return user_book
 
     def get_by_user_and_book(
@@ -23,14 +33,47 @@ class UserBookRepository:
         ).first()
 
     def get_user_library(
-        self, db: Session, user_id: uuid.UUID, status: Optional[BookStatus] = None
+        self,
+        db: Session,
+        user_id: uuid.UUID,
+        status: Optional[BookStatus] = None,
+        sort: str = "added_at",
+        descending: bool = False,
+        limit: Optional[int] = None,
+        after: Optional[Tuple[Any, uuid.UUID]] = None
     ) -> List[UserBook]:
-        """Get user's library books, optionally filtered by status"""
-        query = db.query(UserBook).filter(UserBook.user_id == user_id)
+        """
+        Get user's library books, optionally filtered by status, ordered by
+        (sort, id) and starting after given key
+        """
+        sort_column = LIBRARY_SORT_COLUMNS[sort]
+        # Books are loaded in the same statement (formatting touches each one)
+        query = db.query(UserBook).join(UserBook.book).options(
+            contains_eager(UserBook.book)
+        ).filter(UserBook.user_id == user_id)
         if status:
             query = query.filter(UserBook.status == status)
+        if after is not None:
+            query = query.filter(
+                keyset_after(db, (sort_column, UserBook.id), after, descending=descending)
+            )
+        if descending:
+            query = query.order_by(sort_column.desc(), UserBook.id.desc())
+        else:
+            query = query.order_by(sort_column, UserBook.id)
+        if limit is not None:
+            query = query.limit(limit)
         return query.all()
 
+    def count_user_library(
+        self, db: Session, user_id: uuid.UUID, status: Optional[BookStatus] = None
+    ) -> int:
+        """Count user's library books, optionally filtered by status"""
+        query = db.query(func.count(UserBook.id)).filter(UserBook.user_id == user_id)
+        if status:
+            query = query.filter(UserBook.status == status)
+        return query.scalar()
+
     def update_status(
         self, db: Session, user_id: uuid.UUID, book_id: uuid.UUID, status: BookStatus
     ) -> Optional[UserBook]:
@@ -38,8 +81,7 @@ class UserBookRepository:
         user_book = self.get_by_user_and_book(db, user_id, book_id)
         if user_book:
             user_book.status = status
-            db.commit()
-            db.refresh(user_book)
+            db.flush()
         return user_book
 
     def remove_from_library(
@@ -49,8 +91,49 @@ class UserBookRepository:
         user_book = self.get_by_user_and_book(db, user_id, book_id)
         if user_book:
             db.delete(user_book)
-            db.commit()
+            db.flush()
             return True
         return False
 
 
+class AsyncUserBookRepository(AsyncRepository):
+    """Async variant of UserBookRepository"""
+    repository_class = UserBookRepository
+
+    async def create(self, db: AsyncSession, user_book: UserBook) -> UserBook:
+        return await self._run(db, self.repository.create, user_book)
+
+    async def get_by_user_and_book(
+        self, db: AsyncSession, user_id: uuid.UUID, book_id: uuid.UUID
+    ) -> Optional[UserBook]:
+        return await self._run(db, self.repository.get_by_user_and_book, user_id, book_id)
+
+    async def get_user_library(
+        self,
+        db: AsyncSession,
+        user_id: uuid.UUID,
+        status: Optional[BookStatus] = None,
+        sort: str = "added_at",
+        descending: bool = False,
+        limit: Optional[int] = None,
+        after: Optional[Tuple[Any, uuid.UUID]] = None
+    ) -> List[UserBook]:
+        return await self._run(
+            db, self.repository.get_user_library, user_id, status,
+            sort=sort, descending=descending, limit=limit, after=after
+        )
+
+    async def count_user_library(
+        self, db: AsyncSession, user_id: uuid.UUID, status: Optional[BookStatus] = None
+    ) -> int:
+        return await self._run(db, self.repository.count_user_library, user_id, status)
+
+    async def update_status(
+        self, db: AsyncSession, user_id: uuid.UUID, book_id: uuid.UUID, status: BookStatus
+    ) -> Optional[UserBook]:
+        return await self._run(db, self.repository.update_status, user_id, book_id, status)
+
+    async def remove_from_library(
+        self, db: AsyncSession, user_id: uuid.UUID, book_id: uuid.UUID
+    ) -> bool:
+        return await self._run(db, self.repository.remove_from_library, user_id, book_id)
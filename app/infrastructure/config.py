@@ -1,22 +1,86 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import List, Optional
 
 
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str
+    # Read replicas (JSON list of URLs) for read-only endpoints
+    DATABASE_REPLICA_URLS: List[str] = []
+    # Failed replica is retried after this many seconds
+    DATABASE_REPLICA_RETRY_SECONDS: int = 30
+    # Replica lagging behind primary by more than this is taken out of rotation
+    DATABASE_REPLICA_MAX_LAG_SECONDS: float = 10
+    # Replica lag is checked at most this often
+    DATABASE_REPLICA_CHECK_SECONDS: int = 5
+    # After a commit the user reads from primary for this many seconds
+    DATABASE_REPLICA_STICKY_SECONDS: int = 5
 
     # JWT
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Authenticated users are cached in process for this many seconds
+    USER_CACHE_TTL: int = 60
+    USER_CACHE_SIZE: int = 10000
+    # Endpoints needing only the user id trust the token without a users lookup
+    AUTH_STATELESS: bool = False
 
-    # MinIO
-    MINIO_ENDPOINT: str
-    MINIO_ACCESS_KEY: str
-    MINIO_SECRET_KEY: str
+    # Storage backend: "s3" (MinIO), "filesystem" (files under STORAGE_DIR) or "memory"
+    STORAGE_BACKEND: str = "s3"
+    STORAGE_DIR: Optional[str] = None
+
+    # MinIO (required for the s3 storage backend)
+    MINIO_ENDPOINT: Optional[str] = None
+    MINIO_ACCESS_KEY: Optional[str] = None
+    MINIO_SECRET_KEY: Optional[str] = None
     MINIO_BUCKET_NAME: str = "books"
     MINIO_SECURE: bool = False
+    # Endpoint clients use for presigned URLs (defaults to MINIO_ENDPOINT)
+    MINIO_PUBLIC_ENDPOINT: Optional[str] = None
+    STORAGE_CHUNK_SIZE: int = 64 * 1024
+    # Connection pool size and number of concurrent blocking storage calls
+    STORAGE_MAX_CONNECTIONS: int = 20
+    STORAGE_MAX_WORKERS: int = 20
+    STORAGE_UPLOAD_PART_SIZE: int = 8 * 1024 * 1024  # S3 minimum is 5 MB
+    MAX_UPLOAD_SIZE: int = 20 * 1024 * 1024
+
+    # Book delivery: "stream" through the API or "redirect" to presigned URL
+    BOOK_DELIVERY_MODE: str = "stream"
+    PRESIGNED_URL_EXPIRES: int = 3600
+    # Cached presigned URLs are renewed this many seconds before expiry
+    PRESIGNED_URL_REFRESH_MARGIN: int = 300
+    # Object metadata (ETag, Last-Modified) is cached for this many seconds
+    FILE_INFO_CACHE_TTL: int = 300
+
+    # Local disk cache for public book files (disabled when dir is not set)
+    FILE_CACHE_DIR: Optional[str] = None
+    FILE_CACHE_MAX_BYTES: int = 1024 * 1024 * 1024
+    # Internal location of a reverse proxy (nginx X-Accel-Redirect) serving
+    # local files by absolute path; local files are then sent by the proxy
+    # with sendfile instead of being read through the application
+    LOCAL_FILE_REDIRECT_PREFIX: Optional[str] = None
+
+    # Maximum number of pages served by one page window request
+    PAGE_WINDOW_MAX: int = 10
+    # Number of public books is recounted after this many seconds
+    PUBLIC_BOOKS_TOTAL_TTL: int = 60
+    # Maximum number of updates in one progress sync batch
+    PROGRESS_BATCH_MAX: int = 500
+    # Page turns are buffered and written in batches: "memory" (this process)
+    # or "redis" (shared by all workers); disabled when not set
+    PROGRESS_BUFFER_BACKEND: Optional[str] = None
+    PROGRESS_BUFFER_REDIS_URL: Optional[str] = None
+    # Buffer is flushed after this many seconds or at this many entries
+    PROGRESS_BUFFER_FLUSH_SECONDS: float = 30
+    PROGRESS_BUFFER_MAX_PENDING: int = 1000
+    # Batches of a worker that has not renewed its lease for this many
+    # seconds (it crashed) are flushed by the other workers
+    PROGRESS_BUFFER_LEASE_SECONDS: int = 120
+    # Hour (server local time) of the in-process nightly streak job; disabled
+    # when not set (run python -m app.reading.application.streak_job instead)
+    STREAK_JOB_HOUR: Optional[int] = None
+    STREAK_JOB_CHUNK_SIZE: int = 10000
 
     # RabbitMQ
     RABBITMQ_URL: str
@@ -1,27 +1,282 @@
-from sqlalchemy import create_engine
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql import Delete, Insert, Select, Update
+from typing import Dict, Iterator, List, Optional
+import itertools
 import os
+import threading
+import time
+
+from app.infrastructure.config import settings
 
 # Check if we're in test environment
 _test_mode = os.getenv("PYTEST_CURRENT_TEST") is not None
 
+# Async drivers for database URL schemes
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def get_async_database_url(database_url: str) -> str:
+    """Switch database URL to the async driver of its dialect"""
+    scheme, sep, rest = database_url.partition("://")
+    dialect = scheme.split("+")[0]
+    if dialect not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver for database URL scheme: {scheme}")
+    return f"{ASYNC_DRIVERS[dialect]}{sep}{rest}"
+
+
+# INSERT constructs supporting ON CONFLICT, by dialect
+UPSERT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def upsert_insert(db: Session, model):
+    """INSERT ... ON CONFLICT statement for model in the session's dialect"""
+    dialect = db.get_bind().dialect.name
+    if dialect not in UPSERT_INSERTS:
+        raise ValueError(f"No upsert support for database dialect: {dialect}")
+    return UPSERT_INSERTS[dialect](model)
+
+
+# Replay lag of a PostgreSQL standby in seconds (0 once it has replayed
+# everything it received, as an idle primary writes nothing new)
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+    " ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+# Key (user id) of the current request for read-your-writes stickiness
+replica_sticky_key: ContextVar[Optional[str]] = ContextVar("replica_sticky_key", default=None)
+
+
+class ReplicaSet:
+    """
+    Read replicas used round-robin.
+    A replica that fails with a connection error, or lags behind the primary
+    by more than max_lag seconds (checked every check_interval seconds when
+    it is chosen), is skipped for retry_after seconds; with no healthy
+    replica reads go to the primary.
+    """
+
+    def __init__(
+        self,
+        engines: List[Engine],
+        retry_after: float,
+        max_lag: Optional[float] = None,
+        check_interval: float = 5
+    ):
+        self.engines = engines
+        self.retry_after = retry_after
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._unhealthy_until: Dict[int, float] = {}
+        self._checked_at: Dict[int, float] = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        for engine in engines:
+            event.listen(engine, "handle_error", self._on_error)
+
+    def choose(self) -> Optional[Engine]:
+        """Next healthy replica, None if there is none"""
+        now = time.monotonic()
+        for _ in range(len(self.engines)):
+            engine = self.engines[next(self._counter) % len(self.engines)]
+            with self._lock:
+                until = self._unhealthy_until.get(id(engine))
+                if until is not None and until > now:
+                    continue
+                self._unhealthy_until.pop(id(engine), None)
+                # One caller checks the lag, others use the last result
+                check = (
+                    self.max_lag is not None
+                    and self._checked_at.get(id(engine), float("-inf")) + self.check_interval <= now
+                )
+                if check:
+                    self._checked_at[id(engine)] = now
+            if check and not self._is_current(engine):
+                self.mark_unhealthy(engine)
+                continue
+            return engine
+        return None
+
+    def mark_unhealthy(self, engine: Engine):
+        """Take replica out of rotation for retry_after seconds"""
+        with self._lock:
+            self._unhealthy_until[id(engine)] = time.monotonic() + self.retry_after
+
+    def _is_current(self, engine: Engine) -> bool:
+        """Whether replica is reachable and lags less than max_lag"""
+        try:
+            lag = self._replica_lag(engine)
+        except SQLAlchemyError as e:
+            print(f"Failed to check replica lag: {str(e)}")
+            return False
+        return lag is None or lag <= self.max_lag
+
+    def _replica_lag(self, engine: Engine) -> Optional[float]:
+        """Replay lag in seconds, None where the dialect has no replication"""
+        if engine.dialect.name != "postgresql":
+            return None
+        with engine.connect() as connection:
+            return connection.execute(REPLICA_LAG_QUERY).scalar()
+
+    def _on_error(self, context):
+        if context.is_disconnect or isinstance(context.sqlalchemy_exception, OperationalError):
+            self.mark_unhealthy(context.engine)
+
+
+class _RecentWrites:
+    """Keys that committed writes recently (process-local)"""
+
+    def __init__(self):
+        self._written_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str):
+        now = time.monotonic()
+        with self._lock:
+            self._written_at[key] = now
+            if len(self._written_at) > 10000:
+                window = settings.DATABASE_REPLICA_STICKY_SECONDS
+                self._written_at = {
+                    k: t for k, t in self._written_at.items() if now - t < window
+                }
+
+    def is_recent(self, key: str, window: float) -> bool:
+        with self._lock:
+            written_at = self._written_at.get(key)
+        return written_at is not None and time.monotonic() - written_at < window
+
+
+recent_writes = _RecentWrites()
+
+
+class RoutingSession(Session):
+    """
+    Session that sends reads to read replicas.
+    Only sessions opened with replica_reads route anything; writes, locking
+    reads and every statement after the session's first flush go to the
+    primary. The replica is chosen once per transaction, so its reads see a
+    single replica instead of mixing replicas with different lag. After a commit the current sticky key (user) reads from the
+    primary for DATABASE_REPLICA_STICKY_SECONDS, so users see their own writes.
+    """
+
+    def __init__(
+        self,
+        primary: Optional[Engine] = None,
+        replicas: Optional[ReplicaSet] = None,
+        replica_reads: bool = False,
+        **kwargs
+    ):
+        super().__init__(**kwargs)
+        self.primary = primary
+        self.replicas = replicas
+        self.replica_reads = replica_reads
+        self.wrote = False
+        self.read_bind: Optional[Engine] = None
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.primary is None:
+            return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+        if not self._use_replica(clause):
+            return self.primary
+        if self.read_bind is None:
+            self.read_bind = self.replicas.choose() or self.primary
+        return self.read_bind
+
+    def _use_replica(self, clause) -> bool:
+        if not self.replica_reads or not self.replicas or self.wrote or self._flushing:
+            return False
+        if isinstance(clause, (Insert, Update, Delete)):
+            return False
+        if isinstance(clause, Select) and clause._for_update_arg is not None:
+            return False
+        key = replica_sticky_key.get()
+        return key is None or not recent_writes.is_recent(
+            key, settings.DATABASE_REPLICA_STICKY_SECONDS
+        )
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _after_flush(session, flush_context):
+    session.wrote = True
+
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _after_transaction_end(session, transaction):
+    if transaction.parent is None:
+        session.read_bind = None
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _after_commit(session):
+    key = replica_sticky_key.get()
+    if session.wrote and key is not None:
+        recent_writes.record(key)
+
+
 try:
     if _test_mode:
         # Use SQLite for tests
         database_url = "sqlite:///./test_app.db"
         engine = create_engine(database_url, connect_args={"check_same_thread": False}, echo=False)
+        async_engine = create_async_engine(get_async_database_url(database_url), echo=False)
+        replica_urls = []
     else:
-        from app.infrastructure.config import settings
         database_url = settings.DATABASE_URL
         engine = create_engine(database_url, echo=settings.DEBUG)
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        async_engine = create_async_engine(get_async_database_url(database_url), echo=settings.DEBUG)
+        replica_urls = settings.DATABASE_REPLICA_URLS
+    # pre_ping drops dead replica connections before they are used
+    replicas = ReplicaSet(
+        [create_engine(url, pool_pre_ping=True) for url in replica_urls],
+        settings.DATABASE_REPLICA_RETRY_SECONDS,
+        settings.DATABASE_REPLICA_MAX_LAG_SECONDS,
+        settings.DATABASE_REPLICA_CHECK_SECONDS
+    ) if replica_urls else None
+    # Async sessions choose replicas inside their greenlet, so the lag check
+    # runs through the async driver as well
+    async_replicas = ReplicaSet(
+        [
+            create_async_engine(get_async_database_url(url), pool_pre_ping=True).sync_engine
+            for url in replica_urls
+        ],
+        settings.DATABASE_REPLICA_RETRY_SECONDS,
+        settings.DATABASE_REPLICA_MAX_LAG_SECONDS,
+        settings.DATABASE_REPLICA_CHECK_SECONDS
+    ) if replica_urls else None
+    # Objects stay loaded after commit: the response is built from what the
+    # unit of work wrote, without reloading every row
+    SessionLocal = sessionmaker(
+        class_=RoutingSession, autocommit=False, autoflush=False, expire_on_commit=False,
+        primary=engine, replicas=replicas
+    )
+    # Expired attributes also could not be lazily reloaded outside of the
+    # session's greenlet
+    AsyncSessionLocal = async_sessionmaker(
+        sync_session_class=RoutingSession, autoflush=False, expire_on_commit=False,
+        primary=async_engine.sync_engine, replicas=async_replicas
+    )
 except Exception as e:
     # If database connection fails, create a dummy engine for imports
     # This allows tests to override it
     print(f"Warning: Could not create database engine: {e}")
     engine = None
     SessionLocal = None
+    async_engine = None
+    AsyncSessionLocal = None
 
 Base = declarative_base()
 
@@ -37,3 +292,66 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """Dependency for getting async database session (does not block the event loop)"""
+    if AsyncSessionLocal is None:
+        raise RuntimeError("Database session not initialized. Check database connection.")
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_read_db():
+    """Dependency for read-mostly endpoints: reads may go to a replica"""
+    if SessionLocal is None:
+        raise RuntimeError("Database session not initialized. Check database connection.")
+    db = SessionLocal(replica_reads=True)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db():
+    """Async variant of get_read_db"""
+    if AsyncSessionLocal is None:
+        raise RuntimeError("Database session not initialized. Check database connection.")
+    async with AsyncSessionLocal(replica_reads=True) as db:
+        yield db
+
+
+@contextmanager
+def unit_of_work(db: Session) -> Iterator[Session]:
+    """
+    Transaction scope of a service operation.
+    Repositories only flush; the outermost unit of work commits once at the
+    end (or rolls back on error). Nested units of work join the outer one.
+    """
+    depth = db.info.get("unit_of_work_depth", 0)
+    db.info["unit_of_work_depth"] = depth + 1
+    try:
+        yield db
+        if depth == 0:
+            db.commit()
+    except BaseException:
+        if depth == 0:
+            db.rollback()
+        raise
+    finally:
+        db.info["unit_of_work_depth"] = depth
+
+
+class AsyncRepository:
+    """
+    Base for async variants of repositories.
+    Query logic lives in the sync repository; async methods run it with
+    AsyncSession.run_sync, so I/O goes through the async driver while the
+    event loop keeps serving other requests.
+    """
+    repository_class = None
+
+    def __init__(self, repository=None):
+        self.repository = repository or self.repository_class()
+
+    async def _run(self, db: AsyncSession, method, *args, **kwargs):
+        """Run sync repository method on the async session"""
+        return await db.run_sync(method, *args, **kwargs)
@@ -0,0 +1,180 @@
+"""
+Bounded local disk cache for storage objects
+"""
+from contextlib import contextmanager, suppress
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional
+import fcntl
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+from app.infrastructure.config import settings
+
+# Temporary files older than this are leftovers of interrupted fills
+STALE_FILL_SECONDS = 3600
+
+LOCK_FILE_NAME = ".lock"
+
+
+class FileCache:
+    """
+    Size-bounded LRU cache of storage objects on local disk.
+    Entries are keyed by storage file path. The directory itself is the
+    index (recency is the file mtime), so worker processes sharing it see
+    the same entries and the size limit holds for all of them together.
+    Fills are written to a temporary file and atomically renamed into
+    place; eviction runs under an exclusive lock on the directory, and
+    files already opened stay readable after they are evicted.
+    Concurrent misses for the same key within a process are collapsed
+    into a single fill (single-flight).
+    """
+
+    def __init__(self, directory: Optional[str], max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._fill_locks: Dict[str, List] = {}
+        self._ready = False
+
+    @property
+    def enabled(self) -> bool:
+        """Cache is enabled when a directory is configured"""
+        return self.directory is not None
+
+    def open(self, key: str) -> Optional[BinaryIO]:
+        """Open cached entry for reading, None on miss"""
+        if not self.enabled:
+            return None
+        self._prepare()
+        path = os.path.join(self.directory, self._name(key))
+        try:
+            file = open(path, "rb")
+        except FileNotFoundError:
+            return None
+        with suppress(FileNotFoundError):
+            _touch(path)
+        return file
+
+    def get_or_fill(self, key: str, writer: Callable[[BinaryIO], bool]) -> Optional[BinaryIO]:
+        """
+        Open cached entry, filling it on miss with writer(file).
+        writer returns False if the source is unavailable.
+        Only one fill per key runs at a time; other callers wait for it.
+        """
+        cached = self.open(key)
+        if cached is not None or not self.enabled:
+            return cached
+        name = self._name(key)
+        fill_lock = self._acquire_fill_lock(name)
+        try:
+            with fill_lock:
+                cached = self.open(key)
+                if cached is not None:
+                    return cached
+                if not self._fill(name, writer):
+                    return None
+                return self.open(key)
+        finally:
+            self._release_fill_lock(name)
+
+    def discard(self, key: str):
+        """Remove entry from cache"""
+        if not self.enabled:
+            return
+        with suppress(FileNotFoundError):
+            os.remove(os.path.join(self.directory, self._name(key)))
+
+    def _fill(self, name: str, writer: Callable[[BinaryIO], bool]) -> bool:
+        """Write entry to temporary file and move it into place"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                if not writer(out):
+                    return False
+                size = out.tell()
+            if size > self.max_bytes:
+                return False
+            with self._directory_lock():
+                _touch(tmp_path)
+                os.replace(tmp_path, os.path.join(self.directory, name))
+                self._evict()
+            return True
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _evict(self):
+        """Remove least recently used entries until cache fits (directory lock held)"""
+        entries = []
+        total_bytes = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith(".") or entry.name.endswith(".tmp") or not entry.is_file():
+                continue
+            with suppress(FileNotFoundError):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, entry.name, stat.st_size))
+                total_bytes += stat.st_size
+        for _, name, size in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            with suppress(FileNotFoundError):
+                os.remove(os.path.join(self.directory, name))
+            total_bytes -= size
+
+    @contextmanager
+    def _directory_lock(self) -> Iterator[None]:
+        """Exclusive lock on cache directory (held per open file, so threads exclude each other too)"""
+        with open(os.path.join(self.directory, LOCK_FILE_NAME), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _acquire_fill_lock(self, name: str) -> threading.Lock:
+        with self._lock:
+            entry = self._fill_locks.setdefault(name, [threading.Lock(), 0])
+            entry[1] += 1
+            return entry[0]
+
+    def _release_fill_lock(self, name: str):
+        with self._lock:
+            entry = self._fill_locks[name]
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._fill_locks[name]
+
+    def _prepare(self):
+        """Create directory and clean it up on first use"""
+        if self._ready:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        with self._directory_lock():
+            if self._ready:
+                return
+            stale_before = time.time() - STALE_FILL_SECONDS
+            for entry in os.scandir(self.directory):
+                # Fills of other processes may be running, only old ones are removed
+                if entry.name.endswith(".tmp"):
+                    with suppress(FileNotFoundError):
+                        if entry.stat().st_mtime < stale_before:
+                            os.remove(entry.path)
+            # Limit may have been lowered since the entries were written
+            self._evict()
+            self._ready = True
+
+    @staticmethod
+    def _name(key: str) -> str:
+        """File name for cache key"""
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def _touch(path: str):
+    """Mark file as most recently used (timestamps finer than the kernel clock tick)"""
+    now = time.time_ns()
+    os.utime(path, ns=(now, now))
+
+
+file_cache = FileCache(settings.FILE_CACHE_DIR, settings.FILE_CACHE_MAX_BYTES)
@@ -1,6 +1,6 @@
 import pika
 import json
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
 from app.infrastructure.config import settings
 
 
@@ -36,24 +36,32 @@ class MessageBroker:
 
     def publish_event(self, event_type: str, data: Dict[str, Any]):
         """Publish event to message broker"""
+        return self.publish_events([(event_type, data)])
+
+    def publish_events(self, events: List[Tuple[str, Dict[str, Any]]]):
+        """Publish batch of (event_type, data) events over one channel"""
+        if not events:
+            return True
         if not self.channel:
             self._connect()
             if not self.channel:
                 return False
 
         try:
-            message = {
-                "event": event_type,
-                **data
-            }
-            self.channel.basic_publish(
-                exchange='bookflow_events',
-                routing_key=event_type,
-                body=json.dumps(message),
-                properties=pika.BasicProperties(
-                    delivery_mode=2,  # Make message persistent
-                )
+            properties = pika.BasicProperties(
+                delivery_mode=2,  # Make message persistent
             )
+            for event_type, data in events:
+                message = {
+                    "event": event_type,
+                    **data
+                }
+                self.channel.basic_publish(
+                    exchange='bookflow_events',
+                    routing_key=event_type,
+                    body=json.dumps(message),
+                    properties=properties
+                )
             return True
         except Exception as e:
             print(f"Failed to publish event: {e}")
@@ -0,0 +1,66 @@
+"""
+Keyset (cursor) pagination helpers
+"""
+from datetime import datetime
+from typing import Any, List, Sequence
+import base64
+import json
+import uuid
+
+from sqlalchemy import String, literal, tuple_, type_coerce
+from sqlalchemy.orm import Session
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Encode sort key of the last row as an opaque cursor token"""
+    raw = json.dumps([
+        value.isoformat() if isinstance(value, datetime) else
+        str(value) if isinstance(value, uuid.UUID) else value
+        for value in values
+    ], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str) -> List[Any]:
+    """Decode cursor token into raw sort key values (strings stay strings)"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def keyset_after(db: Session, columns: Sequence, values: Sequence[Any], descending: bool = False):
+    """
+    Filter for rows strictly after values in (columns) order, as one
+    row-value comparison that can use a composite index.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        columns, values = _sqlite_datetimes(columns, values)
+    else:
+        values = [literal(value, column.type) for column, value in zip(columns, values)]
+    left, right = tuple_(*columns), tuple_(*values)
+    return left < right if descending else left > right
+
+
+def _sqlite_datetimes(columns: Sequence, values: Sequence[Any]):
+    """
+    SQLite stores datetimes as text, CURRENT_TIMESTAMP without fractional
+    seconds; compare as text in the format the row was stored in.
+    """
+    coerced_columns, coerced_values = [], []
+    for column, value in zip(columns, values):
+        if isinstance(value, datetime):
+            value = value.replace(tzinfo=None)
+            text = value.strftime("%Y-%m-%d %H:%M:%S")
+            if value.microsecond:
+                text += f".{value.microsecond:06d}"
+            coerced_columns.append(type_coerce(column, String))
+            coerced_values.append(literal(text, String))
+        else:
+            coerced_columns.append(column)
+            coerced_values.append(literal(value, column.type))
+    return coerced_columns, coerced_values
@@ -0,0 +1,92 @@
+"""
+Response classes for serving local files
+"""
+from typing import AsyncIterator, BinaryIO, Mapping, Optional
+import os
+
+import anyio
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+ZEROCOPY_EXTENSION = "http.response.zerocopy"
+
+
+class SendfileResponse(Response):
+    """
+    Serve a byte range of an open file.
+    Uses the ASGI zero-copy extension (sendfile) when the server supports it,
+    otherwise reads the file in chunks off the event loop. Uvicorn does not
+    offer the extension, so under it responses always take the chunked path;
+    set LOCAL_FILE_REDIRECT_PREFIX to let a reverse proxy send local files.
+    The file is closed once the response is sent.
+    """
+    chunk_size = 64 * 1024
+
+    def __init__(
+        self,
+        file: BinaryIO,
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+        media_type: Optional[str] = None,
+        offset: int = 0,
+        count: Optional[int] = None
+    ):
+        self.file = file
+        self.status_code = status_code
+        self.media_type = media_type
+        self.background = None
+        self.offset = offset
+        self.count = os.fstat(file.fileno()).st_size - offset if count is None else count
+        self.init_headers(headers)
+        self.headers["content-length"] = str(self.count)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": self.status_code,
+                    "headers": self.raw_headers,
+                }
+            )
+            if ZEROCOPY_EXTENSION in scope.get("extensions", {}):
+                await send(
+                    {
+                        "type": ZEROCOPY_EXTENSION,
+                        "file": self.file,
+                        "offset": self.offset,
+                        "count": self.count,
+                        "more_body": False,
+                    }
+                )
+                return
+            remaining = self.count
+            await anyio.to_thread.run_sync(self.file.seek, self.offset)
+            while True:
+                chunk = await anyio.to_thread.run_sync(
+                    self.file.read, min(self.chunk_size, remaining)
+                )
+                remaining -= len(chunk)
+                more_body = remaining > 0 and len(chunk) > 0
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+                if not more_body:
+                    break
+        finally:
+            self.file.close()
+
+
+async def aiter_file_range(
+    file: BinaryIO,
+    start: int,
+    end: int,
+    chunk_size: int = SendfileResponse.chunk_size
+) -> AsyncIterator[bytes]:
+    """Read inclusive byte range of an open file in chunks off the event loop"""
+    await anyio.to_thread.run_sync(file.seek, start)
+    remaining = end - start + 1
+    while remaining > 0:
+        chunk = await anyio.to_thread.run_sync(file.read, min(chunk_size, remaining))
+        if not chunk:
+            break
+        remaining -= len(chunk)
+        yield chunk
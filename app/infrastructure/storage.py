@@ -1,127 +1,233 @@
-import boto3
-from botocore.config import Config
-from botocore.exceptions import ClientError, EndpointConnectionError
 from fastapi import UploadFile
-from typing import Optional
-import io
-import os
+from collections import OrderedDict
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import AsyncIterator, BinaryIO, Callable, Iterator, Optional, Tuple
+import asyncio
+import functools
+import threading
+import time
 
 from app.infrastructure.config import settings
+from app.infrastructure.storage_backends import StorageBackend, create_storage_backend
 
+# Maximum number of cached presigned URLs
+URL_CACHE_SIZE = 10000
+# Maximum number of cached object metadata entries
+INFO_CACHE_SIZE = 10000
 
-class StorageService:
-    def __init__(self):
-        self._client = None
-        self._bucket_name = settings.MINIO_BUCKET_NAME
-        self._initialized = False
-
-    @property
-    def client(self):
-        """Lazy initialization of S3 client"""
-        if self._client is None:
-            # Skip initialization in test environment if MinIO is not available
-            if os.getenv("PYTEST_CURRENT_TEST") is not None:
-                # In tests, we'll handle errors gracefully
-                pass
-            try:
-                self._client = boto3.client(
-                    's3',
-                    endpoint_url=f"http://{settings.MINIO_ENDPOINT}",
-                    aws_access_key_id=settings.MINIO_ACCESS_KEY,
-                    aws_secret_access_key=settings.MINIO_SECRET_KEY,
-                    config=Config(signature_version='s3v4'),
-                    region_name='us-east-1'
-                )
-                if not self._initialized:
-                    self._ensure_bucket_exists()
-                    self._initialized = True
-            except Exception:
-                # In test environment, allow client to be None
-                if os.getenv("PYTEST_CURRENT_TEST") is not None:
-                    return None
-                raise
-        return self._client
-
-    @property
-    def bucket_name(self):
-        """Get bucket name"""
-        return self._bucket_name
-
-    def _ensure_bucket_exists(self):
-        """Create bucket if it doesn't exist"""
-        if self.client is None:
-            return
+
+class FileStream:
+    """
+    Chunked reader over a storage object body (any file-like object).
+    Iterating yields fixed-size chunks and closes the body when exhausted,
+    so only one chunk is held in memory at a time. Async iteration reads
+    chunks on the storage executor instead of the event loop.
+    """
+
+    def __init__(
+        self,
+        body,
+        content_length: int,
+        chunk_size: Optional[int] = None,
+        executor: Optional[Executor] = None
+    ):
+        self._body = body
+        self.content_length = content_length
+        self.chunk_size = chunk_size or settings.STORAGE_CHUNK_SIZE
+        self._executor = executor
+
+    def __iter__(self) -> Iterator[bytes]:
         try:
-            self.client.head_bucket(Bucket=self.bucket_name)
-        except (ClientError, EndpointConnectionError):
-            try:
-                self.client.create_bucket(Bucket=self.bucket_name)
-            except Exception:
-                # Silently fail during tests if MinIO is not available
-                pass
+            while True:
+                chunk = self._body.read(self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            self.close()
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                chunk = await loop.run_in_executor(self._executor, self._body.read, self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            self.close()
+
+    def close(self):
+        """Release the underlying connection"""
+        self._body.close()
+
+
+async def iter_upload_chunks(
+    file: UploadFile,
+    chunk_size: Optional[int] = None
+) -> AsyncIterator[bytes]:
+    """Read uploaded file in fixed-size chunks"""
+    chunk_size = chunk_size or settings.STORAGE_CHUNK_SIZE
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+class StorageService:
+    """
+    Async facade over a StorageBackend.
+    Blocking backend calls run on a dedicated executor, and presigned URLs
+    and object metadata are cached here for every backend.
+    """
+
+    def __init__(self, backend: Optional[StorageBackend] = None):
+        self.backend = backend or create_storage_backend()
+        self._url_cache: "OrderedDict[tuple, Tuple[str, float]]" = OrderedDict()
+        self._url_cache_lock = threading.Lock()
+        self._info_cache: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
+        self._info_cache_lock = threading.Lock()
+        # Blocking storage calls run here, never on the event loop
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.STORAGE_MAX_WORKERS,
+            thread_name_prefix="storage"
+        )
+
+    async def _run(self, func: Callable, *args, **kwargs):
+        """Run blocking storage call on the storage executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, *args, **kwargs)
+        )
 
     async def upload_file(self, file: UploadFile, file_path: str) -> str:
         """Upload file to storage"""
-        if self.client is None:
-            raise ConnectionError("Storage service is not available")
-        file_content = await file.read()
+        return await self.upload_stream(
+            iter_upload_chunks(file), file_path, file.content_type
+        )
+
+    async def upload_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        file_path: str,
+        content_type: Optional[str] = None
+    ) -> str:
+        """
+        Upload file from an async chunk iterator.
+        Chunks are collected into parts of STORAGE_UPLOAD_PART_SIZE and each
+        part is handed to the writer without a copy, so only one part is held
+        in memory. Any error raised by the iterator
+        (e.g. a size limit) aborts the upload.
+        """
+        part_size = settings.STORAGE_UPLOAD_PART_SIZE
+        writer = await self._run(self.backend.open_writer, file_path, content_type)
+        buffer = bytearray()
         try:
-            self.client.put_object(
-                Bucket=self.bucket_name,
-                Key=file_path,
-                Body=file_content,
-                ContentType=file.content_type
-            )
-        except (ClientError, EndpointConnectionError) as e:
-            raise ConnectionError(f"Failed to upload file to storage: {str(e)}")
+            async for chunk in chunks:
+                buffer.extend(chunk)
+                if len(buffer) >= part_size:
+                    await self._run(writer.write, memoryview(buffer))
+                    buffer = bytearray()
+            if buffer:
+                await self._run(writer.write, memoryview(buffer))
+            await self._run(writer.commit)
+        except BaseException as e:
+            # Abort runs to completion even if the request was cancelled
+            abort = self._executor.submit(writer.abort)
+            if not isinstance(e, asyncio.CancelledError):
+                await asyncio.wrap_future(abort)
+            raise
+        with self._info_cache_lock:
+            self._info_cache.pop(file_path, None)
         return file_path
 
-    def get_file_url(self, file_path: str, expires_in: int = 3600) -> str:
-        """Generate presigned URL for file access"""
-        if self.client is None:
-            return ""
-        try:
-            url = self.client.generate_presigned_url(
-                'get_object',
-                Params={'Bucket': self.bucket_name, 'Key': file_path},
-                ExpiresIn=expires_in
-            )
-            return url
-        except (ClientError, EndpointConnectionError):
+    async def get_file_url(
+        self,
+        file_path: str,
+        expires_in: Optional[int] = None,
+        filename: Optional[str] = None
+    ) -> str:
+        """
+        Generate presigned URL for file access.
+        URLs are cached per file until shortly before they expire.
+        Returns empty string when the backend has no direct URLs.
+        """
+        expires_in = expires_in or settings.PRESIGNED_URL_EXPIRES
+        cache_key = (file_path, expires_in, filename)
+        now = time.monotonic()
+        with self._url_cache_lock:
+            cached = self._url_cache.get(cache_key)
+            if cached and cached[1] > now:
+                self._url_cache.move_to_end(cache_key)
+                return cached[0]
+
+        url = await self._run(self.backend.presigned_url, file_path, expires_in, filename)
+        if not url:
             return ""
 
-    def get_file_stream(self, file_path: str) -> Optional[io.BytesIO]:
-        """Get file as stream"""
-        if self.client is None:
+        refresh_at = now + max(expires_in - settings.PRESIGNED_URL_REFRESH_MARGIN, 0)
+        with self._url_cache_lock:
+            self._url_cache[cache_key] = (url, refresh_at)
+            self._url_cache.move_to_end(cache_key)
+            while len(self._url_cache) > URL_CACHE_SIZE:
+                self._url_cache.popitem(last=False)
+        return url
+
+    async def get_file_stream(
+        self,
+        file_path: str,
+        start: Optional[int] = None,
+        end: Optional[int] = None
+    ) -> Optional[FileStream]:
+        """Open file (or inclusive byte range) as a chunked stream"""
+        opened = await self._run(self.backend.open_range, file_path, start, end)
+        if opened is None:
+            return None
+        body, content_length = opened
+        return FileStream(body, content_length, executor=self._executor)
+
+    def open_local_file(self, file_path: str) -> Optional[BinaryIO]:
+        """
+        Open file directly from local disk when the backend keeps it there
+        (served without going through the storage client). Blocking.
+        """
+        path = self.backend.local_path(file_path)
+        if path is None:
             return None
         try:
-            response = self.client.get_object(
-                Bucket=self.bucket_name,
-                Key=file_path
-            )
-            file_content = response['Body'].read()
-            return io.BytesIO(file_content)
-        except (ClientError, EndpointConnectionError) as e:
-            # Log error (in production use proper logging)
-            print(f"Error getting file from storage {file_path}: {str(e)}")
+            return open(path, "rb")
+        except FileNotFoundError:
             return None
-        except Exception as e:
-            print(f"Unexpected error getting file {file_path}: {str(e)}")
+
+    async def get_file_info(self, file_path: str) -> Optional[dict]:
+        """
+        Get object metadata (size, etag, last modified) without the body.
+        Results are cached for FILE_INFO_CACHE_TTL seconds.
+        """
+        now = time.monotonic()
+        with self._info_cache_lock:
+            cached = self._info_cache.get(file_path)
+            if cached and cached[1] > now:
+                self._info_cache.move_to_end(file_path)
+                return cached[0]
+
+        info = await self._run(self.backend.head, file_path)
+        if info is None:
             return None
 
-    def delete_file(self, file_path: str) -> bool:
+        with self._info_cache_lock:
+            self._info_cache[file_path] = (info, now + settings.FILE_INFO_CACHE_TTL)
+            self._info_cache.move_to_end(file_path)
+            while len(self._info_cache) > INFO_CACHE_SIZE:
+                self._info_cache.popitem(last=False)
+        return info
+
+    async def delete_file(self, file_path: str) -> bool:
         """Delete file from storage"""
-        if self.client is None:
-            # In test environment, return True to allow tests to pass
-            return True
-        try:
-            self.client.delete_object(
-                Bucket=self.bucket_name,
-                Key=file_path
-            )
-            return True
-        except (ClientError, EndpointConnectionError):
-            return False
+        with self._info_cache_lock:
+            self._info_cache.pop(file_path, None)
+        return await self._run(self.backend.delete, file_path)
 
 
 storage_service = StorageService()
@@ -3,8 +3,48 @@ Database type utilities for cross-database compatibility
 """
 from sqlalchemy import String, TypeDecorator
 from sqlalchemy.dialects.postgresql import UUID as PostgresUUID
+import secrets
+import threading
+import time
 import uuid
 
+# Last uuid7 timestamp (ms) and counter: [ms, counter]
+_uuid7_state = [0, 0]
+_uuid7_lock = threading.Lock()
+
+
+def uuid7() -> uuid.UUID:
+    """
+    Time-ordered UUID, version 7 (RFC 9562): 48-bit Unix time in ms,
+    12-bit counter and 62 random bits.
+    Ids of one process increase monotonically (the counter orders ids of
+    the same millisecond), so new rows go to the right edge of indexes
+    and ORDER BY id is creation order - ids alone work as a keyset key.
+    Both GUID storages (PostgreSQL uuid, canonical string) sort bytewise.
+    """
+    with _uuid7_lock:
+        ms = time.time_ns() // 1_000_000
+        last_ms, counter = _uuid7_state
+        if ms > last_ms:
+            # Random start leaves room for ids within the same millisecond
+            counter = secrets.randbits(11)
+        else:
+            # Same millisecond or clock moved back: keep increasing
+            ms = last_ms
+            counter += 1
+            if counter > 0xFFF:
+                ms += 1
+                counter = 0
+        _uuid7_state[0], _uuid7_state[1] = ms, counter
+    value = (
+        (ms & 0xFFFFFFFFFFFF) << 80
+        | 0x7 << 76
+        | counter << 64
+        | 0b10 << 62
+        | secrets.randbits(62)
+    )
+    return uuid.UUID(int=value)
+
 
 class GUID(TypeDecorator):
     """
@@ -4,10 +4,13 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.infrastructure.database import engine, Base
 from app.api.v1 import router as api_router
 from app.infrastructure.config import settings
+from app.reading.application.reading_service import write_buffered_progress
+from app.reading.application.streak_job import streak_scheduler
+from app.reading.infrastructure.progress_buffer import progress_buffer
 
 # Import all models to register them with Base
 from app.users.domain.models import User  # noqa
-from app.books.domain.models import Book, UserBook  # noqa
+from app.books.domain.models import Book, UserBook, FileBlob  # noqa
 from app.reading.domain.models import ReadingProgress, ReadingHabit  # noqa
 
 # Create database tables (migrations are preferred, but this is a fallback)
@@ -41,6 +44,31 @@ app.add_middleware(
 app.include_router(api_router, prefix=settings.API_PREFIX)
 
 
+@app.on_event("startup")
+async def start_progress_buffer():
+    if progress_buffer is not None:
+        progress_buffer.start(write_buffered_progress)
+
+
+@app.on_event("startup")
+async def start_streak_scheduler():
+    if streak_scheduler is not None:
+        streak_scheduler.start()
+
+
+@app.on_event("shutdown")
+async def stop_streak_scheduler():
+    if streak_scheduler is not None:
+        await streak_scheduler.stop()
+
+
+@app.on_event("shutdown")
+async def flush_progress_buffer():
+    # Buffered page turns are written before the process exits
+    if progress_buffer is not None:
+        await progress_buffer.stop(write_buffered_progress)
+
+
 @app.get("/")
 async def root():
     return {"message": "BookFlow API", "version": "1.0.0"}
@@ -1,12 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+import uuid
 
-from app.infrastructure.database import get_db
-from app.users.api.dependencies import get_current_user
-from app.users.domain.models import User
+from app.infrastructure.database import get_async_read_db, get_db
+from app.users.api.dependencies import get_current_user_id
 from app.reading.api.schemas import (
     ReadingProgressUpdate,
     ReadingProgressResponse,
+    ReadingProgressBatch,
+    ReadingProgressBatchResponse,
     ReadingHabitResponse,
     ReadingHabitUpdate,
     ReadingStatsResponse
@@ -19,13 +23,13 @@ router = APIRouter(prefix="/reading", tags=["reading"])
 
 
 @router.put("/progress/{book_id}", response_model=ReadingProgressResponse)
-async def update_progress(
+def update_progress(
     book_id: str,
     progress_data: ReadingProgressUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user_id: uuid.UUID = Depends(get_current_user_id)
 ):
-    """Update reading progress"""
+    """Update reading progress (sync session, runs on a worker thread)"""
     from uuid import UUID
     
     try:
@@ -38,11 +42,11 @@ async def update_progress(
     reading_service = ReadingService(reading_repository, book_repository)
     
     try:
-        progress = reading_service.update_progress(
-            db, current_user.id, book_uuid, progress_data.current_page
+        progress = reading_service.record_progress(
+            db, current_user_id, book_uuid, progress_data.current_page
         )
         progress_percentage = reading_service.get_progress_percentage(
-            db, current_user.id, book_uuid
+            db, current_user_id, book_uuid, progress
         )
         
         progress_dict = {
@@ -58,11 +62,54 @@ async def update_progress(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
+@router.post("/progress/batch", response_model=ReadingProgressBatchResponse)
+async def sync_progress(
+    batch: ReadingProgressBatch,
+    db: Session = Depends(get_db),
+    current_user_id: uuid.UUID = Depends(get_current_user_id)
+):
+    """Apply progress updates queued offline (latest timestamp wins)"""
+    reading_repository = ReadingRepository()
+    book_repository = BookRepository()
+    reading_service = ReadingService(reading_repository, book_repository)
+    
+    try:
+        # The batch is applied with the sync session, on a worker thread
+        progress_list, skipped = await run_in_threadpool(
+            reading_service.sync_progress,
+            db,
+            current_user_id,
+            [(item.book_id, item.current_page, item.timestamp) for item in batch.updates]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    # Books were loaded by the access check, so progress.book is taken
+    # from the session without further queries
+    return ReadingProgressBatchResponse(
+        progress=[
+            ReadingProgressResponse(
+                id=progress.id,
+                user_id=progress.user_id,
+                book_id=progress.book_id,
+                current_page=progress.current_page,
+                updated_at=progress.updated_at,
+                progress_percentage=(
+                    progress.current_page / progress.book.pages * 100
+                    if progress.book.pages else 0.0
+                )
+            )
+            for progress in progress_list
+        ],
+        skipped=skipped
+    )
+
+
 @router.get("/progress/{book_id}", response_model=ReadingProgressResponse)
 async def get_progress(
     book_id: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user_id: uuid.UUID = Depends(get_current_user_id)
 ):
     """Get reading progress for book"""
     from uuid import UUID
@@ -76,12 +123,16 @@ async def get_progress(
     book_repository = BookRepository()
     reading_service = ReadingService(reading_repository, book_repository)
     
-    progress = reading_service.get_progress(db, current_user.id, book_uuid)
+    progress = await db.run_sync(
+        reading_service.get_progress, current_user_id, book_uuid, False
+    )
     if not progress:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Progress not found")
+    # Buffered page turns are looked up on a worker thread, off the event loop
+    progress = await run_in_threadpool(reading_service.with_buffered, progress)
     
-    progress_percentage = reading_service.get_progress_percentage(
-        db, current_user.id, book_uuid
+    progress_percentage = await db.run_sync(
+        reading_service.get_progress_percentage, current_user_id, book_uuid, progress
     )
     
     progress_dict = {
@@ -98,14 +149,14 @@ async def get_progress(
 @router.get("/habit", response_model=ReadingHabitResponse)
 async def get_habit(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user_id: uuid.UUID = Depends(get_current_user_id)
 ):
     """Get reading habit"""
     reading_repository = ReadingRepository()
     book_repository = BookRepository()
     reading_service = ReadingService(reading_repository, book_repository)
     
-    habit = reading_service.get_or_create_habit(db, current_user.id)
+    habit = reading_service.get_or_create_habit(db, current_user_id)
     return ReadingHabitResponse.model_validate(habit)
 
 
@@ -113,7 +164,7 @@ async def get_habit(
 async def update_habit(
     habit_data: ReadingHabitUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user_id: uuid.UUID = Depends(get_current_user_id)
 ):
     """Update reading habit goal"""
     reading_repository = ReadingRepository()
@@ -121,35 +172,20 @@ async def update_habit(
     reading_service = ReadingService(reading_repository, book_repository)
     
     habit = reading_service.update_habit_goal(
-        db, current_user.id, habit_data.daily_goal_pages
+        db, current_user_id, habit_data.daily_goal_pages
     )
     return ReadingHabitResponse.model_validate(habit)
 
 
 @router.get("/stats", response_model=ReadingStatsResponse)
 async def get_stats(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user_id: uuid.UUID = Depends(get_current_user_id)
 ):
     """Get reading statistics"""
     reading_repository = ReadingRepository()
     book_repository = BookRepository()
     reading_service = ReadingService(reading_repository, book_repository)
     
-    # Get all progress
-    progress_list = reading_service.get_user_progress(db, current_user.id)
-    
-    # Calculate stats
-    total_books_read = len(progress_list)
-    total_pages_read = sum(p.current_page for p in progress_list)
-    
-    # Get habit
-    habit = reading_service.get_or_create_habit(db, current_user.id)
-    
-    return ReadingStatsResponse(
-        total_books_read=total_books_read,
-        total_pages_read=total_pages_read,
-        current_streak=habit.current_streak,
-        daily_goal_pages=habit.daily_goal_pages
-    )
-
+    stats = await db.run_sync(reading_service.get_reading_stats, current_user_id)
+    return ReadingStatsResponse(**stats)
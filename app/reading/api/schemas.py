@@ -1,7 +1,9 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 from uuid import UUID
-from typing import Optional
+from typing import List, Optional
+
+from app.infrastructure.config import settings
 
 
 class ReadingProgressUpdate(BaseModel):
@@ -20,6 +22,25 @@ class ReadingProgressResponse(BaseModel):
         from_attributes = True
 
 
+class ReadingProgressBatchItem(BaseModel):
+    book_id: UUID
+    current_page: int
+    # When the page was turned on the device
+    timestamp: datetime
+
+
+class ReadingProgressBatch(BaseModel):
+    updates: List[ReadingProgressBatchItem] = Field(
+        ..., min_length=1, max_length=settings.PROGRESS_BATCH_MAX
+    )
+
+
+class ReadingProgressBatchResponse(BaseModel):
+    progress: List[ReadingProgressResponse]
+    # Books whose updates were older than stored progress
+    skipped: List[UUID]
+
+
 class ReadingHabitResponse(BaseModel):
     id: UUID
     user_id: UUID
@@ -37,7 +58,9 @@ class ReadingHabitUpdate(BaseModel):
 
 class ReadingStatsResponse(BaseModel):
     total_books_read: int
+    books_finished: int = 0
     total_pages_read: int
+    last_activity_at: Optional[datetime] = None
     current_streak: int
     daily_goal_pages: int
 
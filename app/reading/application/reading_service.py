@@ -1,13 +1,61 @@
 from sqlalchemy.orm import Session
-from typing import Optional, List
+from typing import Any, Dict, Optional, List, Tuple
 import uuid
-from datetime import datetime, date, timedelta
+from datetime import datetime, date, time, timedelta, timezone
 
-from app.reading.domain.models import ReadingProgress, ReadingHabit
+from app.reading.domain.models import (
+    DEFAULT_DAILY_GOAL_PAGES, ReadingEvent, ReadingProgress, ReadingHabit
+)
 from app.reading.infrastructure.reading_repository import ReadingRepository
+from app.reading.infrastructure.progress_buffer import progress_buffer
 from app.books.domain.models import Book
 from app.books.infrastructure.book_repository import BookRepository
+from app.infrastructure import database
+from app.infrastructure.database import unit_of_work
 from app.infrastructure.messaging import message_broker
+from app.infrastructure.types import uuid7
+
+
+def _as_utc(value: datetime) -> datetime:
+    """Aware UTC datetime (naive values, as SQLite returns them, are UTC)"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _progress_events(
+    user_id: uuid.UUID, book: Book, current_page: int
+) -> List[Tuple[str, Dict[str, Any]]]:
+    """Broker events of a progress update"""
+    events = [(
+        "reading_progress_updated",
+        {
+            "user_id": str(user_id),
+            "book_id": str(book.id),
+            "pages_read": current_page
+        }
+    )]
+    # Check if book finished
+    if current_page >= book.pages:
+        events.append((
+            "book_finished",
+            {
+                "user_id": str(user_id),
+                "book_id": str(book.id)
+            }
+        ))
+    return events
+
+
+def write_buffered_progress(
+    user_id: uuid.UUID, updates: List[Tuple[uuid.UUID, int, datetime]]
+):
+    """Write progress flushed from the progress buffer (ProgressBuffer writer)"""
+    db = database.SessionLocal()
+    try:
+        ReadingService(ReadingRepository(), BookRepository()).sync_progress(db, user_id, updates)
+    finally:
+        db.close()
 
 
 class ReadingService:
@@ -23,82 +71,282 @@ class ReadingService:
         current_page: int
     ) -> ReadingProgress:
         """Update reading progress"""
+        with unit_of_work(db):
+            # Previous position and the book, locked until commit so
+            # concurrent devices do not count the same pages twice
+            locked = self.reading_repository.lock_progress_with_book(db, user_id, book_id)
+            if locked:
+                # Access was checked when the progress row was created
+                previous, book = locked
+            else:
+                previous = None
+                book = self._get_trackable_book(db, user_id, book_id)
+
+            # Validate page number
+            if current_page < 0 or current_page > book.pages:
+                raise ValueError(f"Page number must be between 0 and {book.pages}")
+
+            progress = None
+            if previous is None:
+                # First update; if another device created the row meanwhile,
+                # the insert returns nothing and that row is locked instead
+                progress = self.reading_repository.insert_progress(
+                    db, user_id, book_id, current_page
+                )
+                if progress is None:
+                    previous = self.reading_repository.get_progress(
+                        db, user_id, book_id, for_update=True
+                    )
+            previous_page = previous.current_page if previous else 0
+
+            if progress is None:
+                # Update locked row (one statement, returns server-set columns)
+                progress = self.reading_repository.upsert_progress(
+                    db, user_id, book_id, current_page
+                )
+
+            # Log the move; only pages moved forward count as read
+            pages = current_page - previous_page
+            if pages:
+                self.reading_repository.add_reading_event(db, ReadingEvent(
+                    id=uuid7(),
+                    user_id=user_id,
+                    book_id=book_id,
+                    from_page=previous_page,
+                    to_page=current_page,
+                    pages=pages
+                ))
+
+            # Keep per-user totals in step with the progress row
+            was_finished = previous is not None and previous_page >= book.pages
+            is_finished = current_page >= book.pages
+            books_started = 0 if previous else 1
+            books_finished = int(is_finished) - int(was_finished)
+            if pages > 0:
+                # Daily rollup, stats and streak in one statement
+                self.reading_repository.record_reading(
+                    db, user_id, date.today(), pages,
+                    books_started=books_started, books_finished=books_finished
+                )
+            else:
+                self.reading_repository.add_to_stats(
+                    db,
+                    user_id,
+                    books_started=books_started,
+                    books_finished=books_finished,
+                    pages=pages
+                )
+
+        # Events are published once the changes are committed
+        message_broker.publish_events(_progress_events(user_id, book, current_page))
+        return progress
+
+    def _get_trackable_book(self, db: Session, user_id: uuid.UUID, book_id: uuid.UUID) -> Book:
+        """Book the user may track progress of (raises ValueError otherwise)"""
         # Validate book exists
         book = self.book_repository.get_by_id(db, book_id)
         if not book:
             raise ValueError("Book not found")
-        
+
         # Check if book is in user's library (via UserBook)
         from app.books.infrastructure.user_book_repository import UserBookRepository
         user_book_repo = UserBookRepository()
         user_book = user_book_repo.get_by_user_and_book(db, user_id, book_id)
-        
+
         # Allow progress tracking if:
         # 1. Book is in user's library, OR
         # 2. Book is public and user has access, OR
         # 3. Book is private and user is owner
         if not user_book and not book.is_public and book.owner_id != user_id:
             raise ValueError("Book not in your library")
+        return book
 
-        # Validate page number
-        if current_page < 0 or current_page > book.pages:
-            raise ValueError(f"Page number must be between 0 and {book.pages}")
+    def sync_progress(
+        self,
+        db: Session,
+        user_id: uuid.UUID,
+        updates: List[Tuple[uuid.UUID, int, datetime]]
+    ) -> Tuple[List[ReadingProgress], List[uuid.UUID]]:
+        """
+        Apply batch of (book_id, current_page, timestamp) progress updates
+        queued offline, in one transaction. The latest timestamp wins, both
+        within the batch and against stored progress; an update replayed with
+        the timestamp of stored progress is not applied again. Returns applied
+        progress and ids of books whose updates were not newer than stored
+        progress.
+        """
+        now = datetime.now(timezone.utc)
+        latest: Dict[uuid.UUID, Tuple[int, datetime]] = {}
+        for book_id, current_page, timestamp in updates:
+            # Clocks ahead of the server must not pin progress in the future
+            timestamp = min(_as_utc(timestamp), now)
+            if book_id not in latest or timestamp >= latest[book_id][1]:
+                latest[book_id] = (current_page, timestamp)
+        book_ids = list(latest)
 
-        # Get or create progress
-        progress = self.reading_repository.get_progress(db, user_id, book_id)
-        if not progress:
-            progress = ReadingProgress(
-                id=uuid.uuid4(),
-                user_id=user_id,
-                book_id=book_id,
-                current_page=current_page
+        with unit_of_work(db):
+            # Access and page numbers of all books are checked with one query
+            books = self.book_repository.get_accessible_books(db, user_id, book_ids)
+            for book_id, (current_page, _) in latest.items():
+                book = books.get(book_id)
+                if book is None:
+                    raise ValueError(f"Book not found or not in your library: {book_id}")
+                if current_page < 0 or current_page > book.pages:
+                    raise ValueError(f"Page number must be between 0 and {book.pages}")
+
+            # Rows are created first if missing, so first updates of a book
+            # from several devices are serialized as well
+            locked, created = self.reading_repository.lock_progress_for_books(
+                db, user_id, book_ids
             )
-            progress = self.reading_repository.create_progress(db, progress)
-        else:
-            progress.current_page = current_page
-            progress = self.reading_repository.update_progress(db, progress)
-
-        # Publish event
-        message_broker.publish_event(
-            "reading_progress_updated",
-            {
-                "user_id": str(user_id),
-                "book_id": str(book_id),
-                "pages_read": current_page
+            previous = {
+                book_id: progress for book_id, progress in locked.items()
+                if book_id not in created
             }
-        )
+            applied, skipped = [], []
+            for book_id, (current_page, timestamp) in latest.items():
+                stored = previous.get(book_id)
+                if stored is not None and stored.updated_at is not None \
+                        and _as_utc(stored.updated_at) >= timestamp:
+                    skipped.append(book_id)
+                else:
+                    applied.append((book_id, current_page, timestamp))
+            # Previous pages are read before the upsert refreshes the rows
+            previous_pages = {
+                book_id: progress.current_page for book_id, progress in previous.items()
+            }
+            progress = self.reading_repository.upsert_progress_many(db, user_id, applied)
 
-        # Check if book finished
-        if current_page >= book.pages:
-            message_broker.publish_event(
-                "book_finished",
-                {
-                    "user_id": str(user_id),
-                    "book_id": str(book_id)
-                }
-            )
+            events, pages_by_day = [], {}
+            books_started = books_finished = total_pages = 0
+            for book_id, current_page, timestamp in applied:
+                book = books[book_id]
+                previous_page = previous_pages.get(book_id, 0)
+                pages = current_page - previous_page
+                if pages:
+                    events.append(ReadingEvent(
+                        id=uuid7(),
+                        user_id=user_id,
+                        book_id=book_id,
+                        from_page=previous_page,
+                        to_page=current_page,
+                        pages=pages,
+                        created_at=timestamp
+                    ))
+                if pages > 0:
+                    # Pages count for the (server local) day they were read
+                    day = timestamp.astimezone().date()
+                    pages_by_day[day] = pages_by_day.get(day, 0) + pages
+                was_finished = book_id in previous_pages and previous_page >= book.pages
+                books_started += book_id not in previous_pages
+                books_finished += int(current_page >= book.pages) - int(was_finished)
+                total_pages += pages
 
-        # Update habit streak
-        self._update_habit_streak(db, user_id)
+            self.reading_repository.add_reading_events(db, events)
+            for day, pages in pages_by_day.items():
+                self.reading_repository.add_pages_read(db, user_id, day, pages)
+            if applied:
+                self.reading_repository.add_to_stats(
+                    db,
+                    user_id,
+                    books_started=books_started,
+                    books_finished=books_finished,
+                    pages=total_pages
+                )
+            # Offline batches may fill earlier days, so the streak is
+            # recomputed from the rollups of all days the batch touched
+            if pages_by_day:
+                self._recompute_habit_streak(db, user_id, min(pages_by_day))
 
-        return progress
+        message_broker.publish_events([
+            event
+            for book_id, current_page, _ in applied
+            for event in _progress_events(user_id, books[book_id], current_page)
+        ])
+        return progress, skipped
+
+    def record_progress(
+        self,
+        db: Session,
+        user_id: uuid.UUID,
+        book_id: uuid.UUID,
+        current_page: int
+    ) -> ReadingProgress:
+        """
+        Update reading progress through the progress buffer, when enabled:
+        page turns of books already in progress are acknowledged right away
+        and written by the next flush; first progress is written directly.
+        """
+        if progress_buffer is None:
+            return self.update_progress(db, user_id, book_id, current_page)
+
+        book = self.book_repository.get_accessible_books(db, user_id, [book_id]).get(book_id)
+        if not book:
+            raise ValueError("Book not found or not in your library")
+        if current_page < 0 or current_page > book.pages:
+            raise ValueError(f"Page number must be between 0 and {book.pages}")
+
+        stored = self.reading_repository.get_progress(db, user_id, book_id)
+        if stored is None:
+            return self.update_progress(db, user_id, book_id, current_page)
+        timestamp = datetime.now(timezone.utc)
+        progress_buffer.put(user_id, book_id, current_page, timestamp)
+        return self.with_buffered(stored, (current_page, timestamp))
+
+    def with_buffered(
+        self,
+        progress: Optional[ReadingProgress],
+        buffered: Optional[Tuple[int, datetime]] = None
+    ) -> Optional[ReadingProgress]:
+        """
+        Stored progress overlaid with a later buffered page turn, if any.
+        Blocking with a shared buffer: call it from a worker thread.
+        """
+        if progress is None or progress_buffer is None:
+            return progress
+        if buffered is None:
+            buffered = progress_buffer.get(progress.user_id, progress.book_id)
+        if buffered is None or (
+            progress.updated_at is not None and _as_utc(progress.updated_at) > buffered[1]
+        ):
+            return progress
+        # Detached copy: the session must not write the buffered page
+        return ReadingProgress(
+            id=progress.id,
+            user_id=progress.user_id,
+            book_id=progress.book_id,
+            current_page=buffered[0],
+            updated_at=buffered[1]
+        )
 
     def get_progress(
         self,
         db: Session,
         user_id: uuid.UUID,
-        book_id: uuid.UUID
+        book_id: uuid.UUID,
+        buffered: bool = True
     ) -> Optional[ReadingProgress]:
-        """Get reading progress"""
-        return self.reading_repository.get_progress(db, user_id, book_id)
+        """Get reading progress (without buffered page turns unless buffered is set)"""
+        progress = self.reading_repository.get_progress(db, user_id, book_id)
+        return self.with_buffered(progress) if buffered else progress
 
     def get_user_progress(self, db: Session, user_id: uuid.UUID) -> List[ReadingProgress]:
         """Get all reading progress for user"""
-        return self.reading_repository.get_user_progress(db, user_id)
+        return [
+            self.with_buffered(progress)
+            for progress in self.reading_repository.get_user_progress(db, user_id)
+        ]
 
-    def get_progress_percentage(self, db: Session, user_id: uuid.UUID, book_id: uuid.UUID) -> float:
-        """Get reading progress percentage"""
-        progress = self.reading_repository.get_progress(db, user_id, book_id)
+    def get_progress_percentage(
+        self,
+        db: Session,
+        user_id: uuid.UUID,
+        book_id: uuid.UUID,
+        progress: Optional[ReadingProgress] = None
+    ) -> float:
+        """Get reading progress percentage (of progress, when it is already loaded)"""
+        if progress is None:
+            progress = self.get_progress(db, user_id, book_id)
         if not progress:
             return 0.0
         
@@ -108,18 +356,22 @@ class ReadingService:
         
         return (progress.current_page / book.pages) * 100
 
+    def get_reading_stats(self, db: Session, user_id: uuid.UUID) -> dict:
+        """Get reading statistics (read-only; defaults for users without a habit)"""
+        stats, habit = self.reading_repository.get_stats(db, user_id)
+        return {
+            "total_books_read": stats.books_started if stats else 0,
+            "books_finished": stats.books_finished if stats else 0,
+            "total_pages_read": stats.total_pages if stats else 0,
+            "last_activity_at": stats.last_activity_at if stats else None,
+            "current_streak": habit.current_streak if habit else 0,
+            "daily_goal_pages": habit.daily_goal_pages if habit else DEFAULT_DAILY_GOAL_PAGES,
+        }
+
     def get_or_create_habit(self, db: Session, user_id: uuid.UUID) -> ReadingHabit:
         """Get or create reading habit"""
-        habit = self.reading_repository.get_habit(db, user_id)
-        if not habit:
-            habit = ReadingHabit(
-                id=uuid.uuid4(),
-                user_id=user_id,
-                daily_goal_pages=10,
-                current_streak=0
-            )
-            habit = self.reading_repository.create_habit(db, habit)
-        return habit
+        with unit_of_work(db):
+            return self.reading_repository.get_or_create_habit(db, user_id)
 
     def update_habit_goal(
         self,
@@ -128,37 +380,68 @@ class ReadingService:
         daily_goal_pages: int
     ) -> ReadingHabit:
         """Update daily reading goal"""
-        habit = self.get_or_create_habit(db, user_id)
-        habit.daily_goal_pages = daily_goal_pages
-        return self.reading_repository.update_habit(db, habit)
+        with unit_of_work(db):
+            return self.reading_repository.upsert_habit_goal(db, user_id, daily_goal_pages)
+
+    def expire_streaks(
+        self, db: Session, today: Optional[date] = None, chunk_size: int = 10000
+    ) -> int:
+        """
+        Reset streaks of users who read neither today nor yesterday (progress
+        updates only continue streaks). Rows are reset chunk_size at a time,
+        each chunk in its own short transaction; returns number reset.
+        """
+        today = today or date.today()
+        # Same day boundary as progress updates (naive last_reading_date)
+        before = datetime.combine(today - timedelta(days=1), time.min)
+        expired = 0
+        while True:
+            with unit_of_work(db):
+                count = self.reading_repository.expire_streaks(db, before, chunk_size)
+            expired += count
+            if count < chunk_size:
+                return expired
 
-    def _update_habit_streak(self, db: Session, user_id: uuid.UUID):
-        """Update reading streak based on daily goal"""
+    def _recompute_habit_streak(self, db: Session, user_id: uuid.UUID, since: date):
+        """
+        Recompute reading streak after pages were added to days from since on.
+        Days from the day before are checked against the daily rollups, the
+        stored streak is trusted for earlier days.
+        """
         habit = self.get_or_create_habit(db, user_id)
-        today = date.today()
-        
-        # Get pages read today
-        today_pages = self.reading_repository.get_pages_read_today(db, user_id)
-        
-        if today_pages >= habit.daily_goal_pages:
-            # Check if last reading was yesterday (continuing streak)
-            if habit.last_reading_date:
-                last_date = habit.last_reading_date.date()
-                if last_date == today:
-                    # Already counted today
-                    pass
-                elif last_date == today - timedelta(days=1):
-                    # Continuing streak
-                    habit.current_streak += 1
-                    habit.last_reading_date = datetime.utcnow()
-                else:
-                    # Streak broken, reset
-                    habit.current_streak = 1
-                    habit.last_reading_date = datetime.utcnow()
-            else:
-                # First time
-                habit.current_streak = 1
-                habit.last_reading_date = datetime.utcnow()
-            
-            self.reading_repository.update_habit(db, habit)
+        start = since - timedelta(days=1)
+        goal_days = self.reading_repository.get_goal_days(
+            db, user_id, habit.daily_goal_pages, start
+        )
+        stored_date = habit.last_reading_date.date() if habit.last_reading_date else None
+        last_date = stored_date if habit.current_streak > 0 else None
+        first_date = last_date - timedelta(days=habit.current_streak - 1) if last_date else None
+
+        def met_goal(day: date) -> bool:
+            if day >= start:
+                return day in goal_days
+            return last_date is not None and first_date <= day <= last_date
+
+        candidates = goal_days | ({last_date} if last_date else set())
+        ends = [day for day in candidates if met_goal(day)]
+        if not ends:
+            return
+        end = max(ends)
+        streak, day = 0, end
+        while met_goal(day):
+            if day < start:
+                # Stored streak continues the run before the rollups read
+                streak += (day - first_date).days + 1
+                break
+            streak += 1
+            day -= timedelta(days=1)
+
+        if end != stored_date:
+            habit.last_reading_date = (
+                datetime.utcnow() if end == date.today() else datetime.combine(end, time.min)
+            )
+        elif streak == habit.current_streak:
+            return
+        habit.current_streak = streak
+        self.reading_repository.update_habit(db, habit)
 
@@ -0,0 +1,93 @@
+"""
+Nightly maintenance of reading streaks.
+Progress updates only continue streaks; this job resets the streaks of
+users who stopped reading, so current_streak is not stale for them.
+
+    python -m app.reading.application.streak_job
+    python -m app.reading.application.streak_job --date 2024-01-31 --chunk-size 5000
+"""
+from contextlib import suppress
+from datetime import date, datetime, timedelta
+from typing import Optional
+import argparse
+import asyncio
+
+from app.books.infrastructure.book_repository import BookRepository
+from app.infrastructure import database
+from app.infrastructure.config import settings
+from app.reading.application.reading_service import ReadingService
+from app.reading.infrastructure.reading_repository import ReadingRepository
+
+
+def run_streak_job(today: Optional[date] = None, chunk_size: Optional[int] = None) -> int:
+    """Reset broken streaks of all users; returns number reset"""
+    if database.SessionLocal is None:
+        raise RuntimeError("Database session not initialized. Check database connection.")
+    db = database.SessionLocal()
+    try:
+        reading_service = ReadingService(ReadingRepository(), BookRepository())
+        return reading_service.expire_streaks(
+            db, today, chunk_size or settings.STREAK_JOB_CHUNK_SIZE
+        )
+    finally:
+        db.close()
+
+
+class StreakScheduler:
+    """
+    Runs the streak job in background every day at hour:00 (server local
+    time). Each worker running it is harmless: reset streaks are skipped.
+    """
+
+    def __init__(self, hour: int):
+        self.hour = hour
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start scheduler (call from the running event loop)"""
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def seconds_until_next_run(self, now: Optional[datetime] = None) -> float:
+        now = now or datetime.now()
+        next_run = now.replace(hour=self.hour, minute=0, second=0, microsecond=0)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        return (next_run - now).total_seconds()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.seconds_until_next_run())
+            try:
+                await loop.run_in_executor(None, run_streak_job)
+            except Exception as e:
+                print(f"Streak job failed: {e}")
+
+
+streak_scheduler = (
+    StreakScheduler(settings.STREAK_JOB_HOUR) if settings.STREAK_JOB_HOUR is not None else None
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reset broken reading streaks")
+    parser.add_argument(
+        "--date", type=date.fromisoformat, default=None,
+        help="day the job runs for (default: today)"
+    )
+    parser.add_argument("--chunk-size", type=int, default=None)
+    args = parser.parse_args()
+
+    expired = run_streak_job(args.date, args.chunk_size)
+    print(f"Reset {expired} streaks")
+
+
+if __name__ == "__main__":
+    main()
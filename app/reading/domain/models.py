@@ -1,16 +1,18 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, Date, DateTime, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
-import uuid
 
 from app.infrastructure.database import Base
-from app.infrastructure.types import GUID
+from app.infrastructure.types import GUID, uuid7
+
+# Daily goal of a habit the user has not set up
+DEFAULT_DAILY_GOAL_PAGES = 10
 
 
 class ReadingProgress(Base):
     __tablename__ = "reading_progress"
 
-    id = Column(GUID(), primary_key=True, default=uuid.uuid4)
+    id = Column(GUID(), primary_key=True, default=uuid7)
     user_id = Column(GUID(), ForeignKey("users.id"), nullable=False)
     book_id = Column(GUID(), ForeignKey("books.id"), nullable=False)
     current_page = Column(Integer, default=0, nullable=False)
@@ -20,17 +22,70 @@ class ReadingProgress(Base):
     user = relationship("User", foreign_keys=[user_id])
     book = relationship("Book", foreign_keys=[book_id])
 
+    # One progress row per user and book (upsert target)
+    __table_args__ = (
+        UniqueConstraint('user_id', 'book_id', name='uq_reading_progress_user_book'),
+    )
+
+    # Server defaults come back with the INSERT/UPDATE (RETURNING)
+    __mapper_args__ = {"eager_defaults": True}
+
 
 class ReadingHabit(Base):
     __tablename__ = "reading_habits"
 
-    id = Column(GUID(), primary_key=True, default=uuid.uuid4)
+    id = Column(GUID(), primary_key=True, default=uuid7)
     user_id = Column(GUID(), ForeignKey("users.id"), unique=True, nullable=False)
-    daily_goal_pages = Column(Integer, default=10, nullable=False)
+    daily_goal_pages = Column(Integer, default=DEFAULT_DAILY_GOAL_PAGES, nullable=False)
     current_streak = Column(Integer, default=0, nullable=False)
     last_reading_date = Column(DateTime(timezone=True), nullable=True)
 
     # Relationships
     user = relationship("User", foreign_keys=[user_id])
 
+    __table_args__ = (
+        # Running streaks by last reading date (nightly streak expiry)
+        Index(
+            'ix_reading_habits_active_streak', 'last_reading_date',
+            postgresql_where=(current_streak > 0),
+            sqlite_where=(current_streak > 0)
+        ),
+    )
+
+
+class ReadingEvent(Base):
+    """Append-only log of page moves: pages is the delta (negative when going back)"""
+    __tablename__ = "reading_events"
+
+    id = Column(GUID(), primary_key=True, default=uuid7)
+    user_id = Column(GUID(), ForeignKey("users.id"), nullable=False)
+    book_id = Column(GUID(), ForeignKey("books.id"), nullable=False)
+    from_page = Column(Integer, nullable=False)
+    to_page = Column(Integer, nullable=False)
+    pages = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index('ix_reading_events_user_created_at', 'user_id', 'created_at'),
+    )
+
+
+class DailyReadingRollup(Base):
+    """Pages read by a user per day, kept up to date on every progress write"""
+    __tablename__ = "daily_reading_rollup"
+
+    user_id = Column(GUID(), ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    pages_read = Column(Integer, default=0, nullable=False)
+
+
+class UserReadingStats(Base):
+    """Per-user reading totals, updated in the same transaction as progress"""
+    __tablename__ = "user_reading_stats"
 
+    user_id = Column(GUID(), ForeignKey("users.id"), primary_key=True)
+    books_started = Column(Integer, default=0, nullable=False)
+    books_finished = Column(Integer, default=0, nullable=False)
+    # Sum of current pages over all books
+    total_pages = Column(Integer, default=0, nullable=False)
+    last_activity_at = Column(DateTime(timezone=True), nullable=True)
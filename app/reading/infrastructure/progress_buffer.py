@@ -0,0 +1,385 @@
+"""
+Write-coalescing buffer for reading progress.
+Page turns of books already in progress are kept here, latest (page,
+timestamp) per (user, book), and written to the database in batches.
+"""
+from abc import ABC, abstractmethod
+from contextlib import suppress
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+import asyncio
+import threading
+import uuid
+
+from app.infrastructure.config import settings
+
+BufferKey = Tuple[uuid.UUID, uuid.UUID]  # (user_id, book_id)
+BufferedProgress = Tuple[int, datetime]  # (current_page, timestamp)
+# Writes (book_id, current_page, timestamp) updates of one user
+ProgressWriter = Callable[[uuid.UUID, List[Tuple[uuid.UUID, int, datetime]]], None]
+
+
+def _latest(
+    first: Optional[BufferedProgress], second: Optional[BufferedProgress]
+) -> Optional[BufferedProgress]:
+    """
+    Entry with the later timestamp. First wins ties, so an entry replayed
+    with the same timestamp does not replace the one already kept.
+    """
+    if first is None:
+        return second
+    if second is None or first[1] >= second[1]:
+        return first
+    return second
+
+
+class ProgressBufferBackend(ABC):
+    """Storage of buffered progress"""
+
+    @abstractmethod
+    def put(
+        self, user_id: uuid.UUID, book_id: uuid.UUID, current_page: int, timestamp: datetime
+    ) -> int:
+        """Keep update unless a later one is buffered; returns number of buffered entries"""
+
+    @abstractmethod
+    def get(self, user_id: uuid.UUID, book_id: uuid.UUID) -> Optional[BufferedProgress]:
+        """
+        Latest buffered progress, including entries being flushed by any
+        worker; None if nothing is buffered
+        """
+
+    @abstractmethod
+    def drain(self) -> Tuple[str, Dict[BufferKey, BufferedProgress]]:
+        """
+        Take all buffered entries as (token, entries). Entries stay
+        recoverable until ack(token), so a crash during a flush loses nothing.
+        """
+
+    @abstractmethod
+    def ack(self, token: str):
+        """Forget drained entries once they are written"""
+
+    @abstractmethod
+    def recover(self):
+        """
+        Return entries of interrupted flushes to the buffer: flushes of this
+        process that were not acknowledged, and flushes of other processes
+        that stopped renewing their lease
+        """
+
+    def keep_alive(self):
+        """Renew lease on the flushes of this process (shared backends)"""
+
+
+class MemoryProgressBufferBackend(ProgressBufferBackend):
+    """
+    Buffer local to this process (single worker setups and tests).
+    Entries are written on shutdown, but lost if the process crashes.
+    """
+
+    def __init__(self):
+        self._entries: Dict[BufferKey, BufferedProgress] = {}
+        self._draining: Dict[str, Dict[BufferKey, BufferedProgress]] = {}
+        self._lock = threading.Lock()
+
+    def put(
+        self, user_id: uuid.UUID, book_id: uuid.UUID, current_page: int, timestamp: datetime
+    ) -> int:
+        key = (user_id, book_id)
+        with self._lock:
+            self._entries[key] = _latest(self._entries.get(key), (current_page, timestamp))
+            return len(self._entries)
+
+    def get(self, user_id: uuid.UUID, book_id: uuid.UUID) -> Optional[BufferedProgress]:
+        key = (user_id, book_id)
+        with self._lock:
+            latest = self._entries.get(key)
+            for entries in self._draining.values():
+                latest = _latest(latest, entries.get(key))
+            return latest
+
+    def drain(self) -> Tuple[str, Dict[BufferKey, BufferedProgress]]:
+        token = uuid.uuid4().hex
+        with self._lock:
+            entries, self._entries = self._entries, {}
+            self._draining[token] = entries
+        return token, entries
+
+    def ack(self, token: str):
+        with self._lock:
+            self._draining.pop(token, None)
+
+    def recover(self):
+        with self._lock:
+            for entries in self._draining.values():
+                for key, entry in entries.items():
+                    self._entries[key] = _latest(entry, self._entries.get(key))
+            self._draining.clear()
+
+
+# Values are "page|epoch seconds"; the later timestamp wins, the kept entry wins ties
+_PUT_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], ARGV[1])
+if not current or tonumber(string.match(current, '|(.+)$')) < tonumber(ARGV[3]) then
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[2] .. '|' .. ARGV[3])
+end
+return redis.call('HLEN', KEYS[1])
+"""
+
+# Moves the buffer to a flushing hash registered in the flushing set
+_DRAIN_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('RENAME', KEYS[1], KEYS[2])
+redis.call('SADD', KEYS[3], KEYS[2])
+return 1
+"""
+
+# Merges a flushing hash back unless its owner still holds the lease
+# (ARGV[1] = '1' skips the check for flushes of the calling process)
+_MERGE_SCRIPT = """
+if ARGV[1] ~= '1' and redis.call('EXISTS', KEYS[3]) == 1 then
+    return -1
+end
+local entries = redis.call('HGETALL', KEYS[2])
+for i = 1, #entries, 2 do
+    local current = redis.call('HGET', KEYS[1], entries[i])
+    if not current or tonumber(string.match(current, '|(.+)$'))
+            < tonumber(string.match(entries[i + 1], '|(.+)$')) then
+        redis.call('HSET', KEYS[1], entries[i], entries[i + 1])
+    end
+end
+redis.call('DEL', KEYS[2])
+redis.call('SREM', KEYS[4], KEYS[2])
+return #entries / 2
+"""
+
+# Values of field in the buffer and in all flushing hashes (flushing hashes
+# share the buffer's hash tag, so they live in the same cluster slot)
+_GET_SCRIPT = """
+local values = {redis.call('HGET', KEYS[1], ARGV[1])}
+for _, token in ipairs(redis.call('SMEMBERS', KEYS[2])) do
+    values[#values + 1] = redis.call('HGET', token, ARGV[1])
+end
+return values
+"""
+
+
+class RedisProgressBufferBackend(ProgressBufferBackend):
+    """
+    Buffer shared by all workers, kept in a Redis hash. A flush renames the
+    hash, so page turns arriving meanwhile start a new one; the renamed hash
+    is deleted once written. Each process renews a lease while it runs:
+    flushing hashes of a process whose lease expired (it crashed) are merged
+    back by recover(), those of live processes are left alone.
+    """
+
+    def __init__(self, url: str, lease_seconds: int, key: str = "bookflow:{progress_buffer}"):
+        # Optional dependency, needed only by this backend
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self.lease_seconds = lease_seconds
+        # Hash tag in the key keeps all keys of the buffer in one cluster slot
+        self._key = key
+        self._flushing_key = f"{key}:flushing"
+        self._owner = uuid.uuid4().hex
+        self._put = self._redis.register_script(_PUT_SCRIPT)
+        self._drain = self._redis.register_script(_DRAIN_SCRIPT)
+        self._merge = self._redis.register_script(_MERGE_SCRIPT)
+        self._get = self._redis.register_script(_GET_SCRIPT)
+
+    def _lease_key(self, owner: str) -> str:
+        return f"{self._key}:lease:{owner}"
+
+    def put(
+        self, user_id: uuid.UUID, book_id: uuid.UUID, current_page: int, timestamp: datetime
+    ) -> int:
+        return int(self._put(
+            keys=[self._key],
+            args=[f"{user_id}:{book_id}", current_page, repr(timestamp.timestamp())]
+        ))
+
+    def get(self, user_id: uuid.UUID, book_id: uuid.UUID) -> Optional[BufferedProgress]:
+        latest = None
+        for value in self._get(keys=[self._key, self._flushing_key], args=[f"{user_id}:{book_id}"]):
+            if value is not None:
+                latest = _latest(latest, self._decode(value))
+        return latest
+
+    def drain(self) -> Tuple[str, Dict[BufferKey, BufferedProgress]]:
+        self.keep_alive()
+        token = f"{self._flushing_key}:{self._owner}:{uuid.uuid4().hex}"
+        if not self._drain(keys=[self._key, token, self._flushing_key]):
+            # Nothing is buffered
+            return token, {}
+        entries = {}
+        for field, value in self._redis.hgetall(token).items():
+            user_id, book_id = field.decode().split(":")
+            entries[(uuid.UUID(user_id), uuid.UUID(book_id))] = self._decode(value)
+        return token, entries
+
+    def ack(self, token: str):
+        pipeline = self._redis.pipeline()
+        pipeline.delete(token)
+        pipeline.srem(self._flushing_key, token)
+        pipeline.execute()
+
+    def recover(self):
+        # Each merge checks the owner's lease and deletes the flushing hash
+        # atomically, so a batch is merged back at most once
+        for token in self._redis.smembers(self._flushing_key):
+            token = token.decode()
+            owner = token[len(self._flushing_key) + 1:].split(":")[0]
+            self._merge(
+                keys=[self._key, token, self._lease_key(owner), self._flushing_key],
+                args=["1" if owner == self._owner else "0"]
+            )
+
+    def keep_alive(self):
+        self._redis.set(self._lease_key(self._owner), 1, ex=self.lease_seconds)
+
+    @staticmethod
+    def _decode(value: bytes) -> BufferedProgress:
+        current_page, timestamp = value.decode().split("|")
+        return int(current_page), datetime.fromtimestamp(float(timestamp), timezone.utc)
+
+
+class ProgressBuffer:
+    """
+    Coalesces page turns: updates are acknowledged right away and written
+    in batches, every flush_interval seconds or as soon as max_pending
+    entries are buffered, and once more on shutdown.
+    """
+
+    def __init__(self, backend: ProgressBufferBackend, flush_interval: float, max_pending: int):
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._flush_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def put(
+        self, user_id: uuid.UUID, book_id: uuid.UUID, current_page: int, timestamp: datetime
+    ):
+        """Buffer progress update"""
+        if self.backend.put(user_id, book_id, current_page, timestamp) >= self.max_pending:
+            self._request_flush()
+
+    def get(self, user_id: uuid.UUID, book_id: uuid.UUID) -> Optional[BufferedProgress]:
+        """
+        Latest buffered (current_page, timestamp), None if nothing is buffered.
+        Entries stay visible while any worker flushes them.
+        """
+        return self.backend.get(user_id, book_id)
+
+    def flush(self, writer: ProgressWriter) -> int:
+        """Write all buffered entries, one batch per user; returns number written"""
+        with self._flush_lock:
+            token, entries = self.backend.drain()
+            if not entries:
+                self.backend.ack(token)
+                return 0
+            by_user: Dict[uuid.UUID, List[Tuple[uuid.UUID, int, datetime]]] = {}
+            for (user_id, book_id), (current_page, timestamp) in entries.items():
+                by_user.setdefault(user_id, []).append((book_id, current_page, timestamp))
+
+            written = 0
+            users = list(by_user.items())
+            for index, (user_id, updates) in enumerate(users):
+                try:
+                    self.backend.keep_alive()
+                    try:
+                        writer(user_id, updates)
+                        written += len(updates)
+                    except ValueError:
+                        # A book left the library since its update was
+                        # buffered; the other books of the user are still written
+                        for update in updates:
+                            with suppress(ValueError):
+                                writer(user_id, [update])
+                                written += 1
+                except Exception as e:
+                    print(f"Failed to flush progress buffer: {e}")
+                    # Database is unavailable: keep the rest for the next
+                    # flush (an entry written twice is applied once)
+                    for user_id, updates in users[index:]:
+                        for book_id, current_page, timestamp in updates:
+                            self.backend.put(user_id, book_id, current_page, timestamp)
+                    break
+            self.backend.ack(token)
+            return written
+
+    def start(self, writer: ProgressWriter):
+        """Start flushing in background (call from the running event loop)"""
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = self._loop.create_task(self._run(writer))
+
+    async def stop(self, writer: ProgressWriter):
+        """Stop background flushing and write everything still buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        await asyncio.get_running_loop().run_in_executor(None, self.flush, writer)
+        self._loop = None
+
+    def recover(self):
+        """Renew lease and return entries of interrupted flushes to the buffer"""
+        # No flush of this process is in flight meanwhile
+        with self._flush_lock:
+            self.backend.keep_alive()
+            self.backend.recover()
+
+    async def _run(self, writer: ProgressWriter):
+        # Backend calls block, so they run on the executor
+        while True:
+            try:
+                await self._loop.run_in_executor(None, self.recover)
+            except Exception as e:
+                print(f"Failed to recover progress buffer: {e}")
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            self._wake.clear()
+            try:
+                await self._loop.run_in_executor(None, self.flush, writer)
+            except Exception as e:
+                print(f"Failed to flush progress buffer: {e}")
+
+    def _request_flush(self):
+        # put() may run outside of the event loop thread
+        if self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+
+def create_progress_buffer() -> Optional[ProgressBuffer]:
+    """Progress buffer selected by PROGRESS_BUFFER_BACKEND setting, None when disabled"""
+    if not settings.PROGRESS_BUFFER_BACKEND:
+        return None
+    if settings.PROGRESS_BUFFER_BACKEND == "memory":
+        backend = MemoryProgressBufferBackend()
+    elif settings.PROGRESS_BUFFER_BACKEND == "redis":
+        if not settings.PROGRESS_BUFFER_REDIS_URL:
+            raise ValueError("PROGRESS_BUFFER_REDIS_URL must be set for redis progress buffer")
+        backend = RedisProgressBufferBackend(
+            settings.PROGRESS_BUFFER_REDIS_URL,
+            # The lease is renewed at least once per flush interval
+            max(
+                settings.PROGRESS_BUFFER_LEASE_SECONDS,
+                3 * int(settings.PROGRESS_BUFFER_FLUSH_SECONDS)
+            )
+        )
+    else:
+        raise ValueError(f"Unknown progress buffer backend: {settings.PROGRESS_BUFFER_BACKEND}")
+    return ProgressBuffer(
+        backend, settings.PROGRESS_BUFFER_FLUSH_SECONDS, settings.PROGRESS_BUFFER_MAX_PENDING
+    )
+
+
+progress_buffer = create_progress_buffer()
@@ -1,39 +1,163 @@
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
-from typing import Optional, List
+from sqlalchemy import Date, DateTime, Integer, and_, case, func, literal, literal_column, select, update
+from typing import Dict, Optional, List, Set, Tuple
 import uuid
-from datetime import date
+from datetime import date, datetime, timedelta
 
-from app.reading.domain.models import ReadingProgress, ReadingHabit
+from app.books.domain.models import Book
+from app.reading.domain.models import (
+    DEFAULT_DAILY_GOAL_PAGES, DailyReadingRollup, ReadingEvent, ReadingProgress, ReadingHabit, UserReadingStats
+)
+from app.infrastructure.database import AsyncRepository, upsert_insert
+from app.infrastructure.types import uuid7
 
 
 class ReadingRepository:
     def create_progress(self, db: Session, progress: ReadingProgress) -> ReadingProgress:
         """Create reading progress"""
         db.add(progress)
-        db.commit()
-        db.refresh(progress)
+        db.flush()
         return progress
 
     def update_progress(self, db: Session, progress: ReadingProgress) -> ReadingProgress:
         """Update reading progress"""
-        db.commit()
-        db.refresh(progress)
+        db.flush()
         return progress
 
+    def upsert_progress(
+        self,
+        db: Session,
+        user_id: uuid.UUID,
+        book_id: uuid.UUID,
+        current_page: int
+    ) -> ReadingProgress:
+        """Create or update reading progress in one statement"""
+        statement = upsert_insert(db, ReadingProgress).values(
+            id=uuid7(), user_id=user_id, book_id=book_id, current_page=current_page
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[ReadingProgress.user_id, ReadingProgress.book_id],
+            set_={"current_page": statement.excluded.current_page, "updated_at": func.now()}
+        ).returning(ReadingProgress)
+        return db.scalars(statement, execution_options={"populate_existing": True}).one()
+
+    def insert_progress(
+        self,
+        db: Session,
+        user_id: uuid.UUID,
+        book_id: uuid.UUID,
+        current_page: int
+    ) -> Optional[ReadingProgress]:
+        """
+        Create reading progress (INSERT ... ON CONFLICT DO NOTHING).
+        Returns None if the row exists, e.g. created by a concurrent update
+        (the insert waits for it to commit).
+        """
+        statement = upsert_insert(db, ReadingProgress).values(
+            id=uuid7(), user_id=user_id, book_id=book_id, current_page=current_page
+        ).on_conflict_do_nothing(
+            index_elements=[ReadingProgress.user_id, ReadingProgress.book_id]
+        ).returning(ReadingProgress)
+        return db.scalars(statement).one_or_none()
+
+    def upsert_progress_many(
+        self, db: Session, user_id: uuid.UUID, updates: List[Tuple[uuid.UUID, int, datetime]]
+    ) -> List[ReadingProgress]:
+        """
+        Create or update progress of several books in one statement;
+        updates are (book_id, current_page, updated_at)
+        """
+        if not updates:
+            return []
+        statement = upsert_insert(db, ReadingProgress).values([
+            {
+                "id": uuid7(),
+                "user_id": user_id,
+                "book_id": book_id,
+                "current_page": current_page,
+                "updated_at": updated_at,
+            }
+            for book_id, current_page, updated_at in updates
+        ])
+        statement = statement.on_conflict_do_update(
+            index_elements=[ReadingProgress.user_id, ReadingProgress.book_id],
+            set_={
+                "current_page": statement.excluded.current_page,
+                "updated_at": statement.excluded.updated_at,
+            }
+        ).returning(ReadingProgress)
+        return db.scalars(statement, execution_options={"populate_existing": True}).all()
+
+    def get_progress_for_books(
+        self,
+        db: Session,
+        user_id: uuid.UUID,
+        book_ids: List[uuid.UUID],
+        for_update: bool = False
+    ) -> Dict[uuid.UUID, ReadingProgress]:
+        """Get user's progress of several books by book id (locked with for_update)"""
+        if not book_ids:
+            return {}
+        query = db.query(ReadingProgress).filter(
+            ReadingProgress.user_id == user_id,
+            ReadingProgress.book_id.in_(book_ids)
+        )
+        if for_update:
+            query = query.with_for_update()
+        return {progress.book_id: progress for progress in query}
+
+    def lock_progress_for_books(
+        self, db: Session, user_id: uuid.UUID, book_ids: List[uuid.UUID]
+    ) -> Tuple[Dict[uuid.UUID, ReadingProgress], Set[uuid.UUID]]:
+        """
+        Lock user's progress rows of books until commit, creating missing rows
+        (at page 0) first. Returns rows by book id and ids of books whose rows
+        were created here. A concurrent first update of the same book waits
+        on the insert and then sees the committed row, so the previous page
+        always comes from a locked row.
+        """
+        if not book_ids:
+            return {}, set()
+        statement = upsert_insert(db, ReadingProgress).values([
+            {"id": uuid7(), "user_id": user_id, "book_id": book_id, "current_page": 0}
+            for book_id in book_ids
+        ])
+        statement = statement.on_conflict_do_nothing(
+            index_elements=[ReadingProgress.user_id, ReadingProgress.book_id]
+        ).returning(ReadingProgress.book_id)
+        created = set(db.scalars(statement).all())
+        return self.get_progress_for_books(db, user_id, book_ids, for_update=True), created
+
+    def lock_progress_with_book(
+        self, db: Session, user_id: uuid.UUID, book_id: uuid.UUID
+    ) -> Optional[Tuple[ReadingProgress, Book]]:
+        """Lock user's progress of book until commit, loaded with the book in one statement"""
+        row = db.query(ReadingProgress, Book).join(
+            Book, Book.id == ReadingProgress.book_id
+        ).filter(
+            ReadingProgress.user_id == user_id,
+            ReadingProgress.book_id == book_id
+        ).with_for_update(of=ReadingProgress).first()
+        return (row[0], row[1]) if row else None
+
     def get_progress(
         self,
         db: Session,
         user_id: uuid.UUID,
-        book_id: uuid.UUID
+        book_id: uuid.UUID,
+        for_update: bool = False
     ) -> Optional[ReadingProgress]:
-        """Get reading progress"""
-        return db.query(ReadingProgress).filter(
+        """Get reading progress (locked until commit with for_update)"""
+        query = db.query(ReadingProgress).filter(
             and_(
                 ReadingProgress.user_id == user_id,
                 ReadingProgress.book_id == book_id
             )
-        ).first()
+        )
+        if for_update:
+            query = query.with_for_update()
+        return query.first()
 
     def get_user_progress(self, db: Session, user_id: uuid.UUID) -> List[ReadingProgress]:
         """Get all reading progress for user"""
@@ -41,36 +165,378 @@ class ReadingRepository:
             ReadingProgress.user_id == user_id
         ).all()
 
-    def get_pages_read_today(self, db: Session, user_id: uuid.UUID) -> int:
-        """Get total pages read today by user"""
-        today = date.today()
-        result = db.query(
-            func.sum(ReadingProgress.current_page)
-        ).filter(
-            and_(
-                ReadingProgress.user_id == user_id,
-                func.date(ReadingProgress.updated_at) == today
-            )
+    def add_reading_event(self, db: Session, event: ReadingEvent) -> ReadingEvent:
+        """Append reading event"""
+        db.add(event)
+        db.flush()
+        return event
+
+    def add_reading_events(self, db: Session, events: List[ReadingEvent]) -> None:
+        """Append reading events"""
+        db.add_all(events)
+        db.flush()
+
+    def add_pages_read(
+        self, db: Session, user_id: uuid.UUID, day: date, pages: int
+    ) -> int:
+        """Add pages to user's daily rollup, return pages read that day"""
+        return db.execute(self._rollup_upsert(db, user_id, day, pages)).scalar_one()
+
+    def record_reading(
+        self,
+        db: Session,
+        user_id: uuid.UUID,
+        day: date,
+        pages: int,
+        books_started: int = 0,
+        books_finished: int = 0
+    ) -> None:
+        """
+        Add pages read on day to the daily rollup and deltas to the stats,
+        and continue the habit streak (creating the habit if missing) when
+        the day's pages meet the goal. One statement on PostgreSQL
+        (data-modifying CTEs), one per table on SQLite.
+        """
+        rollup = self._rollup_upsert(db, user_id, day, pages)
+        stats = self._stats_upsert(db, user_id, books_started, books_finished, pages)
+        if db.get_bind().dialect.name == "postgresql":
+            rollup = rollup.cte("rollup")
+            stats = stats.returning(UserReadingStats.user_id).cte("stats")
+            day_pages = select(rollup.c.pages_read).scalar_subquery()
+            statement = self._streak_upsert(db, user_id, day, day_pages).add_cte(rollup, stats)
+        else:
+            day_pages = db.execute(rollup).scalar_one()
+            db.execute(stats)
+            statement = self._streak_upsert(db, user_id, day, literal(day_pages, Integer))
+        # Habit loaded in the session is refreshed with the new streak
+        db.scalars(statement, execution_options={"populate_existing": True}).all()
+
+    def _rollup_upsert(self, db: Session, user_id: uuid.UUID, day: date, pages: int):
+        """Upsert adding pages to daily rollup, returning pages read that day"""
+        statement = upsert_insert(db, DailyReadingRollup).values(
+            user_id=user_id, day=day, pages_read=pages
+        )
+        return statement.on_conflict_do_update(
+            index_elements=[DailyReadingRollup.user_id, DailyReadingRollup.day],
+            set_={"pages_read": DailyReadingRollup.pages_read + statement.excluded.pages_read}
+        ).returning(DailyReadingRollup.pages_read)
+
+    def _stats_upsert(
+        self,
+        db: Session,
+        user_id: uuid.UUID,
+        books_started: int,
+        books_finished: int,
+        pages: int
+    ):
+        """Upsert adding deltas to user's reading stats"""
+        statement = upsert_insert(db, UserReadingStats).values(
+            user_id=user_id,
+            books_started=books_started,
+            books_finished=books_finished,
+            total_pages=pages,
+            last_activity_at=func.now()
+        )
+        excluded = statement.excluded
+        return statement.on_conflict_do_update(
+            index_elements=[UserReadingStats.user_id],
+            set_={
+                "books_started": UserReadingStats.books_started + excluded.books_started,
+                "books_finished": UserReadingStats.books_finished + excluded.books_finished,
+                "total_pages": UserReadingStats.total_pages + excluded.total_pages,
+                "last_activity_at": excluded.last_activity_at,
+            }
+        )
+
+    def _streak_upsert(self, db: Session, user_id: uuid.UUID, day: date, day_pages):
+        """
+        Habit upsert continuing the streak with day when day_pages (SQL
+        expression) meet the daily goal: a streak last continued the day
+        before grows, one already counted for day stays, others restart at 1.
+        Returns the habit when it was created or changed.
+        """
+        now = literal(datetime.utcnow(), DateTime(timezone=True))
+        met_default_goal = day_pages >= DEFAULT_DAILY_GOAL_PAGES
+        last_day = func.date(ReadingHabit.last_reading_date)
+        statement = upsert_insert(db, ReadingHabit).values(
+            id=uuid7(),
+            user_id=user_id,
+            daily_goal_pages=DEFAULT_DAILY_GOAL_PAGES,
+            current_streak=case((met_default_goal, 1), else_=0),
+            last_reading_date=case((met_default_goal, now), else_=None)
+        )
+        return statement.on_conflict_do_update(
+            index_elements=[ReadingHabit.user_id],
+            set_={
+                "current_streak": case(
+                    (last_day == literal(day, Date), ReadingHabit.current_streak),
+                    (last_day == literal(day - timedelta(days=1), Date),
+                     ReadingHabit.current_streak + 1),
+                    else_=1
+                ),
+                "last_reading_date": case(
+                    (last_day == literal(day, Date), ReadingHabit.last_reading_date),
+                    else_=now
+                ),
+            },
+            where=ReadingHabit.daily_goal_pages <= day_pages
+        ).returning(ReadingHabit)
+
+    def get_pages_read_on(self, db: Session, user_id: uuid.UUID, day: date) -> int:
+        """Get pages read by user on given day (primary key lookup)"""
+        result = db.query(DailyReadingRollup.pages_read).filter(
+            DailyReadingRollup.user_id == user_id,
+            DailyReadingRollup.day == day
         ).scalar()
         return result or 0
 
+    def get_pages_read_today(self, db: Session, user_id: uuid.UUID) -> int:
+        """Get total pages read today by user"""
+        return self.get_pages_read_on(db, user_id, date.today())
+
+    def get_goal_days(
+        self, db: Session, user_id: uuid.UUID, min_pages: int, since: date
+    ) -> Set[date]:
+        """Days since given day on which user read at least min_pages"""
+        rows = db.query(DailyReadingRollup.day).filter(
+            DailyReadingRollup.user_id == user_id,
+            DailyReadingRollup.day >= since,
+            DailyReadingRollup.pages_read >= min_pages
+        ).all()
+        return {row.day for row in rows}
+
+    def add_to_stats(
+        self,
+        db: Session,
+        user_id: uuid.UUID,
+        books_started: int = 0,
+        books_finished: int = 0,
+        pages: int = 0
+    ) -> None:
+        """Add deltas to user's reading stats (one upsert)"""
+        db.execute(self._stats_upsert(db, user_id, books_started, books_finished, pages))
+
+    def get_stats(
+        self, db: Session, user_id: uuid.UUID
+    ) -> Tuple[Optional[UserReadingStats], Optional[ReadingHabit]]:
+        """
+        Get user's reading stats and habit, one statement for users who read
+        (primary key lookup joined with the habit by its unique user_id)
+        """
+        row = db.query(UserReadingStats, ReadingHabit).outerjoin(
+            ReadingHabit, ReadingHabit.user_id == UserReadingStats.user_id
+        ).filter(UserReadingStats.user_id == user_id).first()
+        if row is None:
+            return None, self.get_habit(db, user_id)
+        return row[0], row[1]
+
     def create_habit(self, db: Session, habit: ReadingHabit) -> ReadingHabit:
         """Create reading habit"""
         db.add(habit)
-        db.commit()
-        db.refresh(habit)
+        db.flush()
         return habit
 
     def update_habit(self, db: Session, habit: ReadingHabit) -> ReadingHabit:
         """Update reading habit"""
-        db.commit()
-        db.refresh(habit)
+        db.flush()
         return habit
 
+    def expire_streaks(self, db: Session, before: datetime, limit: int) -> int:
+        """
+        Reset up to limit running streaks last continued before the given
+        time, with one UPDATE (no rows are loaded); returns number reset
+        """
+        # Literal 0 matches the predicate of ix_reading_habits_active_streak
+        # (a bound parameter would not, in a generic plan)
+        stale = select(ReadingHabit.id).where(
+            ReadingHabit.current_streak > literal_column("0"),
+            ReadingHabit.last_reading_date < before
+        ).limit(limit)
+        result = db.execute(
+            update(ReadingHabit)
+            .where(ReadingHabit.id.in_(stale))
+            .values(current_streak=0)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
+
     def get_habit(self, db: Session, user_id: uuid.UUID) -> Optional[ReadingHabit]:
         """Get reading habit"""
         return db.query(ReadingHabit).filter(
             ReadingHabit.user_id == user_id
         ).first()
 
+    def get_or_create_habit(
+        self, db: Session, user_id: uuid.UUID, daily_goal_pages: int = DEFAULT_DAILY_GOAL_PAGES
+    ) -> ReadingHabit:
+        """
+        Get reading habit, creating it if missing.
+        Existing habits cost one SELECT; creation is race-free
+        (INSERT ... ON CONFLICT DO NOTHING).
+        """
+        habit = self.get_habit(db, user_id)
+        if habit:
+            return habit
+        statement = upsert_insert(db, ReadingHabit).values(
+            id=uuid7(), user_id=user_id,
+            daily_goal_pages=daily_goal_pages, current_streak=0
+        ).on_conflict_do_nothing(index_elements=[ReadingHabit.user_id]).returning(ReadingHabit)
+        # Nothing returned: created concurrently
+        return db.scalars(statement).one_or_none() or self.get_habit(db, user_id)
+
+    def upsert_habit_goal(
+        self, db: Session, user_id: uuid.UUID, daily_goal_pages: int
+    ) -> ReadingHabit:
+        """Create reading habit or update its daily goal in one statement"""
+        statement = upsert_insert(db, ReadingHabit).values(
+            id=uuid7(), user_id=user_id,
+            daily_goal_pages=daily_goal_pages, current_streak=0
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[ReadingHabit.user_id],
+            set_={"daily_goal_pages": statement.excluded.daily_goal_pages}
+        ).returning(ReadingHabit)
+        return db.scalars(statement, execution_options={"populate_existing": True}).one()
+
+
+class AsyncReadingRepository(AsyncRepository):
+    """Async variant of ReadingRepository"""
+    repository_class = ReadingRepository
+
+    async def create_progress(self, db: AsyncSession, progress: ReadingProgress) -> ReadingProgress:
+        return await self._run(db, self.repository.create_progress, progress)
+
+    async def update_progress(self, db: AsyncSession, progress: ReadingProgress) -> ReadingProgress:
+        return await self._run(db, self.repository.update_progress, progress)
+
+    async def upsert_progress(
+        self,
+        db: AsyncSession,
+        user_id: uuid.UUID,
+        book_id: uuid.UUID,
+        current_page: int
+    ) -> ReadingProgress:
+        return await self._run(
+            db, self.repository.upsert_progress, user_id, book_id, current_page
+        )
+
+    async def lock_progress_with_book(
+        self, db: AsyncSession, user_id: uuid.UUID, book_id: uuid.UUID
+    ) -> Optional[Tuple[ReadingProgress, Book]]:
+        return await self._run(db, self.repository.lock_progress_with_book, user_id, book_id)
+
+    async def insert_progress(
+        self, db: AsyncSession, user_id: uuid.UUID, book_id: uuid.UUID, current_page: int
+    ) -> Optional[ReadingProgress]:
+        return await self._run(db, self.repository.insert_progress, user_id, book_id, current_page)
+
+    async def upsert_progress_many(
+        self, db: AsyncSession, user_id: uuid.UUID, updates: List[Tuple[uuid.UUID, int, datetime]]
+    ) -> List[ReadingProgress]:
+        return await self._run(db, self.repository.upsert_progress_many, user_id, updates)
+
+    async def get_progress_for_books(
+        self,
+        db: AsyncSession,
+        user_id: uuid.UUID,
+        book_ids: List[uuid.UUID],
+        for_update: bool = False
+    ) -> Dict[uuid.UUID, ReadingProgress]:
+        return await self._run(
+            db, self.repository.get_progress_for_books, user_id, book_ids, for_update
+        )
+
+    async def lock_progress_for_books(
+        self, db: AsyncSession, user_id: uuid.UUID, book_ids: List[uuid.UUID]
+    ) -> Tuple[Dict[uuid.UUID, ReadingProgress], Set[uuid.UUID]]:
+        return await self._run(db, self.repository.lock_progress_for_books, user_id, book_ids)
+
+    async def get_progress(
+        self,
+        db: AsyncSession,
+        user_id: uuid.UUID,
+        book_id: uuid.UUID,
+        for_update: bool = False
+    ) -> Optional[ReadingProgress]:
+        return await self._run(db, self.repository.get_progress, user_id, book_id, for_update)
+
+    async def get_user_progress(self, db: AsyncSession, user_id: uuid.UUID) -> List[ReadingProgress]:
+        return await self._run(db, self.repository.get_user_progress, user_id)
+
+    async def add_reading_event(self, db: AsyncSession, event: ReadingEvent) -> ReadingEvent:
+        return await self._run(db, self.repository.add_reading_event, event)
+
+    async def add_reading_events(self, db: AsyncSession, events: List[ReadingEvent]) -> None:
+        return await self._run(db, self.repository.add_reading_events, events)
+
+    async def add_pages_read(
+        self, db: AsyncSession, user_id: uuid.UUID, day: date, pages: int
+    ) -> int:
+        return await self._run(db, self.repository.add_pages_read, user_id, day, pages)
+
+    async def get_pages_read_on(self, db: AsyncSession, user_id: uuid.UUID, day: date) -> int:
+        return await self._run(db, self.repository.get_pages_read_on, user_id, day)
+
+    async def get_pages_read_today(self, db: AsyncSession, user_id: uuid.UUID) -> int:
+        return await self._run(db, self.repository.get_pages_read_today, user_id)
+
+    async def get_goal_days(
+        self, db: AsyncSession, user_id: uuid.UUID, min_pages: int, since: date
+    ) -> Set[date]:
+        return await self._run(db, self.repository.get_goal_days, user_id, min_pages, since)
+
+    async def create_habit(self, db: AsyncSession, habit: ReadingHabit) -> ReadingHabit:
+        return await self._run(db, self.repository.create_habit, habit)
+
+    async def update_habit(self, db: AsyncSession, habit: ReadingHabit) -> ReadingHabit:
+        return await self._run(db, self.repository.update_habit, habit)
+
+    async def expire_streaks(self, db: AsyncSession, before: datetime, limit: int) -> int:
+        return await self._run(db, self.repository.expire_streaks, before, limit)
+
+    async def get_habit(self, db: AsyncSession, user_id: uuid.UUID) -> Optional[ReadingHabit]:
+        return await self._run(db, self.repository.get_habit, user_id)
+
+    async def get_or_create_habit(
+        self, db: AsyncSession, user_id: uuid.UUID, daily_goal_pages: int = DEFAULT_DAILY_GOAL_PAGES
+    ) -> ReadingHabit:
+        return await self._run(
+            db, self.repository.get_or_create_habit, user_id, daily_goal_pages
+        )
+
+    async def upsert_habit_goal(
+        self, db: AsyncSession, user_id: uuid.UUID, daily_goal_pages: int
+    ) -> ReadingHabit:
+        return await self._run(db, self.repository.upsert_habit_goal, user_id, daily_goal_pages)
+
+    async def add_to_stats(
+        self,
+        db: AsyncSession,
+        user_id: uuid.UUID,
+        books_started: int = 0,
+        books_finished: int = 0,
+        pages: int = 0
+    ) -> None:
+        return await self._run(
+            db, self.repository.add_to_stats, user_id,
+            books_started=books_started, books_finished=books_finished, pages=pages
+        )
+
+    async def record_reading(
+        self,
+        db: AsyncSession,
+        user_id: uuid.UUID,
+        day: date,
+        pages: int,
+        books_started: int = 0,
+        books_finished: int = 0
+    ) -> None:
+        return await self._run(
+            db, self.repository.record_reading, user_id, day, pages,
+            books_started=books_started, books_finished=books_finished
+        )
 
+    async def get_stats(
+        self, db: AsyncSession, user_id: uuid.UUID
+    ) -> Tuple[Optional[UserReadingStats], Optional[ReadingHabit]]:
+        return await self._run(db, self.repository.get_stats, user_id)
@@ -1,12 +1,14 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import uuid
 from typing import Optional
 
-from app.infrastructure.database import get_db
+from app.infrastructure.config import settings
+from app.infrastructure.database import get_async_read_db, replica_sticky_key
 from app.users.application.auth_service import AuthService
-from app.users.infrastructure.user_repository import UserRepository
+from app.users.infrastructure.user_cache import user_cache
+from app.users.infrastructure.user_repository import AsyncUserRepository, UserRepository
 from app.users.domain.models import User
 
 security = HTTPBearer(auto_error=False)
@@ -18,34 +20,67 @@ def get_auth_service() -> AuthService:
     return AuthService(user_repository)
 
 
-def get_current_user(
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
-    db: Session = Depends(get_db),
-    auth_service: AuthService = Depends(get_auth_service)
-) -> User:
-    """Dependency to get current authenticated user"""
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+
+def _token_user_id(
+    credentials: Optional[HTTPAuthorizationCredentials], auth_service: AuthService
+) -> uuid.UUID:
+    """User id from signed token claims"""
     if credentials is None:
-        raise credentials_exception
+        raise _credentials_exception()
 
     token = credentials.credentials
     user_id_str = auth_service.get_current_user_id(token)
     if user_id_str is None:
-        raise credentials_exception
+        raise _credentials_exception()
 
     try:
         user_id = uuid.UUID(user_id_str)
     except ValueError:
-        raise credentials_exception
+        raise _credentials_exception()
 
-    user_repository = UserRepository()
-    user = user_repository.get_by_id(db, user_id)
+    # Reads of this request see the user's own recent writes
+    replica_sticky_key.set(str(user_id))
+    return user_id
+
+
+async def get_current_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
+    db: AsyncSession = Depends(get_async_read_db),
+    auth_service: AuthService = Depends(get_auth_service)
+) -> User:
+    """Dependency to get current authenticated user (cached in process)"""
+    user_id = _token_user_id(credentials, auth_service)
+
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+    version = user_cache.version()
+    user_repository = AsyncUserRepository()
+    user = await user_repository.get_by_id(db, user_id)
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
+    user_cache.put(user, version)
     return user
 
+
+async def get_current_user_id(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
+    db: AsyncSession = Depends(get_async_read_db),
+    auth_service: AuthService = Depends(get_auth_service)
+) -> uuid.UUID:
+    """
+    Dependency for endpoints that only need the current user's id.
+    With AUTH_STATELESS the signed token is trusted as is, so tokens of
+    deleted users stay valid until they expire.
+    """
+    if settings.AUTH_STATELESS:
+        return _token_user_id(credentials, auth_service)
+    user = await get_current_user(credentials, db, auth_service)
+    return user.id
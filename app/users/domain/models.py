@@ -1,17 +1,17 @@
 from sqlalchemy import Column, String, DateTime
 from sqlalchemy.sql import func
-import uuid
 
 from app.infrastructure.database import Base
-from app.infrastructure.types import GUID
+from app.infrastructure.types import GUID, uuid7
 
 
 class User(Base):
     __tablename__ = "users"
 
-    id = Column(GUID(), primary_key=True, default=uuid.uuid4)
+    id = Column(GUID(), primary_key=True, default=uuid7)
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
-
+    # Server defaults come back with the INSERT/UPDATE (RETURNING)
+    __mapper_args__ = {"eager_defaults": True}
@@ -0,0 +1,102 @@
+"""
+In-process cache of authenticated users
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import threading
+import time
+import uuid
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+
+from app.infrastructure.config import settings
+from app.users.domain.models import User
+
+# Session.info key of users changed in the current transaction
+CHANGED_USERS_KEY = "changed_user_ids"
+
+
+class UserCache:
+    """
+    Size-bounded LRU cache of users keyed by user id. Column values are
+    cached, each get() builds a new (transient) User from them, so requests
+    never share ORM instances.
+    Entries expire after ttl seconds; changes committed through this process
+    invalidate the entry right away, other processes see them after ttl.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[uuid.UUID, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = 0
+
+    def get(self, user_id: uuid.UUID) -> Optional[User]:
+        """Cached user, None on miss or expired entry"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            values, expires_at = entry
+            if expires_at <= now:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+        return User(**values)
+
+    def version(self) -> int:
+        """Invalidation counter; take it before loading a user to put()"""
+        with self._lock:
+            return self._version
+
+    def put(self, user: User, version: int):
+        """
+        Cache user loaded from the database. Skipped when any user was
+        invalidated since version was taken, as the loaded row may predate it.
+        """
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        values = {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+        with self._lock:
+            if version != self._version:
+                return
+            self._entries[user.id] = (values, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: uuid.UUID):
+        """Drop cached user (call after committing a change to it)"""
+        with self._lock:
+            self._version += 1
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+
+
+user_cache = UserCache(settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _collect_changed_user(mapper, connection, target):
+    # Invalidated once the change is committed; dropping the entry at flush
+    # would let a concurrent request cache the old row again
+    object_session(target).info.setdefault(CHANGED_USERS_KEY, set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session):
+    for user_id in session.info.pop(CHANGED_USERS_KEY, ()):
+        user_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_users(session):
+    session.info.pop(CHANGED_USERS_KEY, None)
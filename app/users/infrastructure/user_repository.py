@@ -1,16 +1,17 @@
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import Optional
 import uuid
 
 from app.users.domain.models import User
+from app.infrastructure.database import AsyncRepository
 
 
 class UserRepository:
     def create(self, db: Session, user: User) -> User:
         """Create user"""
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        db.flush()
         return user
 
     def get_by_id(self, db: Session, user_id: uuid.UUID) -> Optional[User]:
@@ -22,3 +23,15 @@ class UserRepository:
         return db.query(User).filter(User.email == email).first()
 
 
+class AsyncUserRepository(AsyncRepository):
+    """Async variant of UserRepository"""
+    repository_class = UserRepository
+
+    async def create(self, db: AsyncSession, user: User) -> User:
+        return await self._run(db, self.repository.create, user)
+
+    async def get_by_id(self, db: AsyncSession, user_id: uuid.UUID) -> Optional[User]:
+        return await self._run(db, self.repository.get_by_id, user_id)
+
+    async def get_by_email(self, db: AsyncSession, email: str) -> Optional[User]:
+        return await self._run(db, self.repository.get_by_email, email)
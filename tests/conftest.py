@@ -1,10 +1,12 @@
 import pytest
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from fastapi.testclient import TestClient
 import uuid
 
-from app.infrastructure.database import Base, get_db
+from app.infrastructure.database import Base, get_async_db, get_async_read_db, get_db, get_read_db
 from app.main import app
 from app.users.domain.models import User
 from app.books.domain.models import Book
@@ -15,7 +17,12 @@ from app.users.infrastructure.user_repository import UserRepository
 # Test database
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+TestingSessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, expire_on_commit=False, bind=engine
+)
+# Same database through the async driver; no pooling, as each TestClient runs its own event loop
+async_engine = create_async_engine("sqlite+aiosqlite:///./test.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 
 @pytest.fixture(scope="function")
@@ -39,7 +46,14 @@ def client(db):
         finally:
             pass
     
+    async def override_get_async_db():
+        async with TestingAsyncSessionLocal() as async_db:
+            yield async_db
+    
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_async_read_db] = override_get_async_db
     with TestClient(app) as test_client:
         yield test_client
     app.dependency_overrides.clear()
@@ -56,7 +70,9 @@ def test_user(db):
         email="test@example.com",
         hashed_password=auth_service.get_password_hash("testpassword")
     )
-    return user_repository.create(db, user)
+    user = user_repository.create(db, user)
+    db.commit()
+    return user
 
 
 @pytest.fixture
@@ -95,9 +111,12 @@ def test_book(db, test_user):
         id=uuid.uuid4(),
         user_id=test_user.id,
         book_id=book.id,
-        status=BookStatus.PLANNED
+        status=BookStatus.PLANNED,
+        book_title=book.title,
+        book_author=book.author
     )
     user_book_repository.create(db, user_book)
+    db.commit()
     
     return book
 
@@ -117,6 +136,8 @@ def public_book(db):
         file_path="public/path.pdf"
     )
     book_repository = BookRepository()
-    return book_repository.create(db, book)
+    book = book_repository.create(db, book)
+    db.commit()
+    return book
 
 
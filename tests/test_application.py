@@ -1,4 +1,5 @@
 import pytest
+import os
 import uuid
 from app.users.application.user_service import UserService
 from app.users.application.auth_service import AuthService
@@ -103,3 +104,653 @@ def test_reading_service_get_progress_percentage(db, test_user, test_book):
     assert percentage == 50.0  # 50 pages out of 100
 
 
+def test_unit_of_work_commits_once(db, test_user, test_book):
+    """Test service writes commit once per unit of work, without refresh selects"""
+    from unittest.mock import patch
+    from sqlalchemy import event
+    from app.infrastructure.database import unit_of_work
+    from app.reading.domain.models import ReadingHabit
+
+    reading_service = ReadingService(ReadingRepository(), BookRepository())
+    engine = db.get_bind()
+    statements, commits = [], []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    def count_commit(conn):
+        commits.append(conn)
+
+    event.listen(engine, "before_cursor_execute", count_statement)
+    event.listen(engine, "commit", count_commit)
+    try:
+        with patch("app.reading.application.reading_service.message_broker"):
+            reading_service.update_progress(db, test_user.id, test_book.id, 10)
+            statements.clear()
+            commits.clear()
+            progress = reading_service.update_progress(db, test_user.id, test_book.id, 20)
+    finally:
+        event.remove(engine, "before_cursor_execute", count_statement)
+        event.remove(engine, "commit", count_commit)
+
+    assert len(commits) == 1
+    # Locked previous position with its book, progress upsert, event, then
+    # rollup, stats and habit (one statement on PostgreSQL, three on SQLite)
+    assert len(statements) == (4 if engine.dialect.name == "postgresql" else 6)
+    # updated_at came back with the UPDATE
+    assert "updated_at" in progress.__dict__
+
+    # Nested units of work join the outer one; an error rolls everything back
+    try:
+        with unit_of_work(db):
+            reading_service.update_habit_goal(db, test_user.id, 30)
+            raise RuntimeError("abort")
+    except RuntimeError:
+        pass
+    assert db.query(ReadingHabit).filter(ReadingHabit.user_id == test_user.id).one().daily_goal_pages == 10
+
+
+def test_index_friendly_queries(db, test_user, test_book, public_book):
+    """Test rewritten hot queries keep their results"""
+    from datetime import date
+    from app.books.domain.models import Book
+
+    other_owner = uuid.uuid4()
+    db.add(Book(id=uuid.uuid4(), title="Other", author="A", pages=1, owner_id=other_owner))
+    db.commit()
+    books = BookRepository().get_user_books(db, test_user.id)
+    assert {book.id for book in books} == {test_book.id, public_book.id}
+
+    reading_repository = ReadingRepository()
+    reading_repository.add_pages_read(db, test_user.id, date.today(), 12)
+    reading_repository.add_pages_read(db, test_user.id, date.today(), 3)
+    assert reading_repository.get_pages_read_today(db, test_user.id) == 15
+
+
+def test_reading_events_and_daily_rollup(db, test_user, test_book, public_book):
+    """Test pages read today count page deltas, not positions"""
+    from unittest.mock import patch
+    from app.reading.domain.models import ReadingEvent
+
+    reading_service = ReadingService(ReadingRepository(), BookRepository())
+    with patch("app.reading.application.reading_service.message_broker"):
+        reading_service.update_progress(db, test_user.id, test_book.id, 4)
+        reading_service.update_progress(db, test_user.id, test_book.id, 9)
+        # Going back logs the move but reads nothing
+        reading_service.update_progress(db, test_user.id, test_book.id, 6)
+        reading_service.update_progress(db, test_user.id, test_book.id, 6)
+        reading_service.update_progress(db, test_user.id, public_book.id, 2)
+
+    events = db.query(ReadingEvent).order_by(ReadingEvent.id).all()
+    assert [event.pages for event in events] == [4, 5, -3, 2]
+    # 4 + 5 + 2 pages read; positions would have summed to 8
+    assert reading_service.reading_repository.get_pages_read_today(db, test_user.id) == 11
+    habit = reading_service.get_or_create_habit(db, test_user.id)
+    assert habit.current_streak == 1
+
+
+def test_reading_repository_upserts(db, test_user, test_book):
+    """Test progress and habit writes are single-statement upserts"""
+    from app.reading.domain.models import ReadingHabit, ReadingProgress
+
+    reading_repository = ReadingRepository()
+    first = reading_repository.upsert_progress(db, test_user.id, test_book.id, 5)
+    second = reading_repository.upsert_progress(db, test_user.id, test_book.id, 8)
+    assert second.id == first.id
+    assert second.current_page == 8
+    assert db.query(ReadingProgress).count() == 1
+
+    habit = reading_repository.get_or_create_habit(db, test_user.id)
+    assert habit.daily_goal_pages == 10
+    assert reading_repository.get_or_create_habit(db, test_user.id).id == habit.id
+    updated = reading_repository.upsert_habit_goal(db, test_user.id, 25)
+    assert updated.id == habit.id
+    assert updated.daily_goal_pages == 25
+    assert db.query(ReadingHabit).count() == 1
+
+
+def _upload(content: bytes, content_type: str = "application/pdf"):
+    """Build UploadFile over in-memory content"""
+    from io import BytesIO
+    from fastapi import UploadFile
+    from starlette.datastructures import Headers
+
+    return UploadFile(
+        BytesIO(content),
+        filename="book.pdf",
+        headers=Headers({"content-type": content_type})
+    )
+
+
+@pytest.mark.asyncio
+async def test_storage_upload_stream_multipart():
+    """Test large uploads are sent as multipart upload in parts"""
+    from unittest.mock import MagicMock, patch
+    from app.infrastructure.config import settings
+    from app.infrastructure.storage import StorageService, iter_upload_chunks
+
+    storage = StorageService()
+    storage.backend._client = MagicMock()
+    storage.backend._client.create_multipart_upload.return_value = {"UploadId": "upload-1"}
+    storage.backend._client.upload_part.side_effect = lambda **kw: {"ETag": f"etag-{kw['PartNumber']}"}
+
+    with patch.object(settings, "STORAGE_UPLOAD_PART_SIZE", 100), \
+            patch.object(settings, "STORAGE_CHUNK_SIZE", 30):
+        await storage.upload_stream(iter_upload_chunks(_upload(b"x" * 250)), "book.pdf")
+
+    assert storage.backend._client.upload_part.call_count == 3
+    parts = storage.backend._client.complete_multipart_upload.call_args.kwargs["MultipartUpload"]["Parts"]
+    assert [p["PartNumber"] for p in parts] == [1, 2, 3]
+    # Full parts go out as they fill up, only the short tail is the last part
+    bodies = [c.kwargs["Body"] for c in storage.backend._client.upload_part.call_args_list]
+    assert [len(body) for body in bodies] == [120, 120, 10]
+    assert all(isinstance(body, bytearray) for body in bodies)
+    storage.backend._client.put_object.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_create_private_book_rejects_oversized_upload(db, test_user):
+    """Test oversized or non-PDF upload is rejected before reaching storage"""
+    from unittest.mock import MagicMock, patch
+    from app.infrastructure.config import settings
+    from app.infrastructure.storage import storage_service
+
+    client = MagicMock()
+    client.create_multipart_upload.return_value = {"UploadId": "upload-1"}
+    client.upload_part.return_value = {"ETag": "etag"}
+    book_service = BookService(BookRepository())
+
+    with patch.object(storage_service.backend, "_client", client), \
+            patch.object(settings, "STORAGE_UPLOAD_PART_SIZE", 100), \
+            patch.object(settings, "STORAGE_CHUNK_SIZE", 50), \
+            patch.object(settings, "MAX_UPLOAD_SIZE", 200):
+        with pytest.raises(ValueError, match="File size exceeds"):
+            await book_service.create_private_book(
+                db, "Big", "Author", 10, _upload(b"%PDF-" + b"x" * 300), test_user.id
+            )
+        with pytest.raises(ValueError, match="Only PDF files"):
+            await book_service.create_private_book(
+                db, "Fake", "Author", 10, _upload(b"not a pdf"), test_user.id
+            )
+
+    # Rejected while hashing the local upload, before any transfer
+    client.create_multipart_upload.assert_not_called()
+    client.put_object.assert_not_called()
+
+
+def test_file_cache_lru_eviction(tmp_path):
+    """Test disk cache evicts least recently used entries by size"""
+    from app.infrastructure.file_cache import FileCache
+
+    cache = FileCache(str(tmp_path), max_bytes=250)
+
+    def writer(data):
+        def write(out):
+            out.write(data)
+            return True
+        return write
+
+    cache.get_or_fill("a.pdf", writer(b"a" * 100)).close()
+    cache.get_or_fill("b.pdf", writer(b"b" * 100)).close()
+    cache.open("a.pdf").close()  # a becomes most recently used
+    cache.get_or_fill("c.pdf", writer(b"c" * 100)).close()
+
+    assert cache.open("b.pdf") is None
+    with cache.open("a.pdf") as cached:
+        assert cached.read() == b"a" * 100
+    assert cache.get_or_fill("big.pdf", writer(b"x" * 300)) is None
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_file_cache_shared_between_workers(tmp_path):
+    """Test caches of several processes on one directory share the size limit"""
+    from app.infrastructure.file_cache import FileCache
+
+    first = FileCache(str(tmp_path), max_bytes=250)
+    second = FileCache(str(tmp_path), max_bytes=250)
+
+    def writer(data):
+        def write(out):
+            out.write(data)
+            return True
+        return write
+
+    first.get_or_fill("a.pdf", writer(b"a" * 100)).close()
+    first.get_or_fill("b.pdf", writer(b"b" * 100)).close()
+    reading = first.open("b.pdf")
+    # Entries filled by one worker are hits for the others
+    with second.open("a.pdf") as cached:
+        assert cached.read() == b"a" * 100
+    second.get_or_fill("c.pdf", writer(b"c" * 100)).close()
+
+    # b was least recently used by any worker; its open file stays readable
+    assert first.open("b.pdf") is None
+    assert reading.read() == b"b" * 100
+    reading.close()
+    assert first.open("c.pdf") is not None
+    cached_bytes = sum(
+        os.path.getsize(tmp_path / name) for name in os.listdir(tmp_path) if not name.startswith(".")
+    )
+    assert cached_bytes <= 250
+
+
+def test_file_cache_single_flight(tmp_path):
+    """Test concurrent misses for one key run a single fill"""
+    import threading
+    import time
+    from app.infrastructure.file_cache import FileCache
+
+    cache = FileCache(str(tmp_path), max_bytes=1024)
+    fills = []
+
+    def write(out):
+        fills.append(1)
+        time.sleep(0.05)
+        out.write(b"data")
+        return True
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_fill("k.pdf", write)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(fills) == 1
+    assert all(result.read() == b"data" for result in results)
+    for result in results:
+        result.close()
+
+
+@pytest.mark.asyncio
+async def test_storage_calls_run_on_storage_executor():
+    """Test blocking storage calls are offloaded from the event loop"""
+    import threading
+    from unittest.mock import MagicMock
+    from app.infrastructure.storage import StorageService
+
+    storage = StorageService()
+    storage.backend._client = MagicMock()
+    threads = []
+
+    def head_object(**kwargs):
+        threads.append(threading.current_thread().name)
+        return {"ContentLength": 10, "ETag": '"abc"'}
+
+    storage.backend._client.head_object.side_effect = head_object
+    info = await storage.get_file_info("book.pdf")
+
+    assert info["size"] == 10
+    assert threads[0].startswith("storage")
+
+
+@pytest.mark.asyncio
+async def test_duplicate_uploads_share_stored_file(db, test_user):
+    """Test identical PDFs are stored once and deleted with the last reference"""
+    from unittest.mock import AsyncMock, patch
+    from app.infrastructure.storage import storage_service
+
+    content = b"%PDF-1.4\n" + b"same content" * 100
+    book_service = BookService(BookRepository())
+
+    with patch.object(storage_service, "upload_stream", AsyncMock()) as mock_upload, \
+            patch.object(storage_service, "delete_file", AsyncMock(return_value=True)) as mock_delete:
+        first = await book_service.create_private_book(
+            db, "First", "Author", 10, _upload(content), test_user.id
+        )
+        second = await book_service.create_private_book(
+            db, "Second", "Author", 10, _upload(content), test_user.id
+        )
+        assert first.file_path == second.file_path
+        assert first.file_path.startswith("blobs/")
+        assert mock_upload.await_count == 1
+
+        await book_service.delete_book(db, first.id, test_user.id)
+        mock_delete.assert_not_awaited()
+        await book_service.delete_book(db, second.id, test_user.id)
+        mock_delete.assert_any_await(second.file_path)
+
+
+@pytest.mark.asyncio
+async def test_slow_io_runs_outside_of_transactions(db, test_user):
+    """Test uploads and Google Books calls do not hold a database transaction"""
+    from unittest.mock import AsyncMock, patch
+    from app.books.application.library_service import LibraryService
+    from app.books.infrastructure.user_book_repository import UserBookRepository
+    from app.infrastructure.storage import storage_service
+
+    in_transaction = []
+
+    async def upload_stream(chunks, file_path, content_type=None):
+        in_transaction.append(db.in_transaction())
+        return file_path
+
+    async def get_book_by_isbn(isbn):
+        in_transaction.append(db.in_transaction())
+        return {"title": "Fetched", "author": "Author", "pages": 120}
+
+    book_service = BookService(BookRepository(), UserBookRepository())
+    library_service = LibraryService(BookRepository(), UserBookRepository())
+    with patch.object(storage_service, "upload_stream", side_effect=upload_stream), \
+            patch(
+                "app.books.application.library_service.GoogleBooksService.get_book_by_isbn",
+                side_effect=get_book_by_isbn
+            ), \
+            patch("app.books.application.library_service.GoogleBooksService.close", AsyncMock()):
+        book = await book_service.create_private_book(
+            db, "Uploaded", "Author", 10, _upload(b"%PDF-1.4\n" + b"x" * 100), test_user.id
+        )
+        user_book = await library_service.add_book_by_isbn(db, test_user.id, "9780000000002")
+
+    assert in_transaction and not any(in_transaction)
+    assert book.file_path.startswith("blobs/")
+    assert user_book.book.title == "Fetched"
+
+
+@pytest.mark.asyncio
+async def test_reupload_while_blob_is_deleted_keeps_new_file(db, test_user):
+    """Test content uploaded again before the old object is deleted stays stored"""
+    from unittest.mock import patch
+    from app.infrastructure.storage import storage_service
+
+    content = b"%PDF-1.4\n" + b"deleted and uploaded again" * 100
+    book_service = BookService(BookRepository())
+    stored = {}
+    uploaded_again = []
+
+    async def upload_stream(chunks, file_path, content_type=None):
+        stored[file_path] = b"".join([chunk async for chunk in chunks])
+        return file_path
+
+    async def delete_file(file_path):
+        # Same content arrives after the blob row is gone, before the object is
+        if not uploaded_again:
+            uploaded_again.append(await book_service.create_private_book(
+                db, "Again", "Author", 10, _upload(content), test_user.id
+            ))
+        stored.pop(file_path, None)
+        return True
+
+    with patch.object(storage_service, "upload_stream", side_effect=upload_stream), \
+            patch.object(storage_service, "delete_file", side_effect=delete_file):
+        book = await book_service.create_private_book(
+            db, "First", "Author", 10, _upload(content), test_user.id
+        )
+        await book_service.delete_book(db, book.id, test_user.id)
+
+    assert uploaded_again[0].file_path != book.file_path
+    assert uploaded_again[0].file_path in stored
+    assert book.file_path not in stored
+
+
+@pytest.mark.asyncio
+async def test_upload_retried_while_blob_is_released(db, test_user):
+    """Test book is created from its upload when the conflicting blob was being released"""
+    from unittest.mock import AsyncMock, patch
+    from app.books.infrastructure.blob_repository import BlobRepository
+    from app.infrastructure.storage import storage_service
+
+    create = BlobRepository.create
+    attempts = []
+
+    def create_once_released(self, db, sha256, file_path, size):
+        attempts.append(file_path)
+        if len(attempts) == 1:
+            return None
+        return create(self, db, sha256, file_path, size)
+
+    book_service = BookService(BookRepository())
+    with patch.object(storage_service, "upload_stream", AsyncMock()) as mock_upload, \
+            patch.object(BlobRepository, "create", create_once_released):
+        book = await book_service.create_private_book(
+            db, "Retried", "Author", 10, _upload(b"%PDF-1.4\n" + b"released" * 100), test_user.id
+        )
+
+    assert mock_upload.await_count == 1
+    assert attempts == [book.file_path] * 2
+
+
+@pytest.mark.asyncio
+async def test_get_book_pages_reads_only_page_objects(db, test_user):
+    """Test single pages are assembled from the stored page index"""
+    from io import BytesIO
+    from unittest.mock import patch
+    from botocore.response import StreamingBody
+    from pypdf import PdfReader, PdfWriter
+    from app.infrastructure.storage import FileStream, storage_service
+
+    writer = PdfWriter()
+    for i in range(20):
+        writer.add_blank_page(100 + i, 200)
+    pdf = BytesIO()
+    writer.write(pdf)
+    content = pdf.getvalue()
+
+    stored = {}
+
+    async def upload_stream(chunks, file_path, content_type=None):
+        stored[file_path] = b"".join([chunk async for chunk in chunks])
+        return file_path
+
+    read_bytes = []
+
+    async def get_file_stream(file_path, start=None, end=None):
+        data = stored[file_path]
+        if start is not None:
+            data = data[start:end + 1]
+        read_bytes.append(len(data))
+        return FileStream(StreamingBody(BytesIO(data), len(data)), len(data))
+
+    book_service = BookService(BookRepository())
+    with patch.object(storage_service, "upload_stream", side_effect=upload_stream), \
+            patch.object(storage_service, "get_file_stream", side_effect=get_file_stream):
+        book = await book_service.create_private_book(
+            db, "Paged", "Author", 20, _upload(content), test_user.id
+        )
+        assert f"{book.file_path}.pages.json" in stored
+
+        page = await book_service.get_book_pages(book, 15, count=2)
+        reader = PdfReader(BytesIO(page))
+        assert [float(p.mediabox.width) for p in reader.pages] == [114, 115]
+        # Index is cached, page objects are fetched in a single small range
+        assert len(read_bytes) == 2
+        assert read_bytes[1] < len(content) // 5
+
+        with pytest.raises(ValueError):
+            await book_service.get_book_pages(book, 21)
+
+
+@pytest.mark.asyncio
+async def test_get_book_pages_with_shared_resources(db, test_user):
+    """Test pages sharing most of the file are cut from a single full read"""
+    import os
+    from io import BytesIO
+    from unittest.mock import patch
+    from botocore.response import StreamingBody
+    from pypdf import PdfReader, PdfWriter
+    from pypdf.generic import DictionaryObject, NameObject, StreamObject
+    from app.books.application.page_index import PageDataUnavailable, PageIndexMismatch
+    from app.infrastructure.storage import FileStream, storage_service
+
+    writer = PdfWriter()
+    shared = StreamObject()
+    shared.set_data(os.urandom(64 * 1024))
+    shared.update({
+        NameObject("/Type"): NameObject("/XObject"),
+        NameObject("/Subtype"): NameObject("/Form"),
+    })
+    shared_ref = writer._add_object(shared)
+    for i in range(10):
+        page = writer.add_blank_page(100 + i, 200)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/XObject"): DictionaryObject({NameObject("/Fm0"): shared_ref})
+        })
+    pdf = BytesIO()
+    writer.write(pdf)
+    content = pdf.getvalue()
+
+    stored = {}
+
+    async def upload_stream(chunks, file_path, content_type=None):
+        stored[file_path] = b"".join([chunk async for chunk in chunks])
+        return file_path
+
+    reads = []
+
+    async def get_file_stream(file_path, start=None, end=None):
+        data = stored[file_path]
+        if start is not None:
+            data = data[start:end + 1]
+        reads.append(len(data))
+        return FileStream(StreamingBody(BytesIO(data), len(data)), len(data))
+
+    book_service = BookService(BookRepository())
+    with patch.object(storage_service, "upload_stream", side_effect=upload_stream), \
+            patch.object(storage_service, "get_file_stream", side_effect=get_file_stream):
+        book = await book_service.create_private_book(
+            db, "Shared", "Author", 10, _upload(content), test_user.id
+        )
+
+        page = await book_service.get_book_pages(book, 3, count=2)
+        reader = PdfReader(BytesIO(page))
+        assert [float(p.mediabox.width) for p in reader.pages] == [102, 103]
+        resources = reader.pages[0]["/Resources"]["/XObject"]["/Fm0"]
+        assert resources.get_data() == shared.get_data()
+        # Index read, then the whole file once instead of ranges per object
+        assert reads[1:] == [len(content)]
+
+        stored[book.file_path] = b"%" * 1000 + content
+        with pytest.raises(PageIndexMismatch):
+            await book_service.get_book_pages(book, 3)
+
+    with patch.object(storage_service, "get_file_stream", return_value=None):
+        with pytest.raises(PageDataUnavailable):
+            await book_service.get_book_pages(book, 3)
+
+
+@pytest.mark.asyncio
+async def test_filesystem_and_memory_storage_backends(tmp_path):
+    """Test storage service works the same on filesystem and in-memory backends"""
+    from unittest.mock import patch
+    from app.infrastructure.config import settings
+    from app.infrastructure.storage import StorageService, iter_upload_chunks
+    from app.infrastructure.storage_backends import FilesystemStorageBackend, MemoryStorageBackend
+
+    content = bytes(range(256)) * 4
+    for backend in (FilesystemStorageBackend(str(tmp_path)), MemoryStorageBackend()):
+        storage = StorageService(backend)
+        with patch.object(settings, "STORAGE_UPLOAD_PART_SIZE", 300):
+            await storage.upload_stream(iter_upload_chunks(_upload(content)), "blobs/ab/book.pdf")
+
+        info = await storage.get_file_info("blobs/ab/book.pdf")
+        assert info["size"] == len(content)
+        assert info["etag"]
+
+        file_stream = await storage.get_file_stream("blobs/ab/book.pdf", 100, 199)
+        assert file_stream.content_length == 100
+        assert b"".join([chunk async for chunk in file_stream]) == content[100:200]
+        assert await storage.get_file_url("blobs/ab/book.pdf") == ""
+
+        await storage.delete_file("blobs/ab/book.pdf")
+        assert await storage.get_file_stream("blobs/ab/book.pdf") is None
+
+    backend = FilesystemStorageBackend(str(tmp_path))
+    storage = StorageService(backend)
+    await storage.upload_stream(iter_upload_chunks(_upload(content)), "book.pdf")
+    with storage.open_local_file("book.pdf") as local_file:
+        assert local_file.read() == content
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+    with pytest.raises(ValueError):
+        backend.head("../outside.pdf")
+
+
+@pytest.mark.asyncio
+async def test_async_repositories(db, test_user):
+    """Test async repository variants run queries through the async driver"""
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from sqlalchemy.pool import NullPool
+    from app.books.domain.models import Book
+    from app.books.infrastructure.book_repository import AsyncBookRepository
+    from app.infrastructure.database import get_async_database_url
+    from app.users.infrastructure.user_repository import AsyncUserRepository
+
+    assert get_async_database_url("postgresql://u:p@db/app") == "postgresql+asyncpg://u:p@db/app"
+    assert get_async_database_url("sqlite:///./test.db") == "sqlite+aiosqlite:///./test.db"
+
+    engine = create_async_engine("sqlite+aiosqlite:///./test.db", poolclass=NullPool)
+    async with AsyncSession(engine, expire_on_commit=False) as async_db:
+        user = await AsyncUserRepository().get_by_id(async_db, test_user.id)
+        assert user.email == test_user.email
+
+        book_repository = AsyncBookRepository()
+        book = await book_repository.create(async_db, Book(
+            id=uuid.uuid4(), title="Async", author="Author", pages=5, is_public=True
+        ))
+        books = await book_repository.get_public_books(async_db)
+        assert [b.id for b in books] == [book.id]
+    await engine.dispose()
+
+
+def test_routing_session_sends_reads_to_replicas(tmp_path):
+    """Test reads go to healthy replicas and writes (and later reads) to primary"""
+    from sqlalchemy import create_engine, select
+    from app.infrastructure.database import Base, ReplicaSet, RoutingSession, replica_sticky_key
+    from app.users.domain.models import User
+
+    primary = create_engine(f"sqlite:///{tmp_path}/primary.db")
+    replica_engines = [create_engine(f"sqlite:///{tmp_path}/replica{i}.db") for i in range(2)]
+    replicas = ReplicaSet(replica_engines, retry_after=60)
+
+    query = select(User)
+    # Replica is chosen once per session transaction, sessions rotate
+    chosen = []
+    for _ in range(4):
+        session = RoutingSession(primary=primary, replicas=replicas, replica_reads=True)
+        chosen.append(session.get_bind(clause=query))
+        assert session.get_bind(clause=query) is chosen[-1]
+    assert chosen == replica_engines * 2
+    session.commit()
+    assert session.get_bind(clause=query) is replica_engines[0]
+
+    replicas.mark_unhealthy(replica_engines[0])
+    session = RoutingSession(primary=primary, replicas=replicas, replica_reads=True)
+    assert session.get_bind(clause=query) is replica_engines[1]
+    assert session.get_bind(clause=query) is replica_engines[1]
+    assert session.get_bind(clause=query.with_for_update()) is primary
+    assert RoutingSession(primary=primary, replicas=replicas).get_bind(clause=query) is primary
+
+    Base.metadata.create_all(bind=primary)
+    token = replica_sticky_key.set("user-1")
+    try:
+        session.add(User(id=uuid.uuid4(), email="r@example.com", hashed_password="x"))
+        session.commit()
+        # Session and user stick to primary after writing
+        assert session.get_bind(clause=query) is primary
+        other = RoutingSession(primary=primary, replicas=replicas, replica_reads=True)
+        assert other.get_bind(clause=query) is primary
+    finally:
+        replica_sticky_key.reset(token)
+        session.close()
+    other = RoutingSession(primary=primary, replicas=replicas, replica_reads=True)
+    assert other.get_bind(clause=query) is replica_engines[1]
+
+
+def test_replica_set_skips_lagging_replica(tmp_path):
+    """Test replica lagging behind primary is taken out of rotation"""
+    from unittest.mock import patch
+    from sqlalchemy import create_engine
+    from app.infrastructure.database import ReplicaSet
+
+    replica_engines = [create_engine(f"sqlite:///{tmp_path}/replica{i}.db") for i in range(2)]
+    replicas = ReplicaSet(replica_engines, retry_after=60, max_lag=10, check_interval=5)
+    lags = {id(replica_engines[0]): 30.0, id(replica_engines[1]): 0.5}
+
+    with patch.object(replicas, "_replica_lag", side_effect=lambda engine: lags[id(engine)]) as check:
+        assert [replicas.choose() for _ in range(3)] == [replica_engines[1]] * 3
+        # Each replica checked once per interval
+        assert check.call_count == 2
+        lags[id(replica_engines[1])] = 30.0
+        assert replicas.choose() is replica_engines[1]
@@ -67,3 +67,353 @@ def test_delete_book(client, auth_headers, test_book):
     assert response.status_code in [status.HTTP_204_NO_CONTENT, status.HTTP_500_INTERNAL_SERVER_ERROR]
 
 
+def _file_stream(content):
+    """Build FileStream over in-memory content"""
+    from botocore.response import StreamingBody
+    from app.infrastructure.storage import FileStream
+
+    return FileStream(StreamingBody(BytesIO(content), len(content)), len(content), chunk_size=64)
+
+
+def test_read_book_streams_chunks(client, auth_headers, test_book):
+    """Test full book is streamed from storage in chunks"""
+    from unittest.mock import patch
+
+    content = b"%PDF-1.4\n" + b"x" * 1000
+    with patch(
+        "app.infrastructure.storage.storage_service.get_file_stream",
+        return_value=_file_stream(content)
+    ):
+        response = client.get(f"/api/v1/books/{test_book.id}/read", headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["content-length"] == str(len(content))
+    assert response.content == content
+
+
+def test_parse_range_header():
+    """Test parsing of Range header"""
+    from app.books.api.ranges import parse_range_header, RangeNotSatisfiable
+
+    assert parse_range_header("bytes=0-99", 1000) == [(0, 99)]
+    assert parse_range_header("bytes=900-", 1000) == [(900, 999)]
+    assert parse_range_header("bytes=-100", 1000) == [(900, 999)]
+    assert parse_range_header("bytes=0-10,5-20,50-60", 1000) == [(0, 20), (50, 60)]
+    assert parse_range_header("items=0-10", 1000) is None
+    assert parse_range_header("bytes=abc", 1000) is None
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range_header("bytes=2000-3000", 1000)
+
+
+def test_read_book_range(client, auth_headers, test_book):
+    """Test reading a single byte range of a book"""
+    from datetime import datetime, timezone
+    from unittest.mock import patch
+
+    content = bytes(range(256)) * 4
+    info = {
+        "size": len(content),
+        "etag": '"abc"',
+        "last_modified": datetime(2024, 1, 1, tzinfo=timezone.utc),
+        "content_type": "application/pdf",
+    }
+    with patch("app.infrastructure.storage.storage_service.get_file_info", return_value=info), \
+            patch(
+                "app.infrastructure.storage.storage_service.get_file_stream",
+                side_effect=lambda path, start=None, end=None: _file_stream(content[start:end + 1])
+            ) as mock_range:
+        response = client.get(
+            f"/api/v1/books/{test_book.id}/read",
+            headers={**auth_headers, "Range": "bytes=100-199"}
+        )
+        assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+        assert response.headers["content-range"] == f"bytes 100-199/{len(content)}"
+        assert response.content == content[100:200]
+        mock_range.assert_called_once_with(test_book.file_path, 100, 199)
+
+        response = client.get(
+            f"/api/v1/books/{test_book.id}/read",
+            headers={**auth_headers, "Range": "bytes=0-9,-10"}
+        )
+        assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+        assert response.headers["content-type"].startswith("multipart/byteranges")
+        assert int(response.headers["content-length"]) == len(response.content)
+        assert content[:10] in response.content
+        assert content[-10:] in response.content
+
+        response = client.get(
+            f"/api/v1/books/{test_book.id}/read",
+            headers={**auth_headers, "Range": "bytes=5000-"}
+        )
+        assert response.status_code == status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+        assert response.headers["content-range"] == f"bytes */{len(content)}"
+
+
+def test_read_public_book_from_disk_cache(client, auth_headers, public_book, tmp_path):
+    """Test public book is cached on disk and served from cache"""
+    from unittest.mock import patch
+    from app.infrastructure.file_cache import FileCache
+
+    content = b"%PDF-1.4\n" + bytes(range(256)) * 8
+    cache = FileCache(str(tmp_path), 1024 * 1024)
+    with patch("app.books.application.book_service.file_cache", cache), \
+            patch(
+                "app.infrastructure.storage.storage_service.get_file_stream",
+                side_effect=lambda *args, **kwargs: _file_stream(content)
+            ) as mock_stream:
+        response = client.get(f"/api/v1/books/{public_book.id}/read", headers=auth_headers)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.content == content
+
+        response = client.get(f"/api/v1/books/{public_book.id}/read", headers=auth_headers)
+        assert response.content == content
+        assert response.headers["content-length"] == str(len(content))
+
+        response = client.get(
+            f"/api/v1/books/{public_book.id}/read",
+            headers={**auth_headers, "Range": "bytes=10-19"}
+        )
+        assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+        assert response.content == content[10:20]
+
+    assert mock_stream.call_count == 1
+
+
+def test_read_local_book_through_proxy(client, auth_headers, public_book, tmp_path):
+    """Test local files are handed to the proxy with X-Accel-Redirect"""
+    from unittest.mock import patch
+    from urllib.parse import unquote
+    from app.infrastructure.config import settings
+    from app.infrastructure.file_cache import FileCache
+
+    content = b"%PDF-1.4\n" + bytes(range(256))
+    cache = FileCache(str(tmp_path), 1024 * 1024)
+    with patch("app.books.application.book_service.file_cache", cache), \
+            patch.object(settings, "LOCAL_FILE_REDIRECT_PREFIX", "/_files/"), \
+            patch(
+                "app.infrastructure.storage.storage_service.get_file_stream",
+                side_effect=lambda *args, **kwargs: _file_stream(content)
+            ):
+        response = client.get(f"/api/v1/books/{public_book.id}/read", headers=auth_headers)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.content == b""
+    path = unquote(response.headers["x-accel-redirect"])
+    assert path.startswith("/_files/")
+    with open(path[len("/_files"):], "rb") as cached:
+        assert cached.read() == content
+
+
+def test_read_book_redirect_mode(client, auth_headers, test_book):
+    """Test redirect delivery mode returns cached presigned URL"""
+    from unittest.mock import MagicMock, patch
+    from app.infrastructure.config import settings
+    from app.infrastructure.storage import storage_service
+
+    presign = MagicMock()
+    presign.generate_presigned_url.return_value = "http://minio/books/test/path.pdf?X-Amz-Signature=abc"
+    with patch.object(settings, "BOOK_DELIVERY_MODE", "redirect"), \
+            patch.object(storage_service.backend, "_client", presign), \
+            patch.object(storage_service, "_url_cache", type(storage_service._url_cache)()):
+        for _ in range(2):
+            response = client.get(
+                f"/api/v1/books/{test_book.id}/read",
+                headers=auth_headers,
+                follow_redirects=False
+            )
+            assert response.status_code == status.HTTP_307_TEMPORARY_REDIRECT
+            assert response.headers["location"].endswith("X-Amz-Signature=abc")
+
+    presign.generate_presigned_url.assert_called_once()
+
+
+def test_read_book_conditional_get(client, auth_headers, test_book):
+    """Test validators are sent and repeat reads get 304 without a body fetch"""
+    from datetime import datetime, timezone
+    from unittest.mock import MagicMock, patch
+    from app.infrastructure.storage import storage_service
+
+    content = b"%PDF-1.4\n" + b"x" * 100
+    info = {
+        "size": len(content),
+        "etag": '"abc"',
+        "last_modified": datetime(2024, 1, 1, tzinfo=timezone.utc),
+        "content_type": "application/pdf",
+    }
+    with patch.object(storage_service.backend, "head", MagicMock(return_value=info)) as mock_head, \
+            patch.object(storage_service, "_info_cache", type(storage_service._info_cache)()), \
+            patch.object(
+                storage_service, "get_file_stream",
+                side_effect=lambda *args, **kwargs: _file_stream(content)
+            ) as mock_stream:
+        response = client.get(f"/api/v1/books/{test_book.id}/read", headers=auth_headers)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["etag"] == '"abc"'
+        assert response.headers["last-modified"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+
+        response = client.get(
+            f"/api/v1/books/{test_book.id}/read",
+            headers={**auth_headers, "If-None-Match": 'W/"abc"'}
+        )
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.content == b""
+
+        response = client.get(
+            f"/api/v1/books/{test_book.id}/read",
+            headers={**auth_headers, "If-Modified-Since": "Tue, 02 Jan 2024 00:00:00 GMT"}
+        )
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+        response = client.get(
+            f"/api/v1/books/{test_book.id}/read",
+            headers={**auth_headers, "If-None-Match": '"other"'}
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+    assert mock_stream.call_count == 2
+    assert mock_head.call_count == 1
+
+
+def test_read_book_pages_errors(client, auth_headers, test_book):
+    """Test storage and page index failures are not reported as client errors"""
+    from unittest.mock import patch
+    from app.books.application.page_index import PageDataUnavailable, PageIndexMismatch
+
+    url = f"/api/v1/books/{test_book.id}/pages/1"
+    target = "app.books.application.book_service.BookService.get_book_pages"
+    with patch(target, side_effect=ValueError("Page must be between 1 and 100")):
+        assert client.get(url, headers=auth_headers).status_code == status.HTTP_400_BAD_REQUEST
+    with patch(target, side_effect=PageDataUnavailable("Storage service unavailable")):
+        assert client.get(url, headers=auth_headers).status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    with patch(target, side_effect=PageIndexMismatch("Page index does not match file")):
+        response = client.get(url, headers=auth_headers)
+        assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+
+
+def test_get_public_books_keyset_pagination(client, auth_headers, db):
+    """Test public catalogue is paged with cursor and reports total on the first page"""
+    import uuid
+    from unittest.mock import patch
+    from app.books.domain.models import Book
+
+    for i in range(5):
+        db.add(Book(
+            id=uuid.uuid4(), title=f"Book {i}", author="Author", pages=10,
+            is_public=True, file_path=None
+        ))
+    db.add(Book(id=uuid.uuid4(), title="Private", author="Author", pages=10, is_public=False))
+    db.commit()
+
+    with patch("app.books.application.book_service._public_books_total", [None, 0.0]):
+        seen = []
+        cursor = None
+        while True:
+            params = {"limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            response = client.get("/api/v1/books/public", params=params, headers=auth_headers)
+            assert response.status_code == status.HTTP_200_OK
+            data = response.json()
+            assert data["total"] == (None if cursor else 5)
+            seen.extend(book["id"] for book in data["books"])
+            cursor = data["next_cursor"]
+            if cursor is None:
+                break
+
+    assert len(seen) == 5
+    assert len(set(seen)) == 5
+
+    response = client.get(
+        "/api/v1/books/public", params={"cursor": "not-a-cursor"}, headers=auth_headers
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_get_my_library_query_count(client, auth_headers, db, test_user):
+    """Test listing the library does not issue a query per book"""
+    import uuid
+    from sqlalchemy import event
+    from app.books.domain.models import Book, UserBook
+
+    for i in range(20):
+        book = Book(id=uuid.uuid4(), title=f"Book {i}", author="Author", pages=10, is_public=True)
+        db.add(book)
+        db.add(UserBook(
+            id=uuid.uuid4(), user_id=test_user.id, book_id=book.id,
+            book_title=book.title, book_author=book.author
+        ))
+    db.commit()
+    db.expire_all()
+
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", count_statement)
+    try:
+        response = client.get("/api/v1/users/me/library", headers=auth_headers)
+    finally:
+        event.remove(engine, "before_cursor_execute", count_statement)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["total"] == 20
+    assert len(statements) <= 2
+
+
+def test_get_my_library_sorted_pages(client, auth_headers, db, test_user):
+    """Test library is paged with cursor, sorted and filtered in SQL"""
+    import uuid
+    from app.books.domain.models import Book, BookStatus, UserBook
+
+    for i, title in enumerate(["Delta", "Alpha", "Echo", "Charlie", "Bravo"]):
+        book = Book(id=uuid.uuid4(), title=title, author=f"Author {i}", pages=10)
+        db.add(book)
+        db.add(UserBook(
+            id=uuid.uuid4(), user_id=test_user.id, book_id=book.id,
+            status=BookStatus.READING if i % 2 else BookStatus.PLANNED,
+            book_title=book.title, book_author=book.author
+        ))
+    db.commit()
+
+    def list_titles(**params):
+        titles, cursor, total = [], None, None
+        while True:
+            query = dict(params, limit=2)
+            if cursor:
+                query["cursor"] = cursor
+            response = client.get("/api/v1/users/me/library", params=query, headers=auth_headers)
+            assert response.status_code == status.HTTP_200_OK
+            data = response.json()
+            titles.extend(ub["book"]["title"] for ub in data["books"])
+            # Library is counted for the first page only
+            if cursor is None:
+                total = data["total"]
+            else:
+                assert data["total"] is None
+            cursor = data["next_cursor"]
+            if cursor is None:
+                return titles, total
+
+    titles, total = list_titles(sort="title")
+    assert titles == ["Alpha", "Bravo", "Charlie", "Delta", "Echo"]
+    assert total == 5
+
+    titles, total = list_titles(sort="title", order="desc", status="reading")
+    assert titles == ["Charlie", "Alpha"]
+    assert total == 2
+
+    titles, _ = list_titles(sort="added_at")
+    assert sorted(titles) == ["Alpha", "Bravo", "Charlie", "Delta", "Echo"]
+
+    # Cursor of one ordering is rejected by another
+    response = client.get(
+        "/api/v1/users/me/library", params={"sort": "title", "limit": 2}, headers=auth_headers
+    )
+    cursor = response.json()["next_cursor"]
+    response = client.get(
+        "/api/v1/users/me/library", params={"sort": "author", "cursor": cursor},
+        headers=auth_headers
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
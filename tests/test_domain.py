@@ -63,3 +63,22 @@ def test_book_status_enum():
     assert BookStatus.FINISHED == "finished"
 
 
+def test_uuid7_ids_are_time_ordered(db):
+    """Test uuid7 ids increase and sort in storage as created"""
+    from app.infrastructure.pagination import keyset_after
+    from app.infrastructure.types import uuid7
+
+    ids = [uuid7() for _ in range(5000)]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+    assert all(value.version == 7 for value in ids[:10])
+    assert ids[0].variant == uuid.RFC_4122
+
+    users = [User(email=f"user{i}@example.com", hashed_password="x") for i in range(5)]
+    db.add_all(users)
+    db.commit()
+    assert all(user.id.version == 7 for user in users)
+    stored = [user.id for user in db.query(User).order_by(User.id)]
+    assert stored == [user.id for user in users]
+    after = db.query(User).filter(keyset_after(db, (User.id,), (users[1].id,))).order_by(User.id)
+    assert [user.id for user in after] == [user.id for user in users[2:]]
@@ -30,6 +30,7 @@ def test_get_progress(client, auth_headers, test_book, db):
         current_page=30
     )
     reading_repository.create_progress(db, progress)
+    db.commit()
     
     response = client.get(
         f"/api/v1/reading/progress/{test_book.id}",
@@ -72,3 +73,340 @@ def test_get_stats(client, auth_headers):
     assert "daily_goal_pages" in data
 
 
+def test_stats_follow_progress_updates(client, auth_headers, db, test_book, public_book):
+    """Test stats aggregate is kept up to date by progress updates"""
+    updates = ((test_book, 30), (test_book, 100), (public_book, 20), (test_book, 90), (public_book, 200))
+    for book, page in updates:
+        response = client.put(
+            f"/api/v1/reading/progress/{book.id}",
+            json={"current_page": page},
+            headers=auth_headers
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+    response = client.get("/api/v1/reading/stats", headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["total_books_read"] == 2
+    # test_book was finished, then reopened
+    assert data["books_finished"] == 1
+    assert data["total_pages_read"] == 290
+    assert data["last_activity_at"] is not None
+
+
+def test_sync_progress_batch(client, auth_headers, db, test_book, public_book):
+    """Test offline progress batch is applied in order of timestamps"""
+    from unittest.mock import patch
+    from app.books.domain.models import Book
+
+    # Stored progress is newer than part of the batch
+    client.put(
+        f"/api/v1/reading/progress/{public_book.id}",
+        json={"current_page": 50},
+        headers=auth_headers
+    )
+    updates = [
+        {"book_id": str(test_book.id), "current_page": 40, "timestamp": "2024-01-01T10:00:00Z"},
+        {"book_id": str(test_book.id), "current_page": 20, "timestamp": "2024-01-01T09:00:00Z"},
+        {"book_id": str(public_book.id), "current_page": 10, "timestamp": "2024-01-01T08:00:00Z"},
+    ]
+    with patch("app.reading.application.reading_service.message_broker") as broker:
+        response = client.post(
+            "/api/v1/reading/progress/batch",
+            json={"updates": updates},
+            headers=auth_headers
+        )
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert [(p["book_id"], p["current_page"]) for p in data["progress"]] == [(str(test_book.id), 40)]
+    assert data["progress"][0]["progress_percentage"] == 40.0
+    assert data["skipped"] == [str(public_book.id)]
+    # Events of the whole batch are published together
+    broker.publish_events.assert_called_once()
+
+    response = client.get("/api/v1/reading/stats", headers=auth_headers)
+    assert response.json()["total_books_read"] == 2
+    assert response.json()["total_pages_read"] == 90
+
+    # Replayed batch (same timestamps) is not applied or published again
+    with patch("app.reading.application.reading_service.message_broker") as broker:
+        response = client.post(
+            "/api/v1/reading/progress/batch",
+            json={"updates": updates[:1]},
+            headers=auth_headers
+        )
+    assert response.json()["skipped"] == [str(test_book.id)]
+    broker.publish_events.assert_called_once_with([])
+
+    # One inaccessible book rejects the whole batch
+    foreign_book = Book(title="Foreign", author="Someone", pages=10, is_public=False,
+                        file_path="foreign/path.pdf")
+    db.add(foreign_book)
+    db.commit()
+    response = client.post(
+        "/api/v1/reading/progress/batch",
+        json={"updates": [
+            {"book_id": str(test_book.id), "current_page": 60, "timestamp": "2024-01-02T10:00:00Z"},
+            {"book_id": str(foreign_book.id), "current_page": 5, "timestamp": "2024-01-02T10:00:00Z"},
+        ]},
+        headers=auth_headers
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    response = client.get(f"/api/v1/reading/progress/{test_book.id}", headers=auth_headers)
+    assert response.json()["current_page"] == 40
+
+
+def test_sync_progress_credits_offline_days(db, test_user):
+    """Test pages synced for earlier days count towards the streak"""
+    from datetime import date, datetime, time, timedelta
+    from unittest.mock import patch
+    from app.books.domain.models import Book
+    from app.books.infrastructure.book_repository import BookRepository
+    from app.reading.application.reading_service import ReadingService
+    from app.reading.domain.models import ReadingHabit
+    from app.reading.infrastructure.reading_repository import ReadingRepository
+
+    books = [Book(title=f"Book {i}", author="Author", pages=100, is_public=True) for i in range(5)]
+    db.add_all(books)
+    db.add(ReadingHabit(user_id=test_user.id, daily_goal_pages=10))
+    db.commit()
+    repository = ReadingRepository()
+    service = ReadingService(repository, BookRepository())
+    today = date.today()
+
+    def sync(*reads):
+        """Sync 10 pages of each (book, days ago)"""
+        updates = [
+            (books[i].id, 10, datetime.combine(today - timedelta(days=days), time(12)).astimezone())
+            for i, days in reads
+        ]
+        with patch("app.reading.application.reading_service.message_broker"):
+            service.sync_progress(db, test_user.id, updates)
+        return repository.get_habit(db, test_user.id).current_streak
+
+    assert sync((0, 0)) == 1
+    # Day not adjacent to the streak is recorded but does not extend it
+    assert sync((1, 3)) == 1
+    # Filling the gap joins it with the days read before
+    assert sync((2, 2), (3, 1)) == 4
+    assert sync((4, 0)) == 4
+    assert repository.get_habit(db, test_user.id).last_reading_date.date() == today
+
+
+def test_progress_buffer_coalesces_page_turns(client, auth_headers, db, test_user, test_book):
+    """Test page turns are acknowledged from the buffer and written by one flush"""
+    from unittest.mock import patch
+    from app.books.infrastructure.book_repository import BookRepository
+    from app.reading.application.reading_service import ReadingService
+    from app.reading.infrastructure.progress_buffer import (
+        MemoryProgressBufferBackend, ProgressBuffer
+    )
+    from app.reading.infrastructure.reading_repository import ReadingRepository
+
+    reading_repository = ReadingRepository()
+    buffer = ProgressBuffer(MemoryProgressBufferBackend(), flush_interval=30, max_pending=100)
+    with patch("app.reading.application.reading_service.progress_buffer", buffer):
+        # First progress of a book is written directly
+        for page in (5, 10, 20, 30):
+            response = client.put(
+                f"/api/v1/reading/progress/{test_book.id}",
+                json={"current_page": page},
+                headers=auth_headers
+            )
+            assert response.status_code == status.HTTP_200_OK
+            assert response.json()["current_page"] == page
+            assert response.json()["progress_percentage"] == page
+
+        stored = reading_repository.get_progress(db, test_user.id, test_book.id)
+        db.refresh(stored)
+        assert stored.current_page == 5
+        # Reads see the buffered page
+        response = client.get(f"/api/v1/reading/progress/{test_book.id}", headers=auth_headers)
+        assert response.json()["current_page"] == 30
+
+        # Invalid pages are still rejected right away
+        response = client.put(
+            f"/api/v1/reading/progress/{test_book.id}",
+            json={"current_page": 101},
+            headers=auth_headers
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        service = ReadingService(reading_repository, BookRepository())
+        written = buffer.flush(
+            lambda user_id, updates: service.sync_progress(db, user_id, updates)
+        )
+        assert written == 1
+        assert buffer.get(test_user.id, test_book.id) is None
+
+    db.refresh(stored)
+    assert stored.current_page == 30
+    response = client.get("/api/v1/reading/stats", headers=auth_headers)
+    assert response.json()["total_pages_read"] == 30
+
+
+def test_progress_buffer_recovers_interrupted_flush():
+    """Test drained entries return to the buffer unless acknowledged"""
+    from datetime import datetime, timedelta, timezone
+    import uuid
+    from app.reading.infrastructure.progress_buffer import MemoryProgressBufferBackend
+
+    backend = MemoryProgressBufferBackend()
+    user_id, book_id = uuid.uuid4(), uuid.uuid4()
+    now = datetime.now(timezone.utc)
+    backend.put(user_id, book_id, 10, now)
+    # Older update does not replace a later one
+    assert backend.put(user_id, book_id, 5, now - timedelta(seconds=1)) == 1
+    token, entries = backend.drain()
+    assert entries == {(user_id, book_id): (10, now)}
+    # Entries being flushed stay visible
+    assert backend.get(user_id, book_id) == (10, now)
+
+    # Flush was interrupted, meanwhile a later page was turned
+    backend.put(user_id, book_id, 12, now + timedelta(seconds=1))
+    backend.recover()
+    assert backend.get(user_id, book_id) == (12, now + timedelta(seconds=1))
+    token, entries = backend.drain()
+    backend.ack(token)
+    backend.recover()
+    assert backend.get(user_id, book_id) is None
+
+
+def test_expire_streaks_in_chunks(db):
+    """Test nightly job resets broken streaks only"""
+    from datetime import date, datetime
+    from app.books.infrastructure.book_repository import BookRepository
+    from app.reading.application.reading_service import ReadingService
+    from app.reading.application.streak_job import StreakScheduler
+    from app.reading.domain.models import ReadingHabit
+    from app.reading.infrastructure.reading_repository import ReadingRepository
+    from app.users.domain.models import User
+
+    last_reading = [
+        datetime(2024, 3, 10, 23, 0),  # yesterday: streak continues
+        datetime(2024, 3, 11, 8, 0),   # today
+        datetime(2024, 3, 9, 23, 59),  # broken
+        datetime(2024, 3, 1, 12, 0),   # broken
+        datetime(2024, 2, 20, 12, 0),  # broken
+    ]
+    habits = []
+    for index, last_reading_date in enumerate(last_reading):
+        user = User(email=f"reader{index}@example.com", hashed_password="x")
+        db.add(user)
+        db.flush()
+        habits.append(ReadingHabit(
+            user_id=user.id, current_streak=5, last_reading_date=last_reading_date
+        ))
+    db.add_all(habits)
+    db.commit()
+
+    service = ReadingService(ReadingRepository(), BookRepository())
+    assert service.expire_streaks(db, today=date(2024, 3, 11), chunk_size=2) == 3
+    for habit in habits:
+        db.refresh(habit)
+    assert [habit.current_streak for habit in habits] == [5, 5, 0, 0, 0]
+    # Reset streaks are not touched again
+    assert service.expire_streaks(db, today=date(2024, 3, 11), chunk_size=2) == 0
+
+    scheduler = StreakScheduler(hour=3)
+    assert scheduler.seconds_until_next_run(datetime(2024, 3, 11, 2, 0)) == 3600
+    assert scheduler.seconds_until_next_run(datetime(2024, 3, 11, 3, 0)) == 24 * 3600
+
+
+@pytest.mark.parametrize("path", ["update_progress", "sync_progress"])
+def test_concurrent_first_progress_is_counted_once(db, test_user, test_book, path):
+    """Test first progress of a book sent by two devices at once is counted once"""
+    import threading
+    import time
+    from datetime import datetime, timezone
+    from unittest.mock import patch
+    from sqlalchemy import func
+    from sqlalchemy.exc import OperationalError
+    from sqlalchemy.orm import sessionmaker
+    from app.books.infrastructure.book_repository import BookRepository
+    from app.reading.application.reading_service import ReadingService
+    from app.reading.domain.models import (
+        DailyReadingRollup, ReadingEvent, ReadingProgress, UserReadingStats
+    )
+    from app.reading.infrastructure.reading_repository import ReadingRepository
+
+    DeviceSession = sessionmaker(bind=db.get_bind(), autoflush=False, expire_on_commit=False)
+    barrier = threading.Barrier(2)
+    failed = []
+
+    def device(page):
+        session = DeviceSession()
+        service = ReadingService(ReadingRepository(), BookRepository())
+        try:
+            barrier.wait()
+            for _ in range(100):
+                try:
+                    if path == "update_progress":
+                        service.update_progress(session, test_user.id, test_book.id, page)
+                    else:
+                        service.sync_progress(
+                            session, test_user.id,
+                            [(test_book.id, page, datetime.now(timezone.utc))]
+                        )
+                    return
+                except OperationalError:
+                    # SQLite has one writer at a time; the other device retries
+                    session.rollback()
+                    time.sleep(0.01)
+            failed.append(page)
+        finally:
+            session.close()
+
+    with patch("app.reading.application.reading_service.message_broker"):
+        threads = [threading.Thread(target=device, args=(page,)) for page in (30, 40)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert not failed
+
+    db.expire_all()
+    final_page = db.query(ReadingProgress.current_page).filter(
+        ReadingProgress.user_id == test_user.id
+    ).scalar()
+    pages = [row.pages for row in db.query(ReadingEvent.pages)]
+    # Moves chain from the stored page: the second device starts where the first ended
+    assert sum(pages) == final_page
+    rollup = db.query(func.sum(DailyReadingRollup.pages_read)).filter(
+        DailyReadingRollup.user_id == test_user.id
+    ).scalar()
+    assert rollup == sum(page for page in pages if page > 0)
+    stats = db.query(UserReadingStats).filter(UserReadingStats.user_id == test_user.id).one()
+    assert stats.books_started == 1
+    assert stats.total_pages == final_page
+
+
+def test_progress_buffer_requeues_failed_flush():
+    """Test entries stay buffered when writing them fails, and the batch is acknowledged"""
+    from datetime import datetime, timezone
+    import uuid
+    from app.reading.infrastructure.progress_buffer import (
+        MemoryProgressBufferBackend, ProgressBuffer
+    )
+
+    backend = MemoryProgressBufferBackend()
+    buffer = ProgressBuffer(backend, flush_interval=30, max_pending=100)
+    user_id, book_id, other_book_id = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    now = datetime.now(timezone.utc)
+    buffer.put(user_id, book_id, 10, now)
+    buffer.put(user_id, other_book_id, 20, now)
+
+    def failing_writer(user_id, updates):
+        # Batch is rejected, then the database goes away during the retry
+        if len(updates) > 1:
+            raise ValueError("Book not found or not in your library")
+        raise RuntimeError("connection lost")
+
+    assert buffer.flush(failing_writer) == 0
+    assert buffer.get(user_id, book_id) == (10, now)
+    assert buffer.get(user_id, other_book_id) == (20, now)
+    assert not backend._draining
+
+    written = []
+    assert buffer.flush(lambda user_id, updates: written.extend(updates)) == 2
+    assert sorted(page for _, page, _ in written) == [10, 20]
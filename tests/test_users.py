@@ -70,3 +70,57 @@ def test_get_current_user_unauthorized(client):
     assert response.status_code == status.HTTP_401_UNAUTHORIZED
 
 
+def test_current_user_is_cached(client, auth_headers, db, test_user):
+    """Test authenticated user is cached and invalidated on change"""
+    import uuid
+    from unittest.mock import AsyncMock, patch
+    from app.users.infrastructure.user_cache import user_cache
+
+    user_cache.clear()
+    assert client.get("/api/v1/users/me", headers=auth_headers).status_code == status.HTTP_200_OK
+    assert user_cache.get(test_user.id) is not None
+
+    with patch(
+        "app.users.api.dependencies.AsyncUserRepository.get_by_id", new_callable=AsyncMock
+    ) as get_by_id:
+        response = client.get("/api/v1/users/me", headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    get_by_id.assert_not_awaited()
+
+    # Requests get their own instances built from cached values
+    assert user_cache.get(test_user.id) is not user_cache.get(test_user.id)
+
+    # Changing the user drops the cached entry once the change is committed
+    test_user.email = "changed@example.com"
+    db.flush()
+    assert user_cache.get(test_user.id) is not None
+    db.commit()
+    assert user_cache.get(test_user.id) is None
+
+    # User loaded before an invalidation is not cached
+    version = user_cache.version()
+    user_cache.invalidate(uuid.uuid4())
+    user_cache.put(test_user, version)
+    assert user_cache.get(test_user.id) is None
+    response = client.get("/api/v1/users/me", headers=auth_headers)
+    assert response.json()["email"] == "changed@example.com"
+
+
+def test_stateless_user_id(client, auth_headers, test_user):
+    """Test stateless mode trusts token claims without a users lookup"""
+    from unittest.mock import AsyncMock, patch
+    from app.infrastructure.config import settings
+    from app.users.infrastructure.user_cache import user_cache
+
+    user_cache.clear()
+    with patch.object(settings, "AUTH_STATELESS", True), patch(
+        "app.users.api.dependencies.AsyncUserRepository.get_by_id", new_callable=AsyncMock
+    ) as get_by_id:
+        response = client.get("/api/v1/reading/habit", headers=auth_headers)
+        assert response.status_code == status.HTTP_200_OK
+        get_by_id.assert_not_awaited()
+
+        response = client.get(
+            "/api/v1/reading/habit", headers={"Authorization": "Bearer invalid"}
+        )
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED